@@ -12,6 +12,8 @@ from app.api.upload import router as upload_router
 from app.api.config import router as config_router
 from app.api.users import router as users_router
 from app.api.backup import router as backup_router
+from app.api.export import router as export_router
+from app.api.analytics import router as analytics_router
 
 router = APIRouter()
 
@@ -25,3 +27,5 @@ router.include_router(upload_router, prefix="/upload", tags=["文件上传"])
 router.include_router(config_router, prefix="/config", tags=["系统配置"])
 router.include_router(users_router, prefix="/users", tags=["用户管理"])
 router.include_router(backup_router, prefix="/backup", tags=["备份管理"])
+router.include_router(export_router, prefix="/export", tags=["数据导出"])
+router.include_router(analytics_router, prefix="/analytics", tags=["数据分析"])
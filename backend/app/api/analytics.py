@@ -0,0 +1,71 @@
+"""
+数据分析 API
+基于内存快照的即席分组统计
+"""
+import asyncio
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.auth import get_current_admin
+from app.services.analytics_snapshot import analytics_snapshot, SnapshotUnavailable
+
+
+router = APIRouter()
+
+Dimension = Literal["event_type", "invite_code", "sponsor_id", "page_number", "hour", "date"]
+
+
+@router.get("/snapshot")
+async def get_snapshot_status(
+    _: None = Depends(get_current_admin)
+):
+    """获取分析快照状态"""
+    return analytics_snapshot.status()
+
+
+@router.post("/snapshot/refresh")
+async def refresh_snapshot(
+    full: bool = Query(False, description="重新加载全部数据"),
+    _: None = Depends(get_current_admin)
+):
+    """刷新分析快照"""
+    try:
+        loaded = await analytics_snapshot.refresh(full=full)
+    except SnapshotUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"loaded": loaded, **analytics_snapshot.status()}
+
+
+@router.get("/query")
+async def query_snapshot(
+    group_by: List[Dimension] = Query(default=[], description="分组维度"),
+    since: Optional[datetime] = Query(None, description="事件时间起 (含，UTC)"),
+    until: Optional[datetime] = Query(None, description="事件时间止 (不含，UTC)"),
+    event_types: Optional[List[str]] = Query(None),
+    invite_codes: Optional[List[str]] = Query(None),
+    sponsor_ids: Optional[List[int]] = Query(None),
+    page_numbers: Optional[List[int]] = Query(None),
+    limit: int = Query(1000, ge=1, le=100000),
+    _: None = Depends(get_current_admin)
+):
+    """分组统计事件数与去重用户数 (小时为 UTC 小时)"""
+    try:
+        await analytics_snapshot.ensure_fresh()
+        # 向量化计算在线程中执行，不阻塞事件循环
+        rows = await asyncio.to_thread(
+            analytics_snapshot.query,
+            list(dict.fromkeys(group_by)),
+            since=since,
+            until=until,
+            event_types=event_types,
+            invite_codes=invite_codes,
+            sponsor_ids=sponsor_ids,
+            page_numbers=page_numbers,
+            limit=limit,
+        )
+    except SnapshotUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"refreshed_at": analytics_snapshot.refreshed_at.isoformat(), "rows": rows}
@@ -2,14 +2,14 @@
 认证 API
 登录和 Token 管理
 """
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.models import Admin
 from app.schemas.auth import Token, AdminInfo
 from app.utils.auth import verify_password, create_access_token, decode_access_token
@@ -17,20 +17,18 @@ from app.utils.auth import verify_password, create_access_token, decode_access_t
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 
-async def get_current_admin(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: AsyncSession = Depends(get_db)
-) -> Admin:
-    """获取当前登录的管理员"""
+async def _authenticate(token: Optional[str], db: AsyncSession) -> Admin:
+    """校验 Token 并返回管理员"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无效的认证凭据",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    payload = decode_access_token(token)
+    payload = decode_access_token(token) if token else None
     if payload is None:
         raise credentials_exception
     
@@ -49,6 +47,39 @@ async def get_current_admin(
     return admin
 
 
+async def _authenticate_short(token: Optional[str]) -> Admin:
+    """使用独立的短会话校验 Token，返回前即归还连接
+
+    yield 依赖 get_db 要到 StreamingResponse 发送完毕才关闭，
+    流式接口若依赖它，连接会在整个响应期间处于 idle in transaction。
+    """
+    async with AsyncSessionLocal() as db:
+        return await _authenticate(token, db)
+
+
+async def get_current_admin(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: AsyncSession = Depends(get_db)
+) -> Admin:
+    """获取当前登录的管理员"""
+    return await _authenticate(token, db)
+
+
+async def get_current_admin_short(
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> Admin:
+    """获取当前登录的管理员 (流式下载等长响应接口，不占用连接)"""
+    return await _authenticate_short(token)
+
+
+async def get_current_admin_stream(
+    token: Annotated[Optional[str], Depends(oauth2_scheme_optional)],
+    access_token: Optional[str] = Query(None, description="Token (EventSource 无法设置请求头时使用)"),
+) -> Admin:
+    """获取当前登录的管理员 (SSE 等长连接接口，支持通过查询参数传递 Token，不占用连接)"""
+    return await _authenticate_short(token or access_token)
+
+
 @router.post("/login", response_model=Token)
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
@@ -2,7 +2,7 @@
 备份管理 API
 """
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
@@ -12,6 +12,7 @@ from app.database import get_db
 from app.models import BotBackup
 from app.api.auth import get_current_admin
 from app.services.backup_sync import backup_sync_service
+from app.services.backup_mirror import backup_mirror_service
 
 
 router = APIRouter()
@@ -34,17 +35,87 @@ class BackupConfigResponse(BaseModel):
     failed_count: int
     error_message: Optional[str]
     last_synced_at: Optional[datetime]
+    sync_phase: Optional[str] = None
+    sync_cursor: Optional[int] = None
+    checkpoint_at: Optional[datetime] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 
+class SyncProgressResponse(BaseModel):
+    """同步实时进度"""
+    phase: Optional[str]
+    cursor: int
+    total: int
+    processed: int
+    synced: int
+    failed: int
+    throughput: float
+    eta_seconds: Optional[int]
+    elapsed_seconds: int
+    workers: int
+    rate: float
+    paused_for: float
+    retry_after_count: int
+
+
+class MirrorQueueResponse(BaseModel):
+    """增量镜像队列状态"""
+    pending: int
+    failed: int
+
+
+class BackupItemResponse(BaseModel):
+    """单个备份 Bot 的状态"""
+    config: BackupConfigResponse
+    is_syncing: bool
+    progress: Optional[SyncProgressResponse] = None
+
+
 class BackupStatusResponse(BaseModel):
-    """备份状态响应"""
+    """备份状态响应
+    
+    config / is_syncing / progress 为激活中 (或最早创建) 的备份 Bot，backups 为全部备份 Bot。
+    """
     has_config: bool
     config: Optional[BackupConfigResponse]
     is_syncing: bool
+    progress: Optional[SyncProgressResponse] = None
+    mirror: Optional[MirrorQueueResponse] = None
+    backups: list[BackupItemResponse] = []
+
+
+class SyncPlanPhase(BaseModel):
+    """单个阶段的同步计划"""
+    phase: str
+    total: int
+    mapped: int
+    forward: int
+    send_forward: int
+    api_calls: int
+
+
+class SyncPlanResponse(BaseModel):
+    """单个备份 Bot 的同步计划
+    
+    mapped: 已映射，跳过；forward: 备份 Bot 从来源频道转发；
+    send_forward: 主 Bot 发送到存储频道后备份 Bot 转发；
+    api_calls / eta_seconds: 不计限流重试及失败重发，为下限
+    """
+    backup_id: int
+    backup_bot_username: Optional[str]
+    resume: bool
+    phases: list[SyncPlanPhase]
+    total: int
+    mapped: int
+    forward: int
+    send_forward: int
+    api_calls: int
+    rate: float
+    max_rate: float
+    eta_seconds: int
 
 
 class MessageResponse(BaseModel):
@@ -60,16 +131,45 @@ async def get_backup_status(
     _: None = Depends(get_current_admin)
 ):
     """获取备份状态"""
-    result = await db.execute(select(BotBackup).limit(1))
-    backup = result.scalar_one_or_none()
+    result = await db.execute(select(BotBackup).order_by(BotBackup.id))
+    items = [
+        BackupItemResponse(
+            config=BackupConfigResponse.model_validate(backup),
+            is_syncing=backup_sync_service.is_syncing(backup.id),
+            progress=backup_sync_service.get_progress(backup.id),
+        )
+        for backup in result.scalars().all()
+    ]
+    current = next((item for item in items if item.config.is_active), items[0] if items else None)
     
     return BackupStatusResponse(
-        has_config=backup is not None,
-        config=BackupConfigResponse.model_validate(backup) if backup else None,
-        is_syncing=backup_sync_service._is_syncing
+        has_config=current is not None,
+        config=current.config if current else None,
+        is_syncing=backup_sync_service.is_syncing(),
+        progress=current.progress if current else None,
+        mirror=await backup_mirror_service.get_status(db),
+        backups=items,
     )
 
 
+@router.get("/plan", response_model=list[SyncPlanResponse])
+async def get_sync_plan(
+    backup_id: Optional[int] = Query(None, description="备份配置 ID，不指定时为所有备份 Bot"),
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(get_current_admin)
+):
+    """同步计划: 开始同步前预估各类待同步文件数、API 调用次数与耗时"""
+    query = select(BotBackup).order_by(BotBackup.id)
+    if backup_id is not None:
+        query = query.where(BotBackup.id == backup_id)
+    backups = (await db.execute(query)).scalars().all()
+    
+    if not backups:
+        raise HTTPException(status_code=400, detail="没有备份配置")
+    
+    return [await backup_sync_service.plan_sync(backup) for backup in backups]
+
+
 @router.post("/config", response_model=MessageResponse)
 async def create_backup_config(
     data: BackupConfigCreate,
@@ -86,10 +186,11 @@ async def create_backup_config(
 
 @router.delete("/config", response_model=MessageResponse)
 async def delete_backup_config(
+    backup_id: Optional[int] = Query(None, description="备份配置 ID，不指定时为最早创建的一个"),
     _: None = Depends(get_current_admin)
 ):
     """删除备份配置"""
-    result = await backup_sync_service.delete_backup_config()
+    result = await backup_sync_service.delete_backup_config(backup_id)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -99,10 +200,11 @@ async def delete_backup_config(
 
 @router.post("/sync/start", response_model=MessageResponse)
 async def start_sync(
+    backup_id: Optional[int] = Query(None, description="备份配置 ID，不指定时所有备份 Bot 并行同步"),
     _: None = Depends(get_current_admin)
 ):
     """开始同步"""
-    result = await backup_sync_service.start_sync()
+    result = await backup_sync_service.start_sync(backup_id)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -112,19 +214,21 @@ async def start_sync(
 
 @router.post("/sync/stop", response_model=MessageResponse)
 async def stop_sync(
+    backup_id: Optional[int] = Query(None, description="备份配置 ID，不指定时停止所有同步"),
     _: None = Depends(get_current_admin)
 ):
     """停止同步"""
-    result = await backup_sync_service.stop_sync()
+    result = await backup_sync_service.stop_sync(backup_id)
     return MessageResponse(success=True, message=result.get("message", "正在停止"))
 
 
 @router.post("/switch/backup", response_model=MessageResponse)
 async def switch_to_backup(
+    backup_id: Optional[int] = Query(None, description="备份配置 ID，不指定时为最早创建的已同步备份 Bot"),
     _: None = Depends(get_current_admin)
 ):
     """切换到备份 Bot"""
-    result = await backup_sync_service.switch_to_backup()
+    result = await backup_sync_service.switch_to_backup(backup_id)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["error"])
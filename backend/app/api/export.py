@@ -0,0 +1,170 @@
+"""
+数据导出 API
+用户与统计事件的流式导出 (CSV / NDJSON，可选 gzip)
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+
+from app.database import AsyncSessionLocal
+from app.models import User, InviteLink, Statistics
+from app.api.auth import get_current_admin_short
+
+
+router = APIRouter()
+
+# 服务端游标每批读取的行数
+EXPORT_BATCH_SIZE = 5000
+
+ExportFormat = Literal["csv", "ndjson"]
+
+
+# ---------- 流式编码 ----------
+
+def _format_value(value):
+    """时间统一为 ISO 格式"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_rows(rows, columns: list[str], fmt: str, header: bool) -> bytes:
+    """将一批行编码为 CSV / NDJSON"""
+    if fmt == "ndjson":
+        lines = [
+            json.dumps(
+                {name: _format_value(value) for name, value in zip(columns, row)},
+                ensure_ascii=False,
+            )
+            for row in rows
+        ]
+        return ("\n".join(lines) + "\n").encode() if lines else b""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_format_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def _stream_query(query: Select, columns: list[str], fmt: str, compress: bool) -> AsyncIterator[bytes]:
+    """使用服务端游标分批读取并编码，内存占用与总行数无关
+
+    会话在生成器内创建，随数据发送结束关闭；认证使用独立的短会话 (get_current_admin_short)，
+    yield 依赖要到 StreamingResponse 发送完毕才关闭，不能在导出期间占用连接。
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # 31 = gzip 格式
+    header = True
+
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            chunk = _encode_rows(rows, columns, fmt, header)
+            header = False
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    if header:
+        # 没有数据时 CSV 仍输出表头
+        chunk = _encode_rows([], columns, fmt, header=True)
+        yield compressor.compress(chunk) + compressor.flush() if compressor else chunk
+    elif compressor:
+        yield compressor.flush()
+
+
+def _export_response(query: Select, name: str, fmt: str, compress: bool) -> StreamingResponse:
+    """构建流式下载响应"""
+    columns = [column.name for column in query.selected_columns]
+    filename = f"{name}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/csv; charset=utf-8"
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        _stream_query(query, columns, fmt, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ---------- API ----------
+
+@router.get("/users")
+async def export_users(
+    format: ExportFormat = Query("csv", description="导出格式"),
+    gzip: bool = Query(False, description="是否 gzip 压缩"),
+    invite_code: Optional[str] = Query(None, description="按来源链接筛选"),
+    since: Optional[datetime] = Query(None, description="首次使用时间起 (含)"),
+    until: Optional[datetime] = Query(None, description="首次使用时间止 (不含)"),
+    _: None = Depends(get_current_admin_short)
+):
+    """导出用户"""
+    query = (
+        select(
+            User.id,
+            User.telegram_id,
+            User.username,
+            User.first_name,
+            User.last_name,
+            User.invite_code,
+            InviteLink.name.label("invite_link_name"),
+            User.first_seen,
+            User.last_active,
+        )
+        .outerjoin(InviteLink, InviteLink.code == User.invite_code)
+        .order_by(User.id)
+    )
+    if invite_code:
+        query = query.where(User.invite_code == invite_code)
+    if since:
+        query = query.where(User.first_seen >= since)
+    if until:
+        query = query.where(User.first_seen < until)
+
+    return _export_response(query, "users", format, gzip)
+
+
+@router.get("/statistics")
+async def export_statistics(
+    format: ExportFormat = Query("csv", description="导出格式"),
+    gzip: bool = Query(False, description="是否 gzip 压缩"),
+    invite_code: Optional[str] = Query(None, description="按邀请码筛选"),
+    event_type: Optional[str] = Query(None, description="按事件类型筛选"),
+    since: Optional[datetime] = Query(None, description="事件时间起 (含)"),
+    until: Optional[datetime] = Query(None, description="事件时间止 (不含)"),
+    _: None = Depends(get_current_admin_short)
+):
+    """导出统计事件 (按时间范围筛选时只访问对应分区)"""
+    query = select(
+        Statistics.id,
+        Statistics.event_type,
+        Statistics.user_id,
+        Statistics.invite_code,
+        Statistics.resource_id,
+        Statistics.sponsor_id,
+        Statistics.page_number,
+        Statistics.created_at,
+    ).order_by(Statistics.created_at, Statistics.id)
+    if invite_code:
+        query = query.where(Statistics.invite_code == invite_code)
+    if event_type:
+        query = query.where(Statistics.event_type == event_type)
+    if since:
+        query = query.where(Statistics.created_at >= since)
+    if until:
+        query = query.where(Statistics.created_at < until)
+
+    return _export_response(query, "statistics", format, gzip)
@@ -75,7 +75,7 @@ async def list_invite_links(
     for link in links:
         # 统计用户数
         user_count_result = await db.execute(
-            select(func.count()).select_from(User).where(User.invite_code == link.code)
+            select(func.count()).select_from(User).where(User.invite_link_id == link.id)
         )
         user_count = user_count_result.scalar() or 0
         
@@ -157,7 +157,7 @@ async def get_invite_link(
     
     # 统计用户数
     user_count_result = await db.execute(
-        select(func.count()).select_from(User).where(User.invite_code == link.code)
+        select(func.count()).select_from(User).where(User.invite_link_id == link.id)
     )
     user_count = user_count_result.scalar() or 0
     
@@ -397,6 +397,7 @@ async def unlink_ad_group_from_invite_link(
 
 from fastapi import UploadFile, File
 from app.services.upload import get_upload_service
+from app.services.media_assets import upload_with_dedup
 from app.config import settings
 import uuid
 
@@ -459,15 +460,17 @@ async def create_sponsor_with_media(
         
         upload_service = get_upload_service()
         try:
-            telegram_file_id = await upload_service.upload_and_get_file_id(
+            asset = await upload_with_dedup(
+                db,
+                upload_service,
                 file_content=file_content,
                 filename=unique_filename,
                 file_type=media_type,
                 caption=f"广告素材: {title}",
-                delete_after=True,
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
+        telegram_file_id = asset.telegram_file_id
     
     sponsor = Sponsor(
         ad_group_id=ad_group_id,
@@ -595,15 +598,17 @@ async def create_sponsor_with_media_group(
         unique_filename = f"{uuid.uuid4()}.{ext}"
         
         try:
-            telegram_file_id = await upload_service.upload_and_get_file_id(
+            asset = await upload_with_dedup(
+                db,
+                upload_service,
                 file_content=file_content,
                 filename=unique_filename,
                 file_type=file_type,
                 caption=f"广告素材: {title}" if i == 0 else None,
-                delete_after=True,
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
+        telegram_file_id = asset.telegram_file_id
         
         # 如果只有一个文件,也保存到 telegram_file_id
         if len(files) == 1:
@@ -614,6 +619,8 @@ async def create_sponsor_with_media_group(
             sponsor_id=sponsor.id,
             file_type=file_type,
             telegram_file_id=telegram_file_id,
+            file_unique_id=asset.file_unique_id,
+            asset_id=asset.id,
             file_size=file_size,
             position=i,
         )
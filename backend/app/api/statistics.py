@@ -2,16 +2,30 @@
 统计数据 API
 统计查询和报表
 """
-from typing import List, Optional
+import asyncio
+import json
+from functools import partial
+from typing import List, Optional, Literal
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, func, and_
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from app.database import get_db
-from app.models import InviteLink, User, Statistics, Sponsor
-from app.api.auth import get_current_admin
+from app.models import InviteLink, User, Sponsor
+from app.api.auth import get_current_admin, get_current_admin_stream
+from app.services.stats_query import (
+    stats_query_service,
+    empty_link_metrics,
+    empty_sponsor_metrics,
+    calc_ctr,
+    FUNNEL_STEPS,
+)
+from app.services.timeseries import timeseries_service, format_bucket
+from app.services.stats_cache import stats_cache
+from app.services.live_stats import live_stats_service
+from app.services.cohort import cohort_service
 
 
 router = APIRouter()
@@ -61,14 +75,25 @@ class DailyStats(BaseModel):
     ad_clicks: int
 
 
+class AdDailyStats(BaseModel):
+    """广告每日统计"""
+    date: str
+    views: int
+    clicks: int
+    ctr: float
+
+
 # ---------- API ----------
 
 @router.get("/overview", response_model=OverviewStats)
 async def get_overview_stats(
-    db: AsyncSession = Depends(get_db),
     _: None = Depends(get_current_admin)
 ):
     """获取概览统计"""
+    return await stats_cache.get_or_compute(("overview",), _compute_overview_stats)
+
+
+async def _compute_overview_stats(db: AsyncSession) -> OverviewStats:
     now = datetime.utcnow()
     today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     
@@ -85,22 +110,13 @@ async def get_overview_stats(
     )
     users_today = users_today_result.scalar() or 0
     
-    # 总浏览量
-    total_views_result = await db.execute(
-        select(func.count()).select_from(Statistics)
-        .where(Statistics.event_type == "page_view")
-    )
-    total_views = total_views_result.scalar() or 0
-    
-    # 今日浏览量
-    views_today_result = await db.execute(
-        select(func.count()).select_from(Statistics)
-        .where(and_(
-            Statistics.event_type == "page_view",
-            Statistics.created_at >= today_start
-        ))
-    )
-    views_today = views_today_result.scalar() or 0
+    # 总浏览量 / 今日浏览量 (已结束日期读汇总表)
+    view_counts = await stats_query_service.count_events(db, [
+        ("total_views", "page_view", None),
+        ("views_today", "page_view", today_start),
+    ])
+    total_views = view_counts[None]["total_views"]
+    views_today = view_counts[None]["views_today"]
     
     # 活跃链接数
     active_links_result = await db.execute(
@@ -128,94 +144,36 @@ async def get_overview_stats(
 
 @router.get("/links", response_model=List[LinkStats])
 async def get_link_stats(
-    db: AsyncSession = Depends(get_db),
     _: None = Depends(get_current_admin)
 ):
     """获取所有邀请链接统计"""
-    now = datetime.utcnow()
-    date_7d = now - timedelta(days=7)
-    date_30d = now - timedelta(days=30)
-    
+    return await stats_cache.get_or_compute(("links",), _compute_link_stats)
+
+
+async def _compute_link_stats(db: AsyncSession) -> List[LinkStats]:
     # 获取所有邀请链接
     links_result = await db.execute(select(InviteLink))
     links = links_result.scalars().all()
     
+    # 所有链接的指标: 每张表一次分组查询
+    metrics = await stats_query_service.get_link_metrics(db)
+    
     stats = []
     for link in links:
-        # 用户统计
-        users_7d_result = await db.execute(
-            select(func.count()).select_from(User)
-            .where(and_(User.invite_code == link.code, User.first_seen >= date_7d))
-        )
-        users_7d = users_7d_result.scalar() or 0
-        
-        users_30d_result = await db.execute(
-            select(func.count()).select_from(User)
-            .where(and_(User.invite_code == link.code, User.first_seen >= date_30d))
-        )
-        users_30d = users_30d_result.scalar() or 0
-        
-        users_total_result = await db.execute(
-            select(func.count()).select_from(User)
-            .where(User.invite_code == link.code)
-        )
-        users_total = users_total_result.scalar() or 0
-        
-        # 浏览量统计
-        views_7d_result = await db.execute(
-            select(func.count()).select_from(Statistics)
-            .where(and_(
-                Statistics.invite_code == link.code,
-                Statistics.event_type == "page_view",
-                Statistics.created_at >= date_7d
-            ))
-        )
-        views_7d = views_7d_result.scalar() or 0
-        
-        views_30d_result = await db.execute(
-            select(func.count()).select_from(Statistics)
-            .where(and_(
-                Statistics.invite_code == link.code,
-                Statistics.event_type == "page_view",
-                Statistics.created_at >= date_30d
-            ))
-        )
-        views_30d = views_30d_result.scalar() or 0
-        
-        # 广告统计
-        ad_views_7d_result = await db.execute(
-            select(func.count()).select_from(Statistics)
-            .where(and_(
-                Statistics.invite_code == link.code,
-                Statistics.event_type == "ad_view",
-                Statistics.created_at >= date_7d
-            ))
-        )
-        ad_views_7d = ad_views_7d_result.scalar() or 0
-        
-        ad_clicks_7d_result = await db.execute(
-            select(func.count()).select_from(Statistics)
-            .where(and_(
-                Statistics.invite_code == link.code,
-                Statistics.event_type == "ad_click",
-                Statistics.created_at >= date_7d
-            ))
-        )
-        ad_clicks_7d = ad_clicks_7d_result.scalar() or 0
-        
-        ctr = (ad_clicks_7d / ad_views_7d * 100) if ad_views_7d > 0 else 0
+        link_metrics = metrics.get(link.code) or empty_link_metrics()
+        ctr = calc_ctr(link_metrics["ad_clicks_7d"], link_metrics["ad_views_7d"])
         
         stats.append(LinkStats(
             link_id=link.id,
             link_name=link.name,
             link_code=link.code,
-            users_7d=users_7d,
-            users_30d=users_30d,
-            users_total=users_total,
-            views_7d=views_7d,
-            views_30d=views_30d,
-            ad_views_7d=ad_views_7d,
-            ad_clicks_7d=ad_clicks_7d,
+            users_7d=link_metrics["users_7d"],
+            users_30d=link_metrics["users_30d"],
+            users_total=link_metrics["users_total"],
+            views_7d=link_metrics["views_7d"],
+            views_30d=link_metrics["views_30d"],
+            ad_views_7d=link_metrics["ad_views_7d"],
+            ad_clicks_7d=link_metrics["ad_clicks_7d"],
             ctr=round(ctr, 2),
         ))
     
@@ -224,35 +182,26 @@ async def get_link_stats(
 
 @router.get("/ads", response_model=List[AdStats])
 async def get_ad_stats(
-    db: AsyncSession = Depends(get_db),
     _: None = Depends(get_current_admin)
 ):
     """获取广告统计"""
+    return await stats_cache.get_or_compute(("ads",), _compute_ad_stats)
+
+
+async def _compute_ad_stats(db: AsyncSession) -> List[AdStats]:
     # 获取所有广告
     sponsors_result = await db.execute(select(Sponsor))
     sponsors = sponsors_result.scalars().all()
     
+    # 所有广告的展示/点击: 一次分组查询
+    metrics = await stats_query_service.get_sponsor_metrics(db)
+    
     stats = []
     for sponsor in sponsors:
-        views_result = await db.execute(
-            select(func.count()).select_from(Statistics)
-            .where(and_(
-                Statistics.sponsor_id == sponsor.id,
-                Statistics.event_type == "ad_view"
-            ))
-        )
-        views_total = views_result.scalar() or 0
-        
-        clicks_result = await db.execute(
-            select(func.count()).select_from(Statistics)
-            .where(and_(
-                Statistics.sponsor_id == sponsor.id,
-                Statistics.event_type == "ad_click"
-            ))
-        )
-        clicks_total = clicks_result.scalar() or 0
-        
-        ctr = (clicks_total / views_total * 100) if views_total > 0 else 0
+        sponsor_metrics = metrics.get(sponsor.id) or empty_sponsor_metrics()
+        views_total = sponsor_metrics["views_total"]
+        clicks_total = sponsor_metrics["clicks_total"]
+        ctr = calc_ctr(clicks_total, views_total)
         
         stats.append(AdStats(
             sponsor_id=sponsor.id,
@@ -269,58 +218,98 @@ async def get_ad_stats(
 async def get_daily_stats(
     days: int = Query(default=7, ge=1, le=90),
     invite_code: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    invite_codes: Optional[List[str]] = Query(default=None),
+    granularity: Literal["day", "hour"] = "day",
+    tz_offset: int = Query(default=0, ge=-720, le=840, description="时区偏移 (分钟)"),
     _: None = Depends(get_current_admin)
 ):
-    """获取每日统计数据"""
-    now = datetime.utcnow()
+    """获取每日统计数据 (按小时粒度时为最近 days 天的每小时数据)"""
+    codes = set(invite_codes or [])
+    if invite_code:
+        codes.add(invite_code)
+    codes = tuple(sorted(codes)) or None
     
-    stats = []
-    for i in range(days):
-        date = now - timedelta(days=i)
-        date_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        date_end = date_start + timedelta(days=1)
-        
-        # 用户数
-        user_query = select(func.count()).select_from(User).where(and_(
-            User.first_seen >= date_start,
-            User.first_seen < date_end
-        ))
-        if invite_code:
-            user_query = user_query.where(User.invite_code == invite_code)
-        users_result = await db.execute(user_query)
-        users = users_result.scalar() or 0
-        
-        # 浏览量
-        views_query = select(func.count()).select_from(Statistics).where(and_(
-            Statistics.event_type == "page_view",
-            Statistics.created_at >= date_start,
-            Statistics.created_at < date_end
-        ))
-        if invite_code:
-            views_query = views_query.where(Statistics.invite_code == invite_code)
-        views_result = await db.execute(views_query)
-        views = views_result.scalar() or 0
-        
-        # 广告点击
-        clicks_query = select(func.count()).select_from(Statistics).where(and_(
-            Statistics.event_type == "ad_click",
-            Statistics.created_at >= date_start,
-            Statistics.created_at < date_end
-        ))
-        if invite_code:
-            clicks_query = clicks_query.where(Statistics.invite_code == invite_code)
-        clicks_result = await db.execute(clicks_query)
-        ad_clicks = clicks_result.scalar() or 0
-        
-        stats.append(DailyStats(
-            date=date_start.strftime('%Y-%m-%d'),
-            users=users,
-            views=views,
-            ad_clicks=ad_clicks,
-        ))
+    return await stats_cache.get_or_compute(
+        ("daily", days, codes, granularity, tz_offset),
+        partial(_compute_daily_stats, days=days, codes=codes, granularity=granularity, tz_offset=tz_offset),
+    )
+
+
+async def _compute_daily_stats(
+    db: AsyncSession,
+    days: int,
+    codes: Optional[tuple[str, ...]],
+    granularity: str,
+    tz_offset: int,
+) -> List[DailyStats]:
+    periods = days * 24 if granularity == "hour" else days
+    start, end = timeseries_service.local_range(periods, granularity, tz_offset)
     
-    return stats
+    users = await timeseries_service.user_series(
+        db, "users", start, end, granularity, tz_offset, invite_codes=codes
+    )
+    events = await timeseries_service.event_series(
+        db,
+        [("views", "page_view"), ("ad_clicks", "ad_click")],
+        start, end, granularity, tz_offset,
+        invite_codes=codes,
+    )
+    series = timeseries_service.fill(
+        [users, events], ["users", "views", "ad_clicks"], start, end, granularity
+    )
+    
+    # 最新的在前
+    return [
+        DailyStats(date=format_bucket(bucket, granularity), **values)
+        for bucket, values in reversed(series)
+    ]
+
+
+@router.get("/ads/daily", response_model=List[AdDailyStats])
+async def get_ad_daily_stats(
+    sponsor_id: Optional[int] = None,
+    days: int = Query(default=7, ge=1, le=90),
+    granularity: Literal["day", "hour"] = "day",
+    tz_offset: int = Query(default=0, ge=-720, le=840, description="时区偏移 (分钟)"),
+    _: None = Depends(get_current_admin)
+):
+    """获取广告展示 / 点击 / 点击率时间序列 (不指定广告时为全部广告)"""
+    return await stats_cache.get_or_compute(
+        ("ads_daily", sponsor_id, days, granularity, tz_offset),
+        partial(
+            _compute_ad_daily_stats,
+            sponsor_id=sponsor_id, days=days, granularity=granularity, tz_offset=tz_offset,
+        ),
+    )
+
+
+async def _compute_ad_daily_stats(
+    db: AsyncSession,
+    sponsor_id: Optional[int],
+    days: int,
+    granularity: str,
+    tz_offset: int,
+) -> List[AdDailyStats]:
+    periods = days * 24 if granularity == "hour" else days
+    start, end = timeseries_service.local_range(periods, granularity, tz_offset)
+    
+    events = await timeseries_service.event_series(
+        db,
+        [("views", "ad_view"), ("clicks", "ad_click")],
+        start, end, granularity, tz_offset,
+        sponsor_ids=[sponsor_id] if sponsor_id is not None else None,
+    )
+    series = timeseries_service.fill([events], ["views", "clicks"], start, end, granularity)
+    
+    return [
+        AdDailyStats(
+            date=format_bucket(bucket, granularity),
+            views=values["views"],
+            clicks=values["clicks"],
+            ctr=round(calc_ctr(values["clicks"], values["views"]), 2),
+        )
+        for bucket, values in reversed(series)
+    ]
 
 
 class FunnelStep(BaseModel):
@@ -336,87 +325,163 @@ class FunnelStats(BaseModel):
     """漏斗统计"""
     total_starts: int
     steps: List[FunnelStep]
+    approximate: bool = False  # 是否为 HyperLogLog 近似值
 
 
 @router.get("/funnel", response_model=FunnelStats)
 async def get_funnel_stats(
     invite_code: Optional[str] = None,
     days: int = Query(default=7, ge=1, le=90),
-    db: AsyncSession = Depends(get_db),
+    approximate: bool = Query(default=False, description="使用汇总草图近似计算"),
     _: None = Depends(get_current_admin)
 ):
     """获取用户行为漏斗统计"""
+    return await stats_cache.get_or_compute(
+        ("funnel", invite_code, days, approximate),
+        partial(_compute_funnel_stats, invite_code=invite_code, days=days, approximate=approximate),
+    )
+
+
+async def _compute_funnel_stats(
+    db: AsyncSession,
+    invite_code: Optional[str],
+    days: int,
+    approximate: bool,
+) -> FunnelStats:
     now = datetime.utcnow()
     since_date = now - timedelta(days=days)
     
-    # 构建基础过滤条件
-    base_filter = [Statistics.created_at >= since_date]
-    if invite_code:
-        base_filter.append(Statistics.invite_code == invite_code)
+    counts, is_approximate = await stats_query_service.get_funnel(
+        db, since_date, invite_code=invite_code, approximate=approximate
+    )
     
     # 第 0 步: 启动用户 (user_start 事件)
-    starts_result = await db.execute(
-        select(func.count(func.distinct(Statistics.user_id)))
-        .select_from(Statistics)
-        .where(and_(
-            Statistics.event_type == "user_start",
-            *base_filter
-        ))
-    )
-    total_starts = starts_result.scalar() or 0
+    total_starts = counts.get(("user_start", 0), 0)
     
-    # 获取每个页面的用户数
     steps = []
     prev_users = total_starts
     
-    for page_num in range(1, 6):  # 页面 1-5
-        page_users_result = await db.execute(
-            select(func.count(func.distinct(Statistics.user_id)))
-            .select_from(Statistics)
-            .where(and_(
-                Statistics.event_type == "page_view",
-                Statistics.page_number == page_num,
-                *base_filter
-            ))
-        )
-        page_users = page_users_result.scalar() or 0
+    for event_type, page_num in FUNNEL_STEPS[1:]:
+        users = counts.get((event_type, page_num), 0)
         
-        rate = (page_users / prev_users * 100) if prev_users > 0 else 0
-        total_rate = (page_users / total_starts * 100) if total_starts > 0 else 0
+        rate = (users / prev_users * 100) if prev_users > 0 else 0
+        total_rate = (users / total_starts * 100) if total_starts > 0 else 0
         
         steps.append(FunnelStep(
-            step=f"第 {page_num} 页",
-            page=page_num,
-            users=page_users,
+            step=f"第 {page_num} 页" if event_type == "page_view" else "预览结束",
+            page=page_num if event_type == "page_view" else 6,
+            users=users,
             rate=round(rate, 1),
             total_rate=round(total_rate, 1),
         ))
         
-        prev_users = page_users
+        prev_users = users
     
-    # 预览结束
-    preview_end_result = await db.execute(
-        select(func.count(func.distinct(Statistics.user_id)))
-        .select_from(Statistics)
-        .where(and_(
-            Statistics.event_type == "preview_end",
-            *base_filter
-        ))
+    return FunnelStats(
+        total_starts=total_starts,
+        steps=steps,
+        approximate=is_approximate,
     )
-    preview_end_users = preview_end_result.scalar() or 0
+
+
+class CohortStats(BaseModel):
+    """用户群组留存"""
+    cohort: str  # 群组开始日期
+    size: int
+    retained: List[int]  # 第 N 天活跃的用户数
+    rates: List[float]  # 第 N 天留存率 (%)
+
+
+@router.get("/cohorts", response_model=List[CohortStats])
+async def get_cohort_stats(
+    days: int = Query(default=28, ge=1, le=180, description="群组首次使用日期范围 (天)"),
+    granularity: Literal["day", "week"] = "day",
+    max_offset: int = Query(default=30, ge=0, le=90, description="最大留存天数"),
+    invite_code: Optional[str] = None,
+    invite_codes: Optional[List[str]] = Query(default=None),
+    _: None = Depends(get_current_admin)
+):
+    """获取用户群组留存矩阵 (按首次使用日期与来源链接划分，仅包含已结束的日期)"""
+    codes = set(invite_codes or [])
+    if invite_code:
+        codes.add(invite_code)
+    codes = tuple(sorted(codes)) or None
     
-    rate = (preview_end_users / prev_users * 100) if prev_users > 0 else 0
-    total_rate = (preview_end_users / total_starts * 100) if total_starts > 0 else 0
+    return await stats_cache.get_or_compute(
+        ("cohorts", days, granularity, max_offset, codes),
+        partial(_compute_cohort_stats, days=days, granularity=granularity, max_offset=max_offset, codes=codes),
+    )
+
+
+async def _compute_cohort_stats(
+    db: AsyncSession,
+    days: int,
+    granularity: str,
+    max_offset: int,
+    codes: Optional[tuple[str, ...]],
+) -> List[CohortStats]:
+    until = datetime.utcnow().date()
+    since = until - timedelta(days=days)
+    if granularity == "week":
+        since -= timedelta(days=since.weekday())
     
-    steps.append(FunnelStep(
-        step="预览结束",
-        page=6,
-        users=preview_end_users,
-        rate=round(rate, 1),
-        total_rate=round(total_rate, 1),
-    ))
+    cohorts = await cohort_service.get_retention(
+        db, since, until, max_offset,
+        invite_codes=list(codes) if codes else None,
+        weekly=granularity == "week",
+    )
     
-    return FunnelStats(
-        total_starts=total_starts,
-        steps=steps,
+    # 最新的在前
+    return [
+        CohortStats(
+            cohort=cohort["cohort"].isoformat(),
+            size=cohort["size"],
+            retained=cohort["retained"],
+            rates=[
+                round(n / cohort["size"] * 100, 2) if cohort["size"] else 0.0
+                for n in cohort["retained"]
+            ],
+        )
+        for cohort in reversed(cohorts)
+    ]
+
+
+@router.get("/cache")
+async def get_cache_metrics(
+    _: None = Depends(get_current_admin)
+):
+    """获取统计缓存命中率等指标"""
+    return stats_cache.metrics()
+
+
+@router.delete("/cache")
+async def clear_cache(
+    _: None = Depends(get_current_admin)
+):
+    """清空统计缓存"""
+    stats_cache.clear()
+    return {"message": "统计缓存已清空"}
+
+
+@router.get("/live")
+async def stream_live_stats(
+    request: Request,
+    interval: int = Query(2, ge=1, le=60, description="推送间隔 (秒)"),
+    _: None = Depends(get_current_admin_stream)
+):
+    """实时计数 (SSE)
+
+    推送最近 1 分钟 / 1 小时 / 1 天的事件计数快照，数据来自内存计数器，
+    不查询数据库。EventSource 可通过 access_token 查询参数传递 Token。
+    """
+    async def events():
+        while not await request.is_disconnected():
+            data = json.dumps(live_stats_service.snapshot(), ensure_ascii=False)
+            yield f"event: snapshot\ndata: {data}\n\n"
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
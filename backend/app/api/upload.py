@@ -12,6 +12,7 @@ from app.database import get_db
 from app.models import Resource, MediaFile, InviteLink
 from app.api.auth import get_current_admin
 from app.services.upload import get_upload_service
+from app.services.media_assets import upload_with_dedup
 from app.config import settings
 
 
@@ -76,18 +77,20 @@ async def upload_file(
     ext = file.filename.split(".")[-1] if "." in file.filename else ""
     unique_filename = f"{uuid.uuid4()}.{ext}"
     
-    # 上传到 Telegram
+    # 上传到 Telegram (内容相同的文件直接复用)
     upload_service = get_upload_service()
     try:
-        telegram_file_id = await upload_service.upload_and_get_file_id(
+        asset = await upload_with_dedup(
+            db,
+            upload_service,
             file_content=file_content,
             filename=unique_filename,
             file_type=file_type,
             caption=title,
-            delete_after=True,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"上传到 Telegram 失败: {str(e)}")
+    telegram_file_id = asset.telegram_file_id
     
     # 创建资源记录
     # 获取最大排序值
@@ -125,6 +128,8 @@ async def upload_file(
         resource_id=resource.id,
         file_type=file_type,
         telegram_file_id=telegram_file_id,
+        file_unique_id=asset.file_unique_id,
+        asset_id=asset.id,
         file_size=file_size,
         position=0,
     )
@@ -213,21 +218,25 @@ async def upload_media_group(
         unique_filename = f"{uuid.uuid4()}.{ext}"
         
         try:
-            telegram_file_id = await upload_service.upload_and_get_file_id(
+            asset = await upload_with_dedup(
+                db,
+                upload_service,
                 file_content=file_content,
                 filename=unique_filename,
                 file_type=file_type,
                 caption=title if i == 0 else None,
-                delete_after=True,
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
+        telegram_file_id = asset.telegram_file_id
         
         # 创建媒体文件记录
         media_file = MediaFile(
             resource_id=resource.id,
             file_type=file_type,
             telegram_file_id=telegram_file_id,
+            file_unique_id=asset.file_unique_id,
+            asset_id=asset.id,
             file_size=file_size,
             position=i,
         )
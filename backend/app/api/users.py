@@ -7,11 +7,11 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy import select, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, joinedload
 from pydantic import BaseModel
 
 from app.database import get_db
-from app.models import User, UserSession, InviteLink
+from app.models import User, UserSession, InviteLink, UserEngagement
 from app.api.auth import get_current_admin
 
 
@@ -35,6 +35,12 @@ class UserResponse(BaseModel):
     # 会话信息
     current_page: Optional[int] = None
     wait_count: Optional[int] = None
+    # 行为计数
+    page_views: int = 0
+    ad_views: int = 0
+    ad_clicks: int = 0
+    preview_ends: int = 0
+    last_event_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -48,6 +54,19 @@ class UserListResponse(BaseModel):
     page_size: int
 
 
+def engagement_fields(engagement: Optional[UserEngagement]) -> dict:
+    """行为计数字段"""
+    if engagement is None:
+        return {}
+    return {
+        "page_views": engagement.page_views,
+        "ad_views": engagement.ad_views,
+        "ad_clicks": engagement.ad_clicks,
+        "preview_ends": engagement.preview_ends,
+        "last_event_at": engagement.last_event_at,
+    }
+
+
 # ---------- API ----------
 
 @router.get("", response_model=UserListResponse)
@@ -63,7 +82,8 @@ async def list_users(
     # 构建查询
     query = select(User).options(
         selectinload(User.session),
-        selectinload(User.invite_link)
+        selectinload(User.invite_link),
+        selectinload(User.engagement)
     )
     
     # 搜索条件
@@ -79,7 +99,9 @@ async def list_users(
     
     # 来源链接筛选
     if invite_code:
-        query = query.where(User.invite_code == invite_code)
+        query = query.where(
+            User.invite_link_id == select(InviteLink.id).where(InviteLink.code == invite_code).scalar_subquery()
+        )
     
     # 统计总数
     count_query = select(func.count()).select_from(query.subquery())
@@ -120,7 +142,8 @@ async def list_users(
             first_seen=user.first_seen,
             last_active=user.last_active,
             current_page=current_page,
-            wait_count=wait_count
+            wait_count=wait_count,
+            **engagement_fields(user.engagement)
         ))
     
     return UserListResponse(
@@ -142,8 +165,9 @@ async def get_user(
         select(User)
         .where(User.telegram_id == telegram_id)
         .options(
-            selectinload(User.session),
-            selectinload(User.invite_link)
+            joinedload(User.session),
+            joinedload(User.invite_link),
+            joinedload(User.engagement)
         )
     )
     user = result.scalar_one_or_none()
@@ -178,5 +202,6 @@ async def get_user(
         first_seen=user.first_seen,
         last_active=user.last_active,
         current_page=current_page,
-        wait_count=wait_count
+        wait_count=wait_count,
+        **engagement_fields(user.engagement)
     )
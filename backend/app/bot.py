@@ -3,12 +3,12 @@ Telegram Bot 入口
 """
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
-from aiogram.enums import ParseMode
-from aiogram.client.default import DefaultBotProperties
+from aiogram import Dispatcher
 
-from app.config import settings
 from app.database import init_db, close_db
+from app.services.stats_partition import stats_partition_service
+from app.services.bot_failover import bot_failover
+from app.services.telegram_clients import telegram_clients
 from app.bot_handlers.start import router as start_router
 from app.bot_handlers.pagination import router as pagination_router
 from app.bot_handlers.stats_group import router as stats_router
@@ -30,14 +30,9 @@ async def main():
     
     # 初始化数据库
     await init_db()
+    await stats_partition_service.ensure_partitions()
     logger.info("数据库初始化完成")
     
-    # 创建 Bot 实例
-    bot = Bot(
-        token=settings.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-    
     # 创建调度器
     dp = Dispatcher()
     
@@ -48,13 +43,13 @@ async def main():
     dp.include_router(service_router)
     dp.include_router(channel_router)
     
-    # 启动轮询
+    # 启动轮询 (按备份配置选择主/备份 Bot，切换时热切换)
     logger.info("Bot 启动成功,开始轮询...")
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        await bot_failover.run(dp, allowed_updates=dp.resolve_used_update_types())
     finally:
         await close_db()
-        await bot.session.close()
+        await telegram_clients.close()
         logger.info("Bot 已关闭")
 
 
@@ -14,6 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import AsyncSessionLocal
 from app.models import InviteLink, Resource, MediaFile
+from app.services.media_assets import get_or_create_asset, is_duplicate_in_link
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -37,13 +38,62 @@ async def get_invite_link_by_channel(channel_id: int) -> InviteLink | None:
         return result.scalar_one_or_none()
 
 
+def extract_media_info(msg: Message) -> tuple[str | None, str | None, str | None]:
+    """从消息中提取 (file_id, file_unique_id, file_type)"""
+    if msg.photo:
+        # 获取最大尺寸的图片
+        photo = msg.photo[-1]
+        return photo.file_id, photo.file_unique_id, "photo"
+    elif msg.video:
+        return msg.video.file_id, msg.video.file_unique_id, "video"
+    elif msg.animation:
+        return msg.animation.file_id, msg.animation.file_unique_id, "animation"
+    elif msg.document:
+        # 检查是否为图片或视频文档
+        mime = msg.document.mime_type or ""
+        if mime.startswith("image/"):
+            return msg.document.file_id, msg.document.file_unique_id, "photo"
+        elif mime.startswith("video/"):
+            return msg.document.file_id, msg.document.file_unique_id, "video"
+    return None, None, None
+
+
 async def create_resource_from_message(
     session: AsyncSession,
     invite_link_id: int,
     messages: List[Message],
     media_type: str
 ):
-    """从消息创建资源"""
+    """从消息创建资源
+    
+    相同文件只保存一个媒体资产；如果所有文件都已被该链接引用（重复转发），则跳过。
+    """
+    # 提取媒体信息并登记资产
+    media_items = []
+    for i, msg in enumerate(messages):
+        file_id, file_unique_id, file_type = extract_media_info(msg)
+        if not file_id or not file_type:
+            continue
+        
+        asset = await get_or_create_asset(
+            session,
+            file_unique_id=file_unique_id,
+            file_type=file_type,
+            telegram_file_id=file_id,
+            source_channel_id=msg.chat.id if msg.chat else None,
+            source_message_id=msg.message_id,
+        )
+        media_items.append((i, msg, file_id, file_unique_id, file_type, asset))
+    
+    if not media_items:
+        await session.commit()
+        return None
+    
+    if await is_duplicate_in_link(session, invite_link_id, [item[5].id for item in media_items]):
+        await session.commit()
+        logger.info(f"跳过重复资源: invite_link_id={invite_link_id}, files={len(media_items)}")
+        return None
+    
     # 获取描述文本（从第一条消息的 caption 或 text）
     first_msg = messages[0]
     description = first_msg.caption or first_msg.text or None
@@ -68,49 +118,19 @@ async def create_resource_from_message(
     session.add(resource)
     await session.flush()
     
-    # 创建媒体文件
-    for i, msg in enumerate(messages):
-        file_id = None
-        file_unique_id = None
-        file_type = None
-        
-        if msg.photo:
-            # 获取最大尺寸的图片
-            photo = msg.photo[-1]
-            file_id = photo.file_id
-            file_unique_id = photo.file_unique_id
-            file_type = "photo"
-        elif msg.video:
-            file_id = msg.video.file_id
-            file_unique_id = msg.video.file_unique_id
-            file_type = "video"
-        elif msg.animation:
-            file_id = msg.animation.file_id
-            file_unique_id = msg.animation.file_unique_id
-            file_type = "animation"
-        elif msg.document:
-            # 检查是否为图片或视频文档
-            mime = msg.document.mime_type or ""
-            if mime.startswith("image/"):
-                file_id = msg.document.file_id
-                file_unique_id = msg.document.file_unique_id
-                file_type = "photo"
-            elif mime.startswith("video/"):
-                file_id = msg.document.file_id
-                file_unique_id = msg.document.file_unique_id
-                file_type = "video"
-        
-        if file_id and file_type:
-            media_file = MediaFile(
-                resource_id=resource.id,
-                file_type=file_type,
-                telegram_file_id=file_id,
-                file_unique_id=file_unique_id,  # 保存 file_unique_id 用于备份
-                source_channel_id=msg.chat.id if msg.chat else None,  # 保存来源频道
-                source_message_id=msg.message_id,  # 保存来源消息 ID
-                position=i,
-            )
-            session.add(media_file)
+    # 创建媒体文件（引用资产）
+    for i, msg, file_id, file_unique_id, file_type, asset in media_items:
+        media_file = MediaFile(
+            resource_id=resource.id,
+            file_type=file_type,
+            telegram_file_id=file_id,
+            file_unique_id=file_unique_id,  # 保存 file_unique_id 用于备份
+            asset_id=asset.id,
+            source_channel_id=msg.chat.id if msg.chat else None,  # 保存来源频道
+            source_message_id=msg.message_id,  # 保存来源消息 ID
+            position=i,
+        )
+        session.add(media_file)
     
     await session.commit()
     logger.info(f"已采集资源: invite_link_id={invite_link_id}, type={media_type}, files={len(messages)}")
@@ -8,9 +8,10 @@ from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBut
 from sqlalchemy import select, func
 
 from app.database import get_db_context
-from app.models import User, UserSession, InviteLink, Resource, MediaFile, Sponsor, AdGroup, InviteLinkAdGroup, Statistics
+from app.models import User, UserSession, InviteLink, Resource, MediaFile, Sponsor, AdGroup, InviteLinkAdGroup
 from app.config import settings
 from app.services.backup_sync import backup_sync_service
+from app.services.events import record_event
 
 
 router = Router()
@@ -126,14 +127,15 @@ async def handle_next_page(callback: CallbackQuery, bot: Bot):
             session.current_ad_index = (session.current_ad_index + 1)
             
             # 记录统计
-            stat = Statistics(
+            await record_event(
+                db,
                 event_type="page_view",
                 user_id=user_id,
                 invite_code=session.invite_code,
+                invite_link_id=invite_link.id,
                 resource_id=resource.id,
                 page_number=current_page + 1,
             )
-            db.add(stat)
             await db.commit()
             
             # 检查下一页是否是最后一页
@@ -336,13 +338,14 @@ async def send_sponsor_ad(message, db, invite_link_id: int, ad_index: int, user_
         await message.answer(ad_text, reply_markup=keyboard, parse_mode="HTML")
     
     # 记录广告展示
-    stat = Statistics(
+    await record_event(
+        db,
         event_type="ad_view",
         user_id=user_id,
         invite_code=invite_code,
+        invite_link_id=invite_link_id,
         sponsor_id=sponsor.id,
     )
-    db.add(stat)
 
 
 async def send_preview_end(message, db, user_id: int, invite_code: str):
@@ -371,12 +374,12 @@ async def send_preview_end(message, db, user_id: int, invite_code: str):
     )
     
     # 记录统计
-    stat = Statistics(
+    await record_event(
+        db,
         event_type="preview_end",
         user_id=user_id,
         invite_code=invite_code,
     )
-    db.add(stat)
 
 
 @router.callback_query(F.data.startswith("ad_click:"))
@@ -404,13 +407,13 @@ async def handle_ad_click(callback: CallbackQuery):
         invite_code = session.invite_code if session else None
         
         # 记录点击
-        stat = Statistics(
+        await record_event(
+            db,
             event_type="ad_click",
             user_id=user_id,
             invite_code=invite_code,
             sponsor_id=sponsor_id,
         )
-        db.add(stat)
         await db.commit()
         
         # 发送跳转链接
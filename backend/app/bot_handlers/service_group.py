@@ -3,13 +3,14 @@
 处理转发消息识别和用户来源查询
 """
 from datetime import datetime
+from typing import Optional
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from sqlalchemy import select
 
 from app.database import get_db_context
-from app.models import User, InviteLink, Statistics
+from app.models import User, InviteLink, UserEngagement
 from app.config import settings
 
 
@@ -64,14 +65,22 @@ async def handle_check_command(message: Message):
     await query_and_reply_user_info(message, user_id, None)
 
 
+async def get_user_with_engagement(db, user_id: int) -> tuple[Optional[User], Optional[UserEngagement]]:
+    """按主键查询用户及其行为计数 (一次查询)"""
+    result = await db.execute(
+        select(User, UserEngagement)
+        .outerjoin(UserEngagement, UserEngagement.user_id == User.telegram_id)
+        .where(User.telegram_id == user_id)
+    )
+    row = result.first()
+    return (row[0], row[1]) if row else (None, None)
+
+
 async def query_and_reply_user_info(message: Message, user_id: int, original_user):
     """查询用户信息并回复"""
     async with get_db_context() as db:
         # 查询用户
-        user_result = await db.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = user_result.scalar_one_or_none()
+        user, engagement = await get_user_with_engagement(db, user_id)
         
         if not user:
             # 用户未使用过 Bot
@@ -94,9 +103,9 @@ async def query_and_reply_user_info(message: Message, user_id: int, original_use
         
         # 获取来源名称
         source_name = "未知来源"
-        if user.invite_code:
+        if user.invite_link_id:
             link_result = await db.execute(
-                select(InviteLink).where(InviteLink.code == user.invite_code)
+                select(InviteLink).where(InviteLink.id == user.invite_link_id)
             )
             invite_link = link_result.scalar_one_or_none()
             if invite_link:
@@ -104,7 +113,11 @@ async def query_and_reply_user_info(message: Message, user_id: int, original_use
         
         # 格式化日期
         first_seen = user.first_seen.strftime('%Y-%m-%d') if user.first_seen else "未知"
-        last_active = user.last_active.strftime('%Y-%m-%d %H:%M') if user.last_active else "未知"
+        last_active_at = user.last_active
+        if engagement and engagement.last_event_at:
+            last_active_at = max(filter(None, [last_active_at, engagement.last_event_at]))
+        last_active = last_active_at.strftime('%Y-%m-%d %H:%M') if last_active_at else "未知"
+        page_views = engagement.page_views if engagement else 0
         today = datetime.now().strftime('%Y-%m-%d')
         
         # 生成备注
@@ -138,6 +151,9 @@ async def query_and_reply_user_info(message: Message, user_id: int, original_use
 ⏰ 最后活跃:
 <code>{last_active}</code>
 
+📖 浏览页数:
+<code>{page_views}</code>
+
 ━━━━━━━━━━━━━━━━
 📋 <b>客服备注</b>
 <code>{remark}</code>
@@ -160,50 +176,17 @@ async def handle_user_stats(callback):
     user_id = int(callback.data.split(":")[1])
     
     async with get_db_context() as db:
-        from sqlalchemy import func, and_
-        
-        # 获取用户
-        user_result = await db.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = user_result.scalar_one_or_none()
+        # 用户与行为计数 (按主键一次查询)
+        user, engagement = await get_user_with_engagement(db, user_id)
         
         if not user:
             await callback.answer("用户不存在")
             return
         
-        # 浏览页数
-        page_views_result = await db.execute(
-            select(func.count())
-            .select_from(Statistics)
-            .where(and_(
-                Statistics.user_id == user_id,
-                Statistics.event_type == "page_view"
-            ))
-        )
-        page_views = page_views_result.scalar() or 0
-        
-        # 广告点击次数
-        ad_clicks_result = await db.execute(
-            select(func.count())
-            .select_from(Statistics)
-            .where(and_(
-                Statistics.user_id == user_id,
-                Statistics.event_type == "ad_click"
-            ))
-        )
-        ad_clicks = ad_clicks_result.scalar() or 0
-        
-        # 是否完成预览
-        preview_end_result = await db.execute(
-            select(func.count())
-            .select_from(Statistics)
-            .where(and_(
-                Statistics.user_id == user_id,
-                Statistics.event_type == "preview_end"
-            ))
-        )
-        preview_end = preview_end_result.scalar() or 0
+        page_views = engagement.page_views if engagement else 0
+        ad_views = engagement.ad_views if engagement else 0
+        ad_clicks = engagement.ad_clicks if engagement else 0
+        preview_end = engagement.preview_ends if engagement else 0
         
         stats_text = f"""
 📊 <b>用户详细统计</b>
@@ -213,6 +196,7 @@ async def handle_user_stats(callback):
 
 ━━━━━━━━━━━━━━━━
 📖 浏览页数: {page_views}
+📢 广告展示: {ad_views}
 👆 广告点击: {ad_clicks}
 ✅ 完成预览: {"是" if preview_end > 0 else "否"}
         """
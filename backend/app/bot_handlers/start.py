@@ -8,7 +8,8 @@ from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from sqlalchemy import select
 
 from app.database import get_db_context
-from app.models import User, UserSession, InviteLink, Resource, MediaFile, Statistics
+from app.models import User, UserSession, InviteLink, Resource, MediaFile
+from app.services.events import record_event
 
 
 router = Router()
@@ -45,17 +46,19 @@ async def handle_start_with_deep_link(message: Message, command: CommandObject):
                 first_name=message.from_user.first_name,
                 last_name=message.from_user.last_name,
                 invite_code=invite_code,
+                invite_link_id=invite_link.id,
             )
             db.add(user)
             await db.flush()
             
             # 记录统计
-            stat = Statistics(
+            await record_event(
+                db,
                 event_type="user_start",
                 user_id=user_id,
                 invite_code=invite_code,
+                invite_link_id=invite_link.id,
             )
-            db.add(stat)
         
         # 创建或更新用户会话
         session_result = await db.execute(
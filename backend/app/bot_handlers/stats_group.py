@@ -2,15 +2,15 @@
 统计群处理器
 处理统计查询命令
 """
-from datetime import datetime, timedelta
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message
-from sqlalchemy import select, func, and_
+from sqlalchemy import select
 
 from app.database import get_db_context
-from app.models import InviteLink, User, Statistics
+from app.models import InviteLink
 from app.config import settings
+from app.services.stats_query import stats_query_service, empty_link_metrics
 
 
 router = Router()
@@ -78,8 +78,11 @@ async def handle_total_command(message: Message):
             "ad_clicks_7d": 0,
         }
         
+        # 所有链接的指标: 每张表一次分组查询
+        metrics = await stats_query_service.get_link_metrics(db)
+        
         for link in links:
-            stats = await get_link_statistics(db, link.code)
+            stats = metrics.get(link.code) or empty_link_metrics()
             
             report_lines.append(f"\n📎 <b>{link.name}</b>")
             report_lines.append(f"  新用户(7天): {stats['users_7d']}")
@@ -126,88 +129,8 @@ async def handle_help_command(message: Message):
 
 async def get_link_statistics(db, invite_code: str) -> dict:
     """获取邀请链接的统计数据"""
-    now = datetime.utcnow()
-    date_7d = now - timedelta(days=7)
-    date_30d = now - timedelta(days=30)
-    
-    # 新用户数 (7天)
-    users_7d_result = await db.execute(
-        select(func.count())
-        .select_from(User)
-        .where(and_(
-            User.invite_code == invite_code,
-            User.first_seen >= date_7d
-        ))
-    )
-    users_7d = users_7d_result.scalar() or 0
-    
-    # 新用户数 (30天)
-    users_30d_result = await db.execute(
-        select(func.count())
-        .select_from(User)
-        .where(and_(
-            User.invite_code == invite_code,
-            User.first_seen >= date_30d
-        ))
-    )
-    users_30d = users_30d_result.scalar() or 0
-    
-    # 浏览量 (7天)
-    views_7d_result = await db.execute(
-        select(func.count())
-        .select_from(Statistics)
-        .where(and_(
-            Statistics.invite_code == invite_code,
-            Statistics.event_type == "page_view",
-            Statistics.created_at >= date_7d
-        ))
-    )
-    views_7d = views_7d_result.scalar() or 0
-    
-    # 浏览量 (30天)
-    views_30d_result = await db.execute(
-        select(func.count())
-        .select_from(Statistics)
-        .where(and_(
-            Statistics.invite_code == invite_code,
-            Statistics.event_type == "page_view",
-            Statistics.created_at >= date_30d
-        ))
-    )
-    views_30d = views_30d_result.scalar() or 0
-    
-    # 广告展示 (7天)
-    ad_views_7d_result = await db.execute(
-        select(func.count())
-        .select_from(Statistics)
-        .where(and_(
-            Statistics.invite_code == invite_code,
-            Statistics.event_type == "ad_view",
-            Statistics.created_at >= date_7d
-        ))
-    )
-    ad_views_7d = ad_views_7d_result.scalar() or 0
-    
-    # 广告点击 (7天)
-    ad_clicks_7d_result = await db.execute(
-        select(func.count())
-        .select_from(Statistics)
-        .where(and_(
-            Statistics.invite_code == invite_code,
-            Statistics.event_type == "ad_click",
-            Statistics.created_at >= date_7d
-        ))
-    )
-    ad_clicks_7d = ad_clicks_7d_result.scalar() or 0
-    
-    return {
-        "users_7d": users_7d,
-        "users_30d": users_30d,
-        "views_7d": views_7d,
-        "views_30d": views_30d,
-        "ad_views_7d": ad_views_7d,
-        "ad_clicks_7d": ad_clicks_7d,
-    }
+    metrics = await stats_query_service.get_link_metrics(db, invite_codes=[invite_code])
+    return metrics.get(invite_code) or empty_link_metrics()
 
 
 def format_statistics_report(link_name: str, stats: dict) -> str:
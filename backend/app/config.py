@@ -34,6 +34,38 @@ class Settings(BaseSettings):
     # 上传目录
     UPLOAD_DIR: str = "uploads"
     
+    # 统计日汇总间隔 (秒)，0 表示不运行
+    STATS_ROLLUP_INTERVAL: int = 300
+    
+    # 统计事件分区: 预建未来月份数、原始事件保留月数 (0 表示永久保留) 与归档目录
+    STATS_PARTITION_PREMAKE_MONTHS: int = 3
+    STATS_RETENTION_MONTHS: int = 0
+    STATS_ARCHIVE_DIR: str = "archives"
+    
+    # 统计结果缓存有效期 (秒，0 表示不缓存) 与过期后仍可返回旧结果的时长
+    STATS_CACHE_TTL: int = 30
+    STATS_CACHE_STALE_TTL: int = 300
+    
+    # 分析快照 (需要 numpy): 加载最近天数 (0 表示关闭) 与查询时自动增量刷新的间隔 (秒)
+    ANALYTICS_SNAPSHOT_DAYS: int = 30
+    ANALYTICS_SNAPSHOT_REFRESH: int = 60
+    
+    # Telegram 连接池: 最大连接数与空闲连接保活时长 (秒)
+    TELEGRAM_POOL_SIZE: int = 50
+    TELEGRAM_KEEPALIVE: int = 60
+    
+    # 备份同步: 并发数、初始与最大 Telegram 调用速率 (次/秒，遇到限流自动降速)
+    BACKUP_SYNC_WORKERS: int = 4
+    BACKUP_SYNC_RATE: float = 3.0
+    BACKUP_SYNC_MAX_RATE: float = 20.0
+    # 备份同步每处理多少个文件保存一次检查点
+    BACKUP_SYNC_CHECKPOINT: int = 100
+    
+    # 备份增量镜像: 队列轮询间隔 (秒，0 表示不运行)、每批处理数与最大尝试次数
+    BACKUP_MIRROR_INTERVAL: int = 5
+    BACKUP_MIRROR_BATCH: int = 20
+    BACKUP_MIRROR_MAX_ATTEMPTS: int = 5
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -11,6 +11,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from app.database import engine, Base, AsyncSessionLocal
 from app.models import *  # 导入所有模型
 from app.utils.auth import hash_password
+from app.services.stats_partition import stats_partition_service
 
 
 async def init_database():
@@ -20,6 +21,11 @@ async def init_database():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
+    # 统计事件分区 (仅 PostgreSQL)
+    created = await stats_partition_service.ensure_partitions()
+    if created:
+        print(f"创建统计分区: {', '.join(created)}")
+    
     print("数据库表创建完成!")
 
 
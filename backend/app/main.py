@@ -9,6 +9,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database import init_db, close_db
 from app.api import router as api_router
+from app.services.stats_rollup import stats_rollup_service
+from app.services.stats_partition import stats_partition_service
+from app.services.live_stats import live_stats_service
+from app.services.cohort import cohort_service
+from app.services.telegram_clients import telegram_clients
+from app.services.backup_sync import backup_sync_service
+from app.services.backup_mirror import backup_mirror_service
 
 
 @asynccontextmanager
@@ -16,8 +23,22 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时
     await init_db()
+    await stats_partition_service.ensure_partitions()
+    stats_partition_service.start()
+    stats_rollup_service.start()
+    cohort_service.start()
+    live_stats_service.start()
+    await backup_sync_service.resume_interrupted()
+    backup_mirror_service.start()
     yield
     # 关闭时
+    await backup_mirror_service.stop()
+    await backup_sync_service.shutdown()
+    await live_stats_service.stop()
+    await cohort_service.stop()
+    await stats_rollup_service.stop()
+    await stats_partition_service.stop()
+    await telegram_clients.close()
     await close_db()
 
 
@@ -3,27 +3,39 @@
 """
 from app.models.invite_link import InviteLink
 from app.models.resource import Resource, MediaFile
-from app.models.user import User, UserSession
+from app.models.media_asset import MediaAsset
+from app.models.user import User, UserSession, UserEngagement
 from app.models.sponsor import AdGroup, Sponsor, InviteLinkAdGroup
 from app.models.sponsor_media import SponsorMediaFile
-from app.models.statistics import Statistics
+from app.models.statistics import (
+    Statistics, StatisticsDaily, RollupState, UserActiveDay, CohortSize, CohortRetention,
+)
 from app.models.admin import Admin
 from app.models.config import Config
-from app.models.backup import BotBackup, FileIdMapping
+from app.models.backup import BotBackup, FileIdMapping, BackupFileId, MirrorQueueItem
 
 __all__ = [
     "InviteLink",
     "Resource",
     "MediaFile",
+    "MediaAsset",
     "User",
     "UserSession",
+    "UserEngagement",
     "AdGroup",
     "Sponsor",
     "InviteLinkAdGroup",
     "SponsorMediaFile",
     "Statistics",
+    "StatisticsDaily",
+    "RollupState",
+    "UserActiveDay",
+    "CohortSize",
+    "CohortRetention",
     "Admin",
     "Config",
     "BotBackup",
     "FileIdMapping",
+    "BackupFileId",
+    "MirrorQueueItem",
 ]
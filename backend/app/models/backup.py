@@ -2,14 +2,19 @@
 备份相关模型
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, BigInteger, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, BigInteger, ForeignKey, UniqueConstraint, Index, event, insert
+from sqlalchemy.orm import attributes
 from sqlalchemy.sql import func
 
 from app.database import Base
+from app.models.resource import MediaFile
+from app.models.media_asset import MediaAsset
+from app.models.sponsor import Sponsor
+from app.models.sponsor_media import SponsorMediaFile
 
 
 class BotBackup(Base):
-    """备份 Bot 配置"""
+    """备份 Bot 配置 (可配置多个，同一时间最多一个激活)"""
     __tablename__ = "bot_backups"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -17,7 +22,7 @@ class BotBackup(Base):
     backup_bot_username = Column(String(50), nullable=True, comment="备份 Bot 用户名")
     backup_bot_id = Column(BigInteger, nullable=True, comment="备份 Bot Telegram ID")
     
-    # 同步状态: pending/syncing/synced/error
+    # 同步状态: pending/syncing/stopped/synced/error
     sync_status = Column(String(20), default="pending", comment="同步状态")
     last_synced_at = Column(DateTime, nullable=True, comment="上次同步时间")
     synced_count = Column(Integer, default=0, comment="已同步数量")
@@ -25,6 +30,11 @@ class BotBackup(Base):
     total_count = Column(Integer, default=0, comment="总数量")
     error_message = Column(Text, nullable=True, comment="错误信息")
     
+    # 同步检查点: 未完成的阶段与该阶段已处理到的来源 ID (完成后清空)
+    sync_phase = Column(String(20), nullable=True, comment="同步阶段")
+    sync_cursor = Column(Integer, nullable=True, comment="阶段内已处理到的来源ID")
+    checkpoint_at = Column(DateTime, nullable=True, comment="检查点时间")
+    
     # 是否已切换到备份 Bot
     is_active = Column(Boolean, default=False, comment="是否激活备份 Bot")
     
@@ -38,7 +48,7 @@ class BotBackup(Base):
 class FileIdMapping(Base):
     """file_id 映射表
     
-    存储同一文件在主 Bot 和备份 Bot 下的 file_id 映射关系。
+    存储文件在主 Bot 下的 file_id 及来源，各备份 Bot 的 file_id 见 BackupFileId。
     使用 file_unique_id 作为跨 Bot 的唯一标识。
     """
     __tablename__ = "file_id_mappings"
@@ -50,8 +60,6 @@ class FileIdMapping(Base):
     
     # 主 Bot 的 file_id
     primary_file_id = Column(String(200), nullable=False, comment="主 Bot file_id")
-    # 备份 Bot 的 file_id
-    backup_file_id = Column(String(200), nullable=True, comment="备份 Bot file_id")
     
     file_type = Column(String(20), nullable=True, comment="文件类型: photo/video/animation")
     
@@ -63,7 +71,88 @@ class FileIdMapping(Base):
     
     __table_args__ = (
         UniqueConstraint('file_unique_id', name='uq_file_unique_id'),
+        # 同步时按来源批量加载已同步集合
+        Index('ix_file_id_mappings_source', 'source_type', 'source_id'),
     )
     
     def __repr__(self):
         return f"<FileIdMapping(id={self.id}, unique_id='{self.file_unique_id[:20]}...')>"
+
+
+class BackupFileId(Base):
+    """备份 Bot 的 file_id
+    
+    每个备份 Bot 一行，按 (backup_id, file_unique_id) 唯一，解析时一次索引查找。
+    """
+    __tablename__ = "backup_file_ids"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    backup_id = Column(Integer, ForeignKey("bot_backups.id", ondelete="CASCADE"), nullable=False, comment="备份配置 ID")
+    file_unique_id = Column(String(100), nullable=False, comment="文件唯一标识")
+    file_id = Column(String(200), nullable=False, comment="备份 Bot file_id")
+    created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
+    
+    __table_args__ = (
+        UniqueConstraint('backup_id', 'file_unique_id', name='uq_backup_file_id'),
+    )
+    
+    def __repr__(self):
+        return f"<BackupFileId(backup_id={self.backup_id}, unique_id='{self.file_unique_id[:20]}...')>"
+
+
+class MirrorQueueItem(Base):
+    """备份增量镜像队列
+    
+    新建的媒体记录在同一事务内入队，由 backup_mirror 后台任务镜像到备份 Bot。
+    """
+    __tablename__ = "mirror_queue"
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    source_type = Column(String(20), nullable=False, comment="来源类型: asset/resource/sponsor/sponsor_single")
+    source_id = Column(Integer, nullable=False, comment="来源 ID")
+    attempts = Column(Integer, nullable=False, default=0, comment="已尝试次数")
+    last_error = Column(Text, nullable=True, comment="最近错误")
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True, comment="下次处理时间")
+    created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
+    
+    def __repr__(self):
+        return f"<MirrorQueueItem(id={self.id}, source='{self.source_type}:{self.source_id}', attempts={self.attempts})>"
+
+
+def _enqueue_mirror(connection, source_type: str, source_id: int) -> None:
+    connection.execute(
+        insert(MirrorQueueItem.__table__).values(
+            source_type=source_type,
+            source_id=source_id,
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+        )
+    )
+
+
+@event.listens_for(MediaAsset, "after_insert")
+def _mirror_new_asset(mapper, connection, target):
+    _enqueue_mirror(connection, "asset", target.id)
+
+
+@event.listens_for(MediaFile, "after_insert")
+def _mirror_new_media_file(mapper, connection, target):
+    # 已关联资产的随资产镜像
+    if target.asset_id is None:
+        _enqueue_mirror(connection, "resource", target.id)
+
+
+@event.listens_for(SponsorMediaFile, "after_insert")
+def _mirror_new_sponsor_media(mapper, connection, target):
+    if target.asset_id is None:
+        _enqueue_mirror(connection, "sponsor", target.id)
+
+
+@event.listens_for(Sponsor, "after_insert")
+@event.listens_for(Sponsor, "after_update")
+def _mirror_sponsor_single(mapper, connection, target):
+    # 单个媒体广告新建或更换媒体时入队
+    if target.media_type not in ("photo", "video") or not target.telegram_file_id:
+        return
+    if attributes.get_history(target, "telegram_file_id").has_changes():
+        _enqueue_mirror(connection, "sponsor_single", target.id)
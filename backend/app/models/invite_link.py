@@ -28,7 +28,7 @@ class InviteLink(Base):
     # 关系
     resources = relationship("Resource", back_populates="invite_link", foreign_keys="Resource.invite_link_id")
     cover_resource = relationship("Resource", foreign_keys=[cover_resource_id])
-    users = relationship("User", back_populates="invite_link")
+    users = relationship("User", back_populates="invite_link", foreign_keys="User.invite_link_id")
     ad_groups = relationship("AdGroup", secondary="invite_link_ad_groups", back_populates="invite_links")
     
     def __repr__(self):
@@ -0,0 +1,32 @@
+"""
+媒体资产模型
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+
+from app.database import Base
+
+
+class MediaAsset(Base):
+    """媒体资产表 (按 file_unique_id 去重)
+
+    同一文件只保存一行，MediaFile / SponsorMediaFile 通过 asset_id 引用。
+    备份同步以资产为单位进行，工作量与唯一文件数成正比。
+    """
+    __tablename__ = "media_assets"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    file_unique_id = Column(String(100), unique=True, nullable=False, index=True, comment="Telegram file_unique_id")
+    content_hash = Column(String(64), unique=True, nullable=True, index=True, comment="文件内容 SHA-256 (上传去重)")
+    file_type = Column(String(20), nullable=False, comment="文件类型: photo/video/animation")
+    telegram_file_id = Column(String(200), nullable=False, comment="主 Bot file_id")
+    file_size = Column(BigInteger, nullable=True, comment="文件大小(字节)")
+
+    # 首次出现的来源（用于备份同步时直接转发）
+    source_channel_id = Column(BigInteger, nullable=True, comment="来源频道 Telegram ID")
+    source_message_id = Column(BigInteger, nullable=True, comment="来源消息 ID")
+
+    created_at = Column(DateTime, default=datetime.utcnow, comment="创建时间")
+
+    def __repr__(self):
+        return f"<MediaAsset(id={self.id}, type='{self.file_type}', unique_id='{self.file_unique_id}')>"
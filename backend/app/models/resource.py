@@ -39,6 +39,7 @@ class MediaFile(Base):
     file_path = Column(String(500), nullable=True, comment="服务器文件路径")
     telegram_file_id = Column(String(200), nullable=False, comment="Telegram file_id")
     file_unique_id = Column(String(100), nullable=True, index=True, comment="Telegram file_unique_id (用于备份)")
+    asset_id = Column(Integer, ForeignKey("media_assets.id", ondelete="SET NULL"), nullable=True, index=True, comment="媒体资产ID (去重)")
     file_size = Column(BigInteger, nullable=True, comment="文件大小(字节)")
     position = Column(Integer, default=0, comment="在媒体组中的位置")
     
@@ -50,6 +51,7 @@ class MediaFile(Base):
     
     # 关系
     resource = relationship("Resource", back_populates="media_files")
+    asset = relationship("MediaAsset")
     
     def __repr__(self):
         return f"<MediaFile(id={self.id}, type='{self.file_type}', position={self.position})>"
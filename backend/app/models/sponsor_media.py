@@ -17,12 +17,14 @@ class SponsorMediaFile(Base):
     file_type = Column(String(20), nullable=False, comment="文件类型: photo/video")
     telegram_file_id = Column(String(200), nullable=False, comment="Telegram file_id")
     file_unique_id = Column(String(100), nullable=True, index=True, comment="Telegram file_unique_id (用于备份)")
+    asset_id = Column(Integer, ForeignKey("media_assets.id", ondelete="SET NULL"), nullable=True, index=True, comment="媒体资产ID (去重)")
     file_size = Column(Integer, nullable=True, comment="文件大小(字节)")
     position = Column(Integer, default=0, comment="在媒体组中的位置")
     created_at = Column(DateTime, default=datetime.utcnow, comment="创建时间")
     
     # 关系
     sponsor = relationship("Sponsor", back_populates="media_files")
+    asset = relationship("MediaAsset")
     
     def __repr__(self):
         return f"<SponsorMediaFile(id={self.id}, sponsor_id={self.sponsor_id}, type='{self.file_type}')>"
@@ -2,23 +2,135 @@
 统计事件模型
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, BigInteger, DateTime, ForeignKey
+from sqlalchemy import (
+    Column, Integer, SmallInteger, String, BigInteger, DateTime, Date, LargeBinary, ForeignKey,
+    PrimaryKeyConstraint,
+)
 
 from app.database import Base
 
 
+# 事件类型编码 (statistics.event_code)，只可追加，不可修改已有编码
+EVENT_CODES = {
+    "user_start": 1,
+    "page_view": 2,
+    "ad_view": 3,
+    "ad_click": 4,
+    "preview_end": 5,
+}
+EVENT_TYPES = {code: event_type for event_type, code in EVENT_CODES.items()}
+
+
 class Statistics(Base):
-    """统计事件表"""
+    """统计事件表
+    
+    PostgreSQL 上按 created_at 按月范围分区，分区由 stats_partition_service 维护，
+    主键需包含分区键。
+    
+    查询使用 invite_link_id / event_code，invite_code / event_type 在过渡期内继续写入。
+    invite_link_id 不设外键：链接删除后保留历史事件。
+    """
     __tablename__ = "statistics"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     event_type = Column(String(50), nullable=False, index=True, comment="事件类型: user_start/page_view/ad_view/ad_click/preview_end")
+    event_code = Column(SmallInteger, nullable=True, index=True, comment="事件类型编码 (EVENT_CODES)")
     user_id = Column(BigInteger, nullable=True, index=True, comment="用户 Telegram ID")
     invite_code = Column(String(50), nullable=True, index=True, comment="邀请码")
+    invite_link_id = Column(Integer, nullable=True, index=True, comment="邀请链接ID")
     resource_id = Column(Integer, nullable=True, comment="资源ID")
     sponsor_id = Column(Integer, nullable=True, comment="广告ID")
     page_number = Column(Integer, nullable=True, comment="页码")
-    created_at = Column(DateTime, default=datetime.utcnow, index=True, comment="创建时间")
+    created_at = Column(DateTime, primary_key=True, nullable=False, default=datetime.utcnow, index=True, comment="创建时间")
+    
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
     
     def __repr__(self):
         return f"<Statistics(id={self.id}, type='{self.event_type}', user_id={self.user_id})>"
+
+
+class StatisticsDaily(Base):
+    """统计事件日汇总表
+    
+    按 (日期, 邀请码, 广告, 事件类型, 页码) 汇总已结束日期的事件，
+    空值以 ''/0 存储以便作为主键。
+    """
+    __tablename__ = "statistics_daily"
+    
+    date = Column(Date, nullable=False, comment="日期 (UTC)")
+    invite_code = Column(String(50), nullable=False, default="", comment="邀请码，空字符串表示无")
+    sponsor_id = Column(Integer, nullable=False, default=0, comment="广告ID，0 表示无")
+    event_type = Column(String(50), nullable=False, comment="事件类型")
+    page_number = Column(Integer, nullable=False, default=0, comment="页码，0 表示无")
+    event_count = Column(BigInteger, nullable=False, default=0, comment="事件数")
+    user_sketch = Column(LargeBinary, nullable=True, comment="去重用户 HyperLogLog 草图")
+    
+    __table_args__ = (
+        PrimaryKeyConstraint("date", "invite_code", "sponsor_id", "event_type", "page_number"),
+    )
+    
+    def __repr__(self):
+        return f"<StatisticsDaily(date={self.date}, code='{self.invite_code}', type='{self.event_type}', count={self.event_count})>"
+
+
+class RollupState(Base):
+    """汇总任务进度表 (按日期窗口推进，窗口内按 ID 分批)"""
+    __tablename__ = "rollup_states"
+    
+    name = Column(String(50), primary_key=True, comment="汇总任务名称")
+    last_event_id = Column(BigInteger, nullable=False, default=0, comment="当前窗口内已处理的最大ID")
+    covered_until = Column(DateTime, nullable=True, comment="已汇总到的时间 (不含)")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment="更新时间")
+    
+    def __repr__(self):
+        return f"<RollupState(name='{self.name}', last_event_id={self.last_event_id})>"
+
+
+class UserActiveDay(Base):
+    """用户活跃日表 (每个用户每个有事件的日期一行)"""
+    __tablename__ = "user_active_days"
+    
+    user_id = Column(BigInteger, primary_key=True, comment="用户 Telegram ID")
+    date = Column(Date, primary_key=True, comment="活跃日期 (UTC)")
+    
+    def __repr__(self):
+        return f"<UserActiveDay(user_id={self.user_id}, date={self.date})>"
+
+
+class CohortSize(Base):
+    """用户群组规模表
+    
+    群组按 (首次使用日期, 来源邀请码) 划分，空邀请码以 '' 存储。
+    """
+    __tablename__ = "cohort_sizes"
+    
+    cohort_date = Column(Date, nullable=False, comment="首次使用日期 (UTC)")
+    invite_code = Column(String(50), nullable=False, default="", comment="来源邀请码，空字符串表示无")
+    users = Column(Integer, nullable=False, default=0, comment="群组用户数")
+    
+    __table_args__ = (
+        PrimaryKeyConstraint("cohort_date", "invite_code"),
+    )
+    
+    def __repr__(self):
+        return f"<CohortSize(date={self.cohort_date}, code='{self.invite_code}', users={self.users})>"
+
+
+class CohortRetention(Base):
+    """用户群组留存表
+    
+    每个单元格为群组中在首次使用后第 day_offset 天有事件的用户数。
+    """
+    __tablename__ = "cohort_retention"
+    
+    cohort_date = Column(Date, nullable=False, comment="首次使用日期 (UTC)")
+    invite_code = Column(String(50), nullable=False, default="", comment="来源邀请码，空字符串表示无")
+    day_offset = Column(Integer, nullable=False, comment="距首次使用的天数")
+    users = Column(Integer, nullable=False, default=0, comment="活跃用户数")
+    
+    __table_args__ = (
+        PrimaryKeyConstraint("cohort_date", "invite_code", "day_offset"),
+    )
+    
+    def __repr__(self):
+        return f"<CohortRetention(date={self.cohort_date}, code='{self.invite_code}', day={self.day_offset}, users={self.users})>"
@@ -18,12 +18,17 @@ class User(Base):
     first_name = Column(String(100), nullable=True, comment="名字")
     last_name = Column(String(100), nullable=True, comment="姓氏")
     invite_code = Column(String(50), ForeignKey("invite_links.code"), nullable=True, index=True, comment="来源邀请码")
+    invite_link_id = Column(Integer, ForeignKey("invite_links.id"), nullable=True, index=True, comment="来源邀请链接ID")
     first_seen = Column(DateTime, default=datetime.utcnow, comment="首次使用时间")
     last_active = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment="最后活跃时间")
     
     # 关系
-    invite_link = relationship("InviteLink", back_populates="users", foreign_keys=[invite_code], primaryjoin="User.invite_code == InviteLink.code")
+    invite_link = relationship("InviteLink", back_populates="users", foreign_keys=[invite_link_id])
     session = relationship("UserSession", back_populates="user", uselist=False, cascade="all, delete-orphan")
+    engagement = relationship(
+        "UserEngagement", uselist=False, viewonly=True,
+        primaryjoin="User.telegram_id == foreign(UserEngagement.user_id)",
+    )
     
     @property
     def full_name(self) -> str:
@@ -52,3 +57,22 @@ class UserSession(Base):
     
     def __repr__(self):
         return f"<UserSession(user_id={self.user_id}, page={self.current_page}, wait_count={self.wait_count})>"
+
+
+class UserEngagement(Base):
+    """用户行为计数表
+    
+    记录统计事件时增量更新，客服查询与用户详情按主键读取，不再扫描统计事件表。
+    不设外键：事件写入不依赖用户记录。
+    """
+    __tablename__ = "user_engagement"
+    
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False, comment="用户 Telegram ID")
+    page_views = Column(Integer, nullable=False, default=0, comment="浏览页数")
+    ad_views = Column(Integer, nullable=False, default=0, comment="广告展示次数")
+    ad_clicks = Column(Integer, nullable=False, default=0, comment="广告点击次数")
+    preview_ends = Column(Integer, nullable=False, default=0, comment="完成预览次数")
+    last_event_at = Column(DateTime, nullable=True, comment="最后事件时间")
+    
+    def __repr__(self):
+        return f"<UserEngagement(user_id={self.user_id}, page_views={self.page_views}, ad_clicks={self.ad_clicks})>"
@@ -0,0 +1,325 @@
+"""
+内存分析快照
+
+将最近 ANALYTICS_SNAPSHOT_DAYS 天的统计事件加载为 numpy 列数组，
+按邀请链接、广告、页码、小时等维度做即席分组计数，不再查询数据库：
+- 事件类型、邀请链接编码为整数 (链接使用 invite_links.id，已删除的链接使用负数编号)
+- 用户 ID 为 int64，时间为 epoch 秒
+- 刷新时只加载上次刷新以来的新事件，并丢弃移出时间范围的旧事件
+
+numpy 为可选依赖，未安装时快照不可用。
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Statistics, InviteLink
+from app.services.stats_rollup import day_start
+
+logger = logging.getLogger(__name__)
+
+# 可分组的维度
+DIMENSIONS = ("event_type", "invite_code", "sponsor_id", "page_number", "hour", "date")
+
+# 每批读取的行数
+LOAD_BATCH_SIZE = 50_000
+
+# 增量刷新时重新读取的时间余量，覆盖刷新时尚未提交的事务
+LATE_MARGIN = timedelta(minutes=5)
+
+_COLUMNS = {
+    "id": "int64",
+    "ts": "int64",
+    "event": "int16",
+    "link": "int32",
+    "sponsor": "int32",
+    "page": "int32",
+    "user": "int64",
+}
+
+
+def _import_numpy():
+    """导入 numpy (可选依赖)"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _epoch(value: datetime) -> int:
+    """UTC 秒级时间戳 (无时区的时间按 UTC 处理)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+class SnapshotUnavailable(Exception):
+    """分析快照不可用"""
+    pass
+
+
+class AnalyticsSnapshot:
+    """内存分析快照"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.columns: Optional[dict] = None
+        self.start: Optional[datetime] = None
+        self.refreshed_at: Optional[datetime] = None
+        # 整数编码字典
+        self.event_types: list[str] = []
+        self._event_codes: dict[str, int] = {}
+        self._link_ids: dict[str, int] = {}
+        self._link_codes: dict[int, str] = {}
+        self._deleted_links = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ANALYTICS_SNAPSHOT_DAYS > 0 and _import_numpy() is not None
+
+    # ---------- 加载 ----------
+
+    def _event_code(self, event_type: str) -> int:
+        code = self._event_codes.get(event_type)
+        if code is None:
+            code = len(self.event_types)
+            self.event_types.append(event_type)
+            self._event_codes[event_type] = code
+        return code
+
+    def _link_id(self, invite_code: Optional[str]) -> int:
+        if not invite_code:
+            return 0
+        link_id = self._link_ids.get(invite_code)
+        if link_id is None:
+            # 已删除的链接
+            self._deleted_links += 1
+            link_id = -self._deleted_links
+            self._link_ids[invite_code] = link_id
+            self._link_codes[link_id] = invite_code
+        return link_id
+
+    async def _load_links(self, session) -> None:
+        """刷新邀请码 -> 链接 ID 字典"""
+        result = await session.execute(select(InviteLink.id, InviteLink.code))
+        for link_id, code in result:
+            if self._link_ids.get(code) != link_id:
+                self._link_ids[code] = link_id
+                self._link_codes[link_id] = code
+
+    def _encode(self, rows) -> dict:
+        """将一批行编码为列数组"""
+        np = _import_numpy()
+        return {
+            "id": np.fromiter((r.id for r in rows), "int64", len(rows)),
+            "ts": np.array([r.created_at for r in rows], dtype="datetime64[s]").astype("int64"),
+            "event": np.fromiter((self._event_code(r.event_type) for r in rows), "int16", len(rows)),
+            "link": np.fromiter((self._link_id(r.invite_code) for r in rows), "int32", len(rows)),
+            "sponsor": np.fromiter((r.sponsor_id or 0 for r in rows), "int32", len(rows)),
+            "page": np.fromiter((r.page_number or 0 for r in rows), "int32", len(rows)),
+            "user": np.fromiter((r.user_id or 0 for r in rows), "int64", len(rows)),
+        }
+
+    @staticmethod
+    def _concat(parts: list[dict]) -> dict:
+        np = _import_numpy()
+        return {
+            name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype)
+            for name, dtype in _COLUMNS.items()
+        }
+
+    async def _load(self, since: datetime) -> dict:
+        """加载 since 之后的事件"""
+        parts = []
+        async with AsyncSessionLocal() as session:
+            await self._load_links(session)
+            result = await session.stream(
+                select(
+                    Statistics.id,
+                    Statistics.created_at,
+                    Statistics.event_type,
+                    Statistics.invite_code,
+                    Statistics.sponsor_id,
+                    Statistics.page_number,
+                    Statistics.user_id,
+                )
+                .where(Statistics.created_at >= since)
+                .execution_options(yield_per=LOAD_BATCH_SIZE)
+            )
+            async for rows in result.partitions():
+                parts.append(self._encode(rows))
+        return self._concat(parts)
+
+    async def refresh(self, full: bool = False) -> int:
+        """刷新快照
+
+        Args:
+            full: 重新加载全部数据，否则只加载上次刷新以来的新事件
+
+        Returns:
+            本次加载的事件数
+        """
+        if not self.enabled:
+            raise SnapshotUnavailable("分析快照未启用或未安装 numpy")
+
+        np = _import_numpy()
+        async with self._lock:
+            now = datetime.utcnow()
+            start = day_start(now) - timedelta(days=settings.ANALYTICS_SNAPSHOT_DAYS)
+
+            if full or self.columns is None:
+                columns = await self._load(start)
+                loaded = len(columns["id"])
+            else:
+                since = max(start, self.refreshed_at - LATE_MARGIN)
+                new = await self._load(since)
+                # 丢弃余量时间内已加载过的事件
+                old = self.columns
+                seen = old["id"][old["ts"] >= _epoch(since)]
+                keep = ~np.isin(new["id"], seen)
+                loaded = int(keep.sum())
+                columns = self._concat([old, {name: array[keep] for name, array in new.items()}])
+
+            # 移出时间范围的旧事件
+            in_range = columns["ts"] >= _epoch(start)
+            if not in_range.all():
+                columns = {name: array[in_range] for name, array in columns.items()}
+
+            self.columns = columns
+            self.start = start
+            self.refreshed_at = now
+
+        logger.info(f"分析快照已刷新: 新增 {loaded} 条, 共 {len(columns['id'])} 条")
+        return loaded
+
+    async def ensure_fresh(self) -> None:
+        """超过刷新间隔时增量刷新"""
+        if (
+            self.columns is None
+            or datetime.utcnow() - self.refreshed_at >= timedelta(seconds=settings.ANALYTICS_SNAPSHOT_REFRESH)
+        ):
+            await self.refresh()
+
+    def status(self) -> dict:
+        """快照状态"""
+        columns = self.columns or {}
+        return {
+            "enabled": self.enabled,
+            "rows": len(columns["id"]) if columns else 0,
+            "memory_bytes": sum(array.nbytes for array in columns.values()),
+            "start": self.start.isoformat() if self.start else None,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+        }
+
+    # ---------- 查询 ----------
+
+    def query(
+        self,
+        group_by: list[str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_types: Optional[list[str]] = None,
+        invite_codes: Optional[list[str]] = None,
+        sponsor_ids: Optional[list[int]] = None,
+        page_numbers: Optional[list[int]] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """分组统计事件数与去重用户数
+
+        Args:
+            group_by: 分组维度 (DIMENSIONS)，为空时返回总计
+            since, until: 时间范围 [since, until)
+            其余参数: 筛选条件
+
+        Returns:
+            [{维度: 值, ..., "events": 事件数, "users": 去重用户数}]，按事件数降序
+        """
+        np = _import_numpy()
+        columns = self.columns
+        if columns is None:
+            raise SnapshotUnavailable("分析快照尚未加载")
+
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        if since:
+            mask &= columns["ts"] >= _epoch(since)
+        if until:
+            mask &= columns["ts"] < _epoch(until)
+        if event_types is not None:
+            codes = [self._event_codes[e] for e in event_types if e in self._event_codes]
+            mask &= np.isin(columns["event"], codes)
+        if invite_codes is not None:
+            ids = [self._link_ids[c] for c in invite_codes if c in self._link_ids]
+            mask &= np.isin(columns["link"], ids)
+        if sponsor_ids is not None:
+            mask &= np.isin(columns["sponsor"], sponsor_ids)
+        if page_numbers is not None:
+            mask &= np.isin(columns["page"], page_numbers)
+
+        ts = columns["ts"][mask]
+        if not group_by and not len(ts):
+            return [{"events": 0, "users": 0}]
+        keys = {
+            "event_type": lambda: columns["event"][mask],
+            "invite_code": lambda: columns["link"][mask],
+            "sponsor_id": lambda: columns["sponsor"][mask],
+            "page_number": lambda: columns["page"][mask],
+            "hour": lambda: ts // 3600 % 24,
+            "date": lambda: ts // 86400,
+        }
+
+        # 各维度取值编号后按混合进制合并为一个分组编号
+        group = np.zeros(len(ts), dtype="int64")
+        values = []
+        for dim in group_by:
+            uniques, inverse = np.unique(keys[dim](), return_inverse=True)
+            group = group * len(uniques) + inverse.reshape(-1)
+            values.append(uniques)
+        groups, group = np.unique(group, return_inverse=True)
+        group = group.reshape(-1)
+        events = np.bincount(group, minlength=len(groups))
+
+        # 去重用户: (分组, 用户) 对去重后按分组计数
+        users = columns["user"][mask]
+        has_user = users != 0
+        user_uniques, user_index = np.unique(users[has_user], return_inverse=True)
+        pairs = np.unique(group[has_user] * max(len(user_uniques), 1) + user_index.reshape(-1))
+        distinct = np.bincount(pairs // max(len(user_uniques), 1), minlength=len(groups))
+
+        order = np.argsort(-events, kind="stable")
+        if limit:
+            order = order[:limit]
+
+        results = []
+        for index in order:
+            row = {}
+            remainder = int(groups[index])
+            for dim, uniques in reversed(list(zip(group_by, values))):
+                remainder, position = divmod(remainder, len(uniques))
+                row[dim] = self._decode(dim, int(uniques[position]))
+            row = {dim: row[dim] for dim in group_by}
+            row["events"] = int(events[index])
+            row["users"] = int(distinct[index])
+            results.append(row)
+        return results
+
+    def _decode(self, dim: str, value: int):
+        """维度取值解码"""
+        if dim == "event_type":
+            return self.event_types[value]
+        if dim == "invite_code":
+            return self._link_codes.get(value)
+        if dim == "date":
+            return (datetime(1970, 1, 1) + timedelta(days=value)).date().isoformat()
+        if dim in ("sponsor_id", "page_number"):
+            return value or None
+        return value
+
+
+# 全局单例
+analytics_snapshot = AnalyticsSnapshot()
@@ -0,0 +1,217 @@
+"""
+备份增量镜像服务
+
+消费 mirror_queue：新建的媒体记录在几秒内镜像到所有备份 Bot，
+使备份始终与主 Bot 保持同步，切换时无需补做全量同步。
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from aiogram.exceptions import TelegramAPIError
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import (
+    BotBackup, FileIdMapping, BackupFileId, MirrorQueueItem, MediaAsset, MediaFile, SponsorMediaFile, Sponsor,
+)
+from app.services.backup_sync import backup_sync_service, build_job, save_mapping, synced_file_ids
+from app.services.rate_limiter import AdaptiveRateLimiter
+from app.services.telegram_clients import telegram_clients
+
+logger = logging.getLogger(__name__)
+
+SOURCE_MODELS = {
+    "asset": MediaAsset,
+    "resource": MediaFile,
+    "sponsor": SponsorMediaFile,
+    "sponsor_single": Sponsor,
+}
+
+# 领取任务后的租约时长 (秒)，进程中途退出时到期后由其他进程重新领取
+CLAIM_LEASE = 300
+
+
+class BackupMirrorService:
+    """备份增量镜像服务"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        # 每个备份 Bot 独立限速
+        self._limiters: dict[int, AdaptiveRateLimiter] = {}
+
+    def _limiter(self, backup_id: int) -> AdaptiveRateLimiter:
+        limiter = self._limiters.get(backup_id)
+        if limiter is None:
+            limiter = self._limiters[backup_id] = AdaptiveRateLimiter(
+                rate=settings.BACKUP_SYNC_RATE,
+                max_rate=settings.BACKUP_SYNC_MAX_RATE,
+            )
+        return limiter
+
+    async def _claim(self, session: AsyncSession) -> list:
+        """领取一批到期任务 (SKIP LOCKED，多进程不会重复领取)"""
+        now = datetime.utcnow()
+        due = (
+            select(MirrorQueueItem.id)
+            .where(
+                MirrorQueueItem.next_attempt_at <= now,
+                MirrorQueueItem.attempts < settings.BACKUP_MIRROR_MAX_ATTEMPTS,
+            )
+            .order_by(MirrorQueueItem.id)
+            .limit(settings.BACKUP_MIRROR_BATCH)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(MirrorQueueItem)
+            .where(MirrorQueueItem.id.in_(due.scalar_subquery()))
+            .values(
+                attempts=MirrorQueueItem.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=CLAIM_LEASE),
+            )
+            .returning(MirrorQueueItem.id, MirrorQueueItem.source_type,
+                       MirrorQueueItem.source_id, MirrorQueueItem.attempts)
+        )
+        items = sorted(result.all())
+        await session.commit()
+        return items
+
+    async def _is_synced(self, session: AsyncSession, job, backup_id: int) -> bool:
+        """与全量同步相同的已同步判断 (针对指定备份 Bot)"""
+        if job.source_type == "sponsor_single":
+            return await session.scalar(
+                synced_file_ids(backup_id, [job.telegram_file_id]).limit(1)
+            ) is not None
+        if job.source_type == "asset":
+            condition = FileIdMapping.file_unique_id == job.file_unique_id
+        else:
+            condition = (FileIdMapping.source_type == job.source_type) & (
+                FileIdMapping.source_id == job.source_id
+            )
+        return await session.scalar(
+            select(FileIdMapping.id)
+            .join(BackupFileId, BackupFileId.file_unique_id == FileIdMapping.file_unique_id)
+            .where(condition, BackupFileId.backup_id == backup_id)
+            .limit(1)
+        ) is not None
+
+    async def _mirror_one(
+        self, session: AsyncSession, backups: list[BotBackup], source_type: str, source_id: int
+    ) -> None:
+        """把单个来源记录镜像到尚未同步的备份 Bot (不再需要镜像时直接返回)"""
+        model = SOURCE_MODELS[source_type]
+        source = await session.get(model, source_id)
+        if source is None:
+            return
+        if source_type in ("resource", "sponsor") and source.asset_id is not None:
+            return
+        if source_type == "sponsor_single" and (
+            source.media_type not in ("photo", "video") or not source.telegram_file_id
+        ):
+            return
+
+        job = build_job(source_type, source)
+        for backup in backups:
+            if await self._is_synced(session, job, backup.id):
+                continue
+
+            backup_file_id, backup_file_unique_id = await backup_sync_service._mirror_file(
+                telegram_clients.get(settings.BOT_TOKEN),
+                telegram_clients.get(backup.backup_bot_token),
+                file_type=job.file_type,
+                telegram_file_id=job.telegram_file_id,
+                limiter=self._limiter(backup.id),
+                source_channel_id=job.source_channel_id,
+                source_message_id=job.source_message_id,
+            )
+            if not backup_file_id:
+                raise ValueError("无法提取 file_id")
+
+            # 逐个备份 Bot 提交，失败重试时跳过已完成的
+            await save_mapping(session, job, backup.id, backup_file_id, backup_file_unique_id)
+            await session.commit()
+            logger.debug(f"增量镜像成功: {job.label} -> @{backup.backup_bot_username}")
+
+    async def drain_once(self) -> int:
+        """处理一批到期任务，返回处理数"""
+        # 全量同步进行中时暂停，避免重复镜像
+        if backup_sync_service.is_syncing():
+            return 0
+
+        async with AsyncSessionLocal() as session:
+            backups = list((await session.execute(select(BotBackup).order_by(BotBackup.id))).scalars().all())
+            if not backups:
+                # 未配置备份: 丢弃队列，配置后由全量同步覆盖
+                await session.execute(delete(MirrorQueueItem))
+                await session.commit()
+                return 0
+
+            items = await self._claim(session)
+
+        for item_id, source_type, source_id, attempts in items:
+            async with AsyncSessionLocal() as session:
+                try:
+                    await self._mirror_one(session, backups, source_type, source_id)
+                    await session.execute(delete(MirrorQueueItem).where(MirrorQueueItem.id == item_id))
+                    await session.commit()
+                except (TelegramAPIError, ValueError) as e:
+                    await session.rollback()
+                    # 指数退避后重试
+                    delay = min(3600, 10 * 2 ** (attempts - 1))
+                    await session.execute(
+                        update(MirrorQueueItem)
+                        .where(MirrorQueueItem.id == item_id)
+                        .values(
+                            last_error=str(e),
+                            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+                        )
+                    )
+                    await session.commit()
+                    logger.warning(f"增量镜像失败 {source_type} id={source_id} (第 {attempts} 次): {e}")
+
+        return len(items)
+
+    async def get_status(self, session: AsyncSession) -> dict:
+        """队列状态: 待镜像数与已放弃重试数"""
+        result = await session.execute(
+            select(
+                func.count().filter(MirrorQueueItem.attempts < settings.BACKUP_MIRROR_MAX_ATTEMPTS),
+                func.count().filter(MirrorQueueItem.attempts >= settings.BACKUP_MIRROR_MAX_ATTEMPTS),
+            )
+        )
+        pending, failed = result.one()
+        return {"pending": pending, "failed": failed}
+
+    async def run_forever(self, interval: int) -> None:
+        """后台循环: 队列有任务时连续处理，空闲时按间隔轮询"""
+        while True:
+            try:
+                if await self.drain_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"增量镜像出错: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        """启动后台镜像任务"""
+        if self._task is None and settings.BACKUP_MIRROR_INTERVAL > 0:
+            self._task = asyncio.create_task(self.run_forever(settings.BACKUP_MIRROR_INTERVAL))
+
+    async def stop(self) -> None:
+        """停止后台镜像任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局单例
+backup_mirror_service = BackupMirrorService()
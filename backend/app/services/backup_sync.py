@@ -8,35 +8,287 @@
 """
 import asyncio
 import logging
-from typing import Optional
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Optional
 from datetime import datetime
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramAPIError
-from sqlalchemy import select, func
+from aiogram.types import InputMediaDocument, InputMediaPhoto, InputMediaVideo
+from sqlalchemy import select, func, update, delete, false
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import AsyncSessionLocal
-from app.models import MediaFile, SponsorMediaFile, BotBackup, FileIdMapping
+from app.models import MediaAsset, MediaFile, SponsorMediaFile, BotBackup, FileIdMapping, BackupFileId
 from app.config import settings
+from app.services.rate_limiter import AdaptiveRateLimiter, ThroughputMeter
+from app.services.telegram_clients import telegram_clients
 
 logger = logging.getLogger(__name__)
 
+# 同步时每块读取的来源记录数
+SYNC_CHUNK_SIZE = 1000
+
+# sendMediaGroup 每组最多 10 个文件，deleteMessages 每次最多 100 条
+MEDIA_GROUP_SIZE = 10
+DELETE_BATCH_SIZE = 100
+
+# 切换到备份 Bot 前处理增量镜像队列的最长时间 (秒)
+MIRROR_DRAIN_TIMEOUT = 10
+
+# 主备切换通知频道 (Bot 进程 LISTEN，收到后热切换轮询的 Bot)
+FAILOVER_CHANNEL = "bot_failover"
+
+
+@dataclass
+class SyncJob:
+    """待镜像的单个文件"""
+    label: str
+    source_type: str
+    source_id: int
+    file_type: str
+    telegram_file_id: str
+    file_unique_id: Optional[str] = None
+    source_channel_id: Optional[int] = None
+    source_message_id: Optional[int] = None
+    # 需要回填 file_unique_id 的来源模型 (来源记录已分块释放，按 source_id 更新)
+    backfill: Any = None
+    # 已有映射，只计入进度
+    synced: bool = False
+
+
+def build_job(source_type: str, source: Any, synced: bool = False) -> SyncJob:
+    """由来源记录 (MediaAsset / MediaFile / SponsorMediaFile / Sponsor) 构造同步任务"""
+    if source_type == "sponsor_single":
+        return SyncJob(
+            label=f"Sponsor 单媒体 id={source.id}",
+            source_type=source_type,
+            source_id=source.id,
+            file_type=source.media_type,
+            telegram_file_id=source.telegram_file_id,
+            synced=synced,
+        )
+    labels = {"asset": "MediaAsset", "resource": "MediaFile", "sponsor": "SponsorMediaFile"}
+    return SyncJob(
+        label=f"{labels[source_type]} id={source.id}",
+        source_type=source_type,
+        source_id=source.id,
+        file_type=source.file_type,
+        telegram_file_id=source.telegram_file_id,
+        file_unique_id=source.file_unique_id,
+        source_channel_id=getattr(source, "source_channel_id", None),
+        source_message_id=getattr(source, "source_message_id", None),
+        # 资产的 file_unique_id 必然存在，无需回填
+        backfill=None if source_type == "asset" else type(source),
+        synced=synced,
+    )
+
+
+async def save_mapping(
+    session: AsyncSession,
+    job: SyncJob,
+    backup_id: int,
+    backup_file_id: str,
+    backup_file_unique_id: Optional[str]
+) -> None:
+    """写入主 Bot 映射与备份 Bot 的 file_id (已存在时跳过)，回填来源记录缺失的 file_unique_id"""
+    if job.backfill is not None and not job.file_unique_id:
+        await session.execute(
+            update(job.backfill)
+            .where(job.backfill.id == job.source_id)
+            .values(file_unique_id=backup_file_unique_id)
+        )
+    
+    file_unique_id = job.file_unique_id or backup_file_unique_id
+    # 同一文件可能已由其他记录或其他备份 Bot 映射
+    await session.execute(
+        insert(FileIdMapping)
+        .values(
+            file_unique_id=file_unique_id,
+            primary_file_id=job.telegram_file_id,
+            file_type=job.file_type,
+            source_type=job.source_type,
+            source_id=job.source_id,
+        )
+        .on_conflict_do_nothing(constraint="uq_file_unique_id")
+    )
+    await session.execute(
+        insert(BackupFileId)
+        .values(backup_id=backup_id, file_unique_id=file_unique_id, file_id=backup_file_id)
+        .on_conflict_do_nothing(constraint="uq_backup_file_id")
+    )
+
+
+def synced_file_ids(backup_id: int, file_ids: Optional[list] = None):
+    """已同步到指定备份 Bot 的主 Bot file_id 查询 (Sponsor 单媒体的已同步判断)
+    
+    Sponsor 没有 file_unique_id；经 upload_with_dedup 上传的广告与资产共用同一文件，
+    映射行按 file_unique_id 唯一，可能已由资产阶段写入 (source_type 为 asset)，
+    因此不区分来源类型，并把 file_id 相同的资产也视为已同步。
+    """
+    mapped = (
+        select(FileIdMapping.primary_file_id)
+        .join(BackupFileId, BackupFileId.file_unique_id == FileIdMapping.file_unique_id)
+        .where(BackupFileId.backup_id == backup_id)
+    )
+    assets = (
+        select(MediaAsset.telegram_file_id)
+        .join(BackupFileId, BackupFileId.file_unique_id == MediaAsset.file_unique_id)
+        .where(BackupFileId.backup_id == backup_id)
+    )
+    if file_ids is not None:
+        mapped = mapped.where(FileIdMapping.primary_file_id.in_(file_ids))
+        assets = assets.where(MediaAsset.telegram_file_id.in_(file_ids))
+    return mapped.union(assets)
+
+
+def estimate_api_calls(forward: int, visual: int, document: int, animation: int) -> int:
+    """按同步引擎的合并方式估算 Telegram 调用次数
+    
+    来源频道转发的文件每个一次转发；需要发送的图片/视频、文档按媒体组合并发送，
+    动图逐个发送，之后每个文件一次转发；两个 Bot 的临时消息分别按批删除。
+    
+    全部调用成功时与同步引擎的实际调用数一致 (图片/视频与文档交错出现时同样成立)；
+    限流重试、媒体组失败后逐个重发及停止后续传不计入，因此是下限。
+    """
+    sent = visual + document + animation
+    return (
+        forward + sent
+        + math.ceil(visual / MEDIA_GROUP_SIZE) + math.ceil(document / MEDIA_GROUP_SIZE) + animation
+        + math.ceil((forward + sent) / DELETE_BATCH_SIZE) + math.ceil(sent / DELETE_BATCH_SIZE)
+    )
+
+
+@dataclass
+class SyncProgress:
+    """单个备份 Bot 的同步实时进度 (进程内)"""
+    backup_id: int = 0
+    phase: Optional[str] = None
+    total: int = 0
+    processed: int = 0
+    synced: int = 0
+    failed: int = 0
+    # 当前阶段已连续处理完的最大来源 ID，及截至游标的计数 (检查点保存这部分)
+    cursor: int = 0
+    saved_synced: int = 0
+    saved_failed: int = 0
+    last_error: Optional[str] = None
+    checkpointed: int = 0
+    stopping: bool = False
+    checkpoint_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    started: float = field(default_factory=time.monotonic)
+    meter: ThroughputMeter = field(default_factory=ThroughputMeter)
+    # 每个备份 Bot 的同步使用独立的限速器
+    limiter: AdaptiveRateLimiter = field(
+        default_factory=lambda: AdaptiveRateLimiter(
+            rate=settings.BACKUP_SYNC_RATE,
+            max_rate=settings.BACKUP_SYNC_MAX_RATE,
+        )
+    )
+
+
+def media_group_key(job: SyncJob) -> Optional[str]:
+    """可合并到同一个媒体组发送的分组键 (None 表示单独处理)
+    
+    从来源频道转发的文件无需发送；图片与视频可混排，文档只能与文档同组，动图不支持媒体组。
+    """
+    if job.source_channel_id and job.source_message_id:
+        return None
+    if job.file_type in ("photo", "video"):
+        return "visual"
+    if job.file_type == "animation":
+        return None
+    return "document"
+
+
+def input_media(job: SyncJob):
+    """媒体组中的单个文件"""
+    if job.file_type == "photo":
+        return InputMediaPhoto(media=job.telegram_file_id)
+    if job.file_type == "video":
+        return InputMediaVideo(media=job.telegram_file_id)
+    return InputMediaDocument(media=job.telegram_file_id)
+
+
+class MessageCleaner:
+    """攒批删除存储频道中的临时消息
+    
+    每个 Bot 攒满 DELETE_BATCH_SIZE 条调用一次 deleteMessages，失败时退回逐条删除。
+    """
+    
+    def __init__(self, limiter: AdaptiveRateLimiter):
+        self.limiter = limiter
+        self._pending: dict[str, tuple[Bot, list[int]]] = {}
+    
+    async def add(self, bot: Bot, message_id: int) -> None:
+        _, message_ids = self._pending.setdefault(bot.token, (bot, []))
+        message_ids.append(message_id)
+        if len(message_ids) >= DELETE_BATCH_SIZE:
+            await self._flush(bot.token)
+    
+    async def flush(self) -> None:
+        for token in list(self._pending):
+            await self._flush(token)
+    
+    async def _flush(self, token: str) -> None:
+        bot, message_ids = self._pending.pop(token, (None, []))
+        if not message_ids:
+            return
+        try:
+            await self.limiter.call(
+                bot.delete_messages,
+                chat_id=settings.STORAGE_CHANNEL_ID,
+                message_ids=message_ids
+            )
+        except TelegramAPIError as e:
+            logger.warning(f"批量删除临时消息失败，改为逐条删除: {e}")
+            for message_id in message_ids:
+                try:
+                    await self.limiter.call(
+                        bot.delete_message,
+                        chat_id=settings.STORAGE_CHANNEL_ID,
+                        message_id=message_id
+                    )
+                except TelegramAPIError:
+                    pass
+
 
 class BackupSyncService:
     """备份同步服务"""
     
     def __init__(self):
-        self._backup_bot: Optional[Bot] = None
-        self._is_syncing: bool = False
-        self._stop_flag: bool = False
+        # 各备份 Bot 的同步任务与进度 (按备份配置 ID)
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._progress: dict[int, SyncProgress] = {}
+        # Bot 进程内由热切换设置，未设置时按数据库中的 is_active 判断
+        self._active_pinned: bool = False
+        self._active_backup_id: Optional[int] = None
     
-    async def get_backup_config(self) -> Optional[BotBackup]:
-        """获取备份配置"""
+    async def get_backup_config(self, backup_id: Optional[int] = None) -> Optional[BotBackup]:
+        """获取备份配置 (未指定时取最早创建的一个)"""
         async with AsyncSessionLocal() as session:
-            result = await session.execute(select(BotBackup).limit(1))
+            query = select(BotBackup).order_by(BotBackup.id).limit(1)
+            if backup_id is not None:
+                query = query.where(BotBackup.id == backup_id)
+            result = await session.execute(query)
             return result.scalar_one_or_none()
     
+    async def list_backups(self) -> list[BotBackup]:
+        """获取所有备份配置"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(BotBackup).order_by(BotBackup.id))
+            return list(result.scalars().all())
+    
+    def is_syncing(self, backup_id: Optional[int] = None) -> bool:
+        """指定备份 Bot (未指定时任一备份 Bot) 是否正在同步"""
+        if backup_id is None:
+            return bool(self._tasks)
+        return backup_id in self._tasks
+    
     async def create_backup_config(self, token: str) -> dict:
         """创建备份配置
         
@@ -46,20 +298,21 @@ class BackupSyncService:
         Returns:
             {"success": bool, "error": str, "backup": BotBackup}
         """
+        if token == settings.BOT_TOKEN:
+            return {"success": False, "error": "不能使用主 Bot 作为备份 Bot"}
+        
+        created = False
         try:
             # 验证 Token
-            bot = Bot(token=token)
+            bot = telegram_clients.get(token)
             bot_info = await bot.get_me()
-            await bot.session.close()
             
             # 验证备份 Bot 是否在存储频道中
             try:
-                test_bot = Bot(token=token)
-                member = await test_bot.get_chat_member(
+                member = await bot.get_chat_member(
                     chat_id=settings.STORAGE_CHANNEL_ID,
                     user_id=bot_info.id
                 )
-                await test_bot.session.close()
                 
                 if member.status not in ('administrator', 'creator'):
                     return {
@@ -73,30 +326,15 @@ class BackupSyncService:
                 }
             
             async with AsyncSessionLocal() as session:
-                # 检查是否已存在配置
-                existing = await session.execute(select(BotBackup).limit(1))
+                # 检查该 Bot 是否已配置
+                existing = await session.execute(
+                    select(BotBackup.id).where(BotBackup.backup_bot_id == bot_info.id).limit(1)
+                )
                 if existing.scalar_one_or_none():
-                    return {"success": False, "error": "已存在备份配置，请先删除"}
+                    return {"success": False, "error": f"@{bot_info.username} 已是备份 Bot"}
                 
                 # 统计需要同步的文件数
-                from app.models import Sponsor
-                
-                # 1. MediaFile 数量
-                media_count = await session.scalar(
-                    select(func.count()).select_from(MediaFile)
-                )
-                # 2. SponsorMediaFile 数量（媒体组广告）
-                sponsor_media_count = await session.scalar(
-                    select(func.count()).select_from(SponsorMediaFile)
-                )
-                # 3. Sponsor 单个媒体数量（非媒体组且有 telegram_file_id）
-                sponsor_single_count = await session.scalar(
-                    select(func.count()).select_from(Sponsor).where(
-                        Sponsor.telegram_file_id.isnot(None),
-                        Sponsor.media_type != "media_group"
-                    )
-                )
-                total = (media_count or 0) + (sponsor_media_count or 0) + (sponsor_single_count or 0)
+                total = await self._count_sources(session)
                 
                 # 创建配置
                 backup = BotBackup(
@@ -112,6 +350,7 @@ class BackupSyncService:
                 
                 logger.info(f"创建备份配置: @{bot_info.username}, 待同步文件: {total}")
                 
+                created = True
                 return {"success": True, "backup": backup}
                 
         except TelegramAPIError as e:
@@ -119,12 +358,46 @@ class BackupSyncService:
         except Exception as e:
             logger.error(f"创建备份配置失败: {e}", exc_info=True)
             return {"success": False, "error": str(e)}
+        finally:
+            # 未通过验证的 Token 不保留实例
+            if not created:
+                telegram_clients.discard(token)
     
-    async def delete_backup_config(self) -> dict:
-        """删除备份配置"""
+    async def _count_sources(self, session: AsyncSession) -> int:
+        """统计需要同步的文件数"""
+        from app.models import Sponsor
+        
+        # 1. 媒体资产数量（去重后的唯一文件）
+        asset_count = await session.scalar(
+            select(func.count()).select_from(MediaAsset)
+        )
+        # 2. 未关联资产的 MediaFile 数量（历史数据）
+        media_count = await session.scalar(
+            select(func.count()).select_from(MediaFile).where(MediaFile.asset_id.is_(None))
+        )
+        # 3. 未关联资产的 SponsorMediaFile 数量（媒体组广告）
+        sponsor_media_count = await session.scalar(
+            select(func.count()).select_from(SponsorMediaFile).where(SponsorMediaFile.asset_id.is_(None))
+        )
+        # 4. Sponsor 单个媒体数量（非媒体组且有 telegram_file_id）
+        sponsor_single_count = await session.scalar(
+            select(func.count()).select_from(Sponsor).where(
+                Sponsor.telegram_file_id.isnot(None),
+                Sponsor.media_type.in_(["photo", "video"])
+            )
+        )
+        return (
+            (asset_count or 0) + (media_count or 0)
+            + (sponsor_media_count or 0) + (sponsor_single_count or 0)
+        )
+    
+    async def delete_backup_config(self, backup_id: Optional[int] = None) -> dict:
+        """删除备份配置 (未指定时删除最早创建的一个)"""
         async with AsyncSessionLocal() as session:
-            result = await session.execute(select(BotBackup).limit(1))
-            backup = result.scalar_one_or_none()
+            query = select(BotBackup).order_by(BotBackup.id).limit(1)
+            if backup_id is not None:
+                query = query.where(BotBackup.id == backup_id)
+            backup = (await session.execute(query)).scalar_one_or_none()
             
             if not backup:
                 return {"success": False, "error": "没有备份配置"}
@@ -132,45 +405,109 @@ class BackupSyncService:
             if backup.is_active:
                 return {"success": False, "error": "备份 Bot 正在使用中，无法删除"}
             
+            if self.is_syncing(backup.id):
+                return {"success": False, "error": "备份 Bot 正在同步，请先停止同步"}
+            
+            await session.execute(delete(BackupFileId).where(BackupFileId.backup_id == backup.id))
             await session.delete(backup)
+            telegram_clients.discard(backup.backup_bot_token)
+            self._progress.pop(backup.id, None)
             
-            # 删除映射表
-            await session.execute(
-                FileIdMapping.__table__.delete()
+            # 最后一个备份 Bot 删除后清空映射表
+            remaining = await session.scalar(
+                select(func.count()).select_from(BotBackup).where(BotBackup.id != backup.id)
             )
+            if not remaining:
+                await session.execute(delete(FileIdMapping))
             
             await session.commit()
             
-            logger.info("已删除备份配置和映射数据")
+            logger.info(f"已删除备份配置和映射数据: @{backup.backup_bot_username}")
             return {"success": True}
     
-    async def start_sync(self) -> dict:
-        """开始同步"""
-        if self._is_syncing:
-            return {"success": False, "error": "同步正在进行中"}
+    def _start_task(self, backup_id: int, resume: bool) -> None:
+        self._tasks[backup_id] = asyncio.create_task(self._execute_sync(backup_id, resume=resume))
+    
+    async def start_sync(self, backup_id: Optional[int] = None) -> dict:
+        """开始同步 (有未完成的检查点时从检查点继续)
         
-        backup = await self.get_backup_config()
-        if not backup:
+        未指定备份 Bot 时所有未在同步的备份 Bot 并行同步。
+        """
+        if backup_id is not None:
+            backup = await self.get_backup_config(backup_id)
+            backups = [backup] if backup else []
+        else:
+            backups = await self.list_backups()
+        if not backups:
             return {"success": False, "error": "没有备份配置"}
         
+        backups = [backup for backup in backups if not self.is_syncing(backup.id)]
+        if not backups:
+            return {"success": False, "error": "同步正在进行中"}
+        
         # 启动后台同步任务
-        asyncio.create_task(self._execute_sync(backup.id))
+        resume = any(backup.sync_phase is not None for backup in backups)
+        for backup in backups:
+            self._start_task(backup.id, resume=backup.sync_phase is not None)
         
-        return {"success": True, "message": "同步任务已启动"}
+        return {"success": True, "message": "同步任务已继续" if resume else "同步任务已启动"}
     
-    async def stop_sync(self) -> dict:
-        """停止同步"""
-        self._stop_flag = True
+    async def stop_sync(self, backup_id: Optional[int] = None) -> dict:
+        """停止同步 (未指定时停止所有备份 Bot 的同步)"""
+        for progress_id, progress in self._progress.items():
+            if backup_id is None or progress_id == backup_id:
+                progress.stopping = True
         return {"success": True, "message": "正在停止同步..."}
     
-    async def _execute_sync(self, backup_id: int) -> None:
-        """执行同步任务"""
-        self._is_syncing = True
-        self._stop_flag = False
+    async def resume_interrupted(self) -> None:
+        """启动时恢复上次进程退出时未完成的同步"""
+        for backup in await self.list_backups():
+            if backup.sync_status == "syncing" and not self.is_syncing(backup.id):
+                logger.info(
+                    f"恢复中断的同步: @{backup.backup_bot_username}, "
+                    f"phase={backup.sync_phase}, cursor={backup.sync_cursor}"
+                )
+                self._start_task(backup.id, resume=True)
+    
+    async def shutdown(self) -> None:
+        """进程退出时中断同步，保留 syncing 状态与检查点以便下次启动恢复"""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _checkpoint(self, progress: SyncProgress, **values) -> None:
+        """持久化同步进度"""
+        async with progress.checkpoint_lock:
+            progress.checkpointed = progress.processed
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(BotBackup)
+                    .where(BotBackup.id == progress.backup_id)
+                    .values(
+                        sync_phase=progress.phase,
+                        sync_cursor=progress.cursor,
+                        synced_count=progress.saved_synced,
+                        failed_count=progress.saved_failed,
+                        error_message=progress.last_error,
+                        checkpoint_at=datetime.utcnow(),
+                        **values
+                    )
+                )
+                await session.commit()
+    
+    async def _execute_sync(self, backup_id: int, resume: bool = False) -> None:
+        """执行同步任务
         
-        logger.info(f"开始同步任务: backup_id={backup_id}")
+        每处理 BACKUP_SYNC_CHECKPOINT 个文件保存一次检查点 (阶段、游标、计数、最近错误)。
+        resume 时跳过已完成的阶段，当前阶段从游标之后继续。
+        """
+        self._progress[backup_id] = progress = SyncProgress(backup_id=backup_id)
+        
+        logger.info(f"开始同步任务: backup_id={backup_id}, resume={resume}")
         
         try:
+            # 准备阶段使用短会话，同步过程中不占用连接
             async with AsyncSessionLocal() as session:
                 # 获取备份配置
                 result = await session.execute(
@@ -182,202 +519,620 @@ class BackupSyncService:
                     logger.error("备份配置不存在")
                     return
                 
+                resume_phase = backup.sync_phase if resume else None
+                if resume_phase:
+                    progress.synced = progress.saved_synced = backup.synced_count or 0
+                    progress.failed = progress.saved_failed = backup.failed_count or 0
+                    progress.processed = progress.synced + progress.failed
+                    progress.checkpointed = progress.processed
+                    progress.last_error = backup.error_message
+                
                 # 更新状态
+                progress.total = await self._count_sources(session)
+                backup.total_count = progress.total
                 backup.sync_status = "syncing"
                 await session.commit()
-                
-                # 创建备份 Bot 实例
-                backup_bot = Bot(token=backup.backup_bot_token)
-                
-                try:
-                    # 同步 MediaFile（资源媒体）
-                    synced, failed = await self._sync_media_files(
-                        session, backup_bot, backup_id
-                    )
-                    
-                    # 同步 SponsorMediaFile（广告媒体组）
-                    s2, f2 = await self._sync_sponsor_media_files(
-                        session, backup_bot, backup_id
-                    )
-                    synced += s2
-                    failed += f2
-                    
-                    # 同步 Sponsor 单个媒体
-                    s3, f3 = await self._sync_sponsor_single_files(
-                        session, backup_bot, backup_id
+            
+            # 主 Bot 与备份 Bot 实例 (共享连接池)
+            main_bot = telegram_clients.get(settings.BOT_TOKEN)
+            backup_bot = telegram_clients.get(backup.backup_bot_token)
+            
+            phases = [
+                # 同步 MediaAsset（去重后的媒体资产）
+                ("asset", self._sync_media_assets),
+                # 同步未关联资产的 MediaFile（资源媒体）
+                ("resource", self._sync_media_files),
+                # 同步未关联资产的 SponsorMediaFile（广告媒体组）
+                ("sponsor", self._sync_sponsor_media_files),
+                # 同步 Sponsor 单个媒体
+                ("sponsor_single", self._sync_sponsor_single_files),
+            ]
+            names = [name for name, _ in phases]
+            start = names.index(resume_phase) if resume_phase in names else 0
+            
+            for phase, sync_phase in phases[start:]:
+                if progress.stopping:
+                    break
+                progress.phase = phase
+                progress.cursor = (backup.sync_cursor or 0) if phase == resume_phase else 0
+                await self._checkpoint(progress)
+                await sync_phase(main_bot, backup_bot, progress, progress.cursor)
+            
+            if progress.stopping:
+                # 保留检查点，下次开始时继续
+                await self._checkpoint(progress, sync_status="stopped")
+                logger.info(f"同步已停止: phase={progress.phase}, cursor={progress.cursor}")
+                return
+            
+            # 更新状态 (检查点由其他会话写入，用 UPDATE 语句覆盖，不依赖 ORM 变更检测)
+            failed = progress.failed
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(BotBackup)
+                    .where(BotBackup.id == backup_id)
+                    .values(
+                        sync_status="synced" if failed == 0 else "error",
+                        synced_count=progress.synced,
+                        failed_count=failed,
+                        last_synced_at=datetime.utcnow(),
+                        sync_phase=None,
+                        sync_cursor=None,
+                        checkpoint_at=datetime.utcnow(),
+                        error_message=(
+                            f"{failed} 个文件同步失败，最近错误: {progress.last_error}" if failed > 0 else None
+                        ),
                     )
-                    synced += s3
-                    failed += f3
-                    
-                    # 更新状态
-                    backup.sync_status = "synced" if failed == 0 else "error"
-                    backup.synced_count = synced
-                    backup.failed_count = failed
-                    backup.last_synced_at = datetime.utcnow()
-                    
-                    if failed > 0:
-                        backup.error_message = f"{failed} 个文件同步失败"
-                    else:
-                        backup.error_message = None
-                    
-                    await session.commit()
-                    
-                    logger.info(f"同步完成: synced={synced}, failed={failed}")
-                    
-                finally:
-                    await backup_bot.session.close()
-                    
+                )
+                await session.commit()
+            
+            logger.info(
+                f"同步完成: synced={progress.synced}, failed={failed}, "
+                f"耗时 {time.monotonic() - progress.started:.0f}s"
+            )
+            
+        except asyncio.CancelledError:
+            # 进程退出: 保存检查点，状态保持 syncing 以便启动时恢复
+            await self._checkpoint(progress)
+            logger.info(f"同步已中断: phase={progress.phase}, cursor={progress.cursor}")
+            raise
         except Exception as e:
             logger.error(f"同步任务出错: {e}", exc_info=True)
+            progress.last_error = str(e)
+            await self._checkpoint(progress, sync_status="error")
+        finally:
+            self._tasks.pop(backup_id, None)
+            progress.stopping = False
+            progress.phase = None
+    
+    def get_progress(self, backup_id: int) -> Optional[dict]:
+        """备份 Bot 当前 (或最近一次) 同步的实时进度"""
+        progress = self._progress.get(backup_id)
+        if progress is None:
+            return None
+        throughput = progress.meter.rate()
+        remaining = max(0, progress.total - progress.processed)
+        return {
+            "phase": progress.phase,
+            "cursor": progress.cursor,
+            "total": progress.total,
+            "processed": progress.processed,
+            "synced": progress.synced,
+            "failed": progress.failed,
+            "throughput": round(throughput, 2),
+            "eta_seconds": int(remaining / throughput) if throughput > 0 and progress.phase else None,
+            "elapsed_seconds": int(time.monotonic() - progress.started),
+            "workers": settings.BACKUP_SYNC_WORKERS,
+            **progress.limiter.snapshot(),
+        }
+    
+    def _plan_query(self, phase: str, backup_id: int, after_id: int):
+        """单个阶段的分类计数查询: 总数、已映射、可从来源频道转发、需发送的各类型数"""
+        from app.models import Sponsor
+        
+        def mapped_by(column, key, source_type: str):
+            # 与 _load_synced 相同的已同步判断
+            return column.in_(
+                select(key)
+                .join(BackupFileId, BackupFileId.file_unique_id == FileIdMapping.file_unique_id)
+                .where(BackupFileId.backup_id == backup_id, FileIdMapping.source_type == source_type)
+            )
+        
+        if phase == "asset":
+            model, file_type = MediaAsset, MediaAsset.file_type
+            conditions = [MediaAsset.id > after_id]
+            mapped = MediaAsset.file_unique_id.in_(
+                select(BackupFileId.file_unique_id).where(BackupFileId.backup_id == backup_id)
+            )
+        elif phase == "resource":
+            model, file_type = MediaFile, MediaFile.file_type
+            conditions = [MediaFile.asset_id.is_(None), MediaFile.id > after_id]
+            mapped = mapped_by(MediaFile.id, FileIdMapping.source_id, phase)
+        elif phase == "sponsor":
+            model, file_type = SponsorMediaFile, SponsorMediaFile.file_type
+            conditions = [SponsorMediaFile.asset_id.is_(None), SponsorMediaFile.id > after_id]
+            mapped = mapped_by(SponsorMediaFile.id, FileIdMapping.source_id, phase)
+        else:
+            model, file_type = Sponsor, Sponsor.media_type
+            conditions = [
+                Sponsor.telegram_file_id.isnot(None),
+                Sponsor.media_type.in_(["photo", "video"]),
+                Sponsor.id > after_id,
+            ]
+            mapped = Sponsor.telegram_file_id.in_(synced_file_ids(backup_id))
+        
+        if hasattr(model, "source_message_id"):
+            forwardable = model.source_channel_id.isnot(None) & model.source_message_id.isnot(None)
+        else:
+            forwardable = false()
+        pending = ~mapped & ~forwardable
+        
+        return select(
+            func.count(),
+            func.count().filter(mapped),
+            func.count().filter(~mapped & forwardable),
+            func.count().filter(pending & file_type.in_(["photo", "video"])),
+            func.count().filter(pending & (file_type == "animation")),
+        ).select_from(model).where(*conditions)
+    
+    async def plan_sync(self, backup: BotBackup) -> dict:
+        """同步计划: 按阶段分类待同步文件，估算 API 调用次数与耗时
+        
+        与 start_sync 一致，有检查点时跳过已完成的阶段，当前阶段从游标之后计算。
+        每个阶段一条分组计数查询。
+        """
+        phases = ["asset", "resource", "sponsor", "sponsor_single"]
+        resume_phase = backup.sync_phase if backup.sync_phase in phases else None
+        start = phases.index(resume_phase) if resume_phase else 0
+        
+        items = []
+        async with AsyncSessionLocal() as session:
+            for phase in phases[start:]:
+                after_id = (backup.sync_cursor or 0) if phase == resume_phase else 0
+                result = await session.execute(self._plan_query(phase, backup.id, after_id))
+                total, mapped, forward, visual, animation = result.one()
+                # 其余需发送的文件按文档合并发送
+                document = total - mapped - forward - visual - animation
+                items.append({
+                    "phase": phase,
+                    "total": total,
+                    "mapped": mapped,
+                    "forward": forward,
+                    "send_forward": visual + document + animation,
+                    "api_calls": estimate_api_calls(forward, visual, document, animation),
+                })
+        
+        # 同步进行中按当前速率估算，否则按初始速率
+        progress = self._progress.get(backup.id)
+        if progress is not None and self.is_syncing(backup.id):
+            limiter = progress.limiter
+        else:
+            limiter = AdaptiveRateLimiter(
+                rate=settings.BACKUP_SYNC_RATE,
+                max_rate=settings.BACKUP_SYNC_MAX_RATE,
+            )
+        api_calls = sum(item["api_calls"] for item in items)
+        
+        return {
+            "backup_id": backup.id,
+            "backup_bot_username": backup.backup_bot_username,
+            "resume": resume_phase is not None,
+            "phases": items,
+            "total": sum(item["total"] for item in items),
+            "mapped": sum(item["mapped"] for item in items),
+            "forward": sum(item["forward"] for item in items),
+            "send_forward": sum(item["send_forward"] for item in items),
+            "api_calls": api_calls,
+            "rate": round(limiter.rate, 2),
+            "max_rate": limiter.max_rate,
+            "eta_seconds": int(limiter.estimate_seconds(api_calls)),
+        }
+    
+    async def _run_jobs(
+        self,
+        main_bot: Bot,
+        backup_bot: Bot,
+        progress: SyncProgress,
+        jobs: AsyncIterator[SyncJob]
+    ) -> tuple[int, int]:
+        """用有界工作池并发镜像文件
+        
+        Telegram 调用经自适应限速器并发执行；每次写入映射使用独立的短会话。
+        任务流按需读取，队列有界，内存占用与来源记录总数无关。
+        需要主 Bot 发送的文件按媒体组合并发送，临时消息攒批删除。
+        任务按来源 ID 升序派发，游标只推进到已连续完成的最大 ID，
+        恢复时游标之后的文件 (含并发中已完成的) 会重新处理。
+        """
+        counts = {"synced": 0, "failed": 0}
+        workers = max(1, settings.BACKUP_SYNC_WORKERS)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        dispatched: deque[int] = deque()
+        outcomes: dict[int, bool] = {}
+        cleaner = MessageCleaner(progress.limiter)
+        # 每个分组键一个缓冲区，交错出现的图片/视频与文档也能凑满媒体组
+        groups: dict[str, list[SyncJob]] = {}
+        
+        def record(job: SyncJob, ok: bool) -> None:
+            counts["synced" if ok else "failed"] += 1
+            progress.processed += 1
+            if ok:
+                progress.synced += 1
+            else:
+                progress.failed += 1
+            
+            # 推进游标
+            outcomes[job.source_id] = ok
+            while dispatched and dispatched[0] in outcomes:
+                progress.cursor = dispatched.popleft()
+                if outcomes.pop(progress.cursor):
+                    progress.saved_synced += 1
+                else:
+                    progress.saved_failed += 1
+        
+        async def process(unit: list[SyncJob]) -> None:
+            try:
+                if len(unit) > 1:
+                    results = await self._process_group(
+                        main_bot, backup_bot, progress, unit, cleaner
+                    )
+                else:
+                    results = [await self._process_job(
+                        main_bot, backup_bot, progress, unit[0], cleaner
+                    )]
+            except Exception as e:
+                # 意外错误计为失败，工作协程继续处理
+                logger.error(f"同步出错 {unit[0].label} 等 {len(unit)} 个文件: {e}", exc_info=True)
+                progress.last_error = f"{unit[0].label}: {e}"
+                results = [False] * len(unit)
+            for job, ok in zip(unit, results):
+                record(job, ok)
+            progress.meter.add(len(unit))
             
+            if (progress.processed - progress.checkpointed >= settings.BACKUP_SYNC_CHECKPOINT
+                    and not progress.checkpoint_lock.locked()):
+                try:
+                    await self._checkpoint(progress)
+                except Exception as e:
+                    # 下次达到间隔时重试
+                    logger.warning(f"保存同步检查点失败: {e}")
+        
+        async def worker() -> None:
+            while True:
+                unit = await queue.get()
+                try:
+                    # 停止后丢弃队列中剩余的任务
+                    if not progress.stopping:
+                        await process(unit)
+                finally:
+                    queue.task_done()
+        
+        async def guarded(aw) -> None:
+            """等待队列操作完成；工作协程意外退出时抛出异常，避免同步永久阻塞"""
+            waiter = asyncio.ensure_future(aw)
+            done, _ = await asyncio.wait({waiter, *tasks}, return_when=asyncio.FIRST_COMPLETED)
+            if waiter in done:
+                return
+            waiter.cancel()
+            error = next(
+                (task.exception() for task in done if not task.cancelled() and task.exception()), None
+            )
+            raise RuntimeError("同步工作协程意外退出") from error
+        
+        async def flush_group(key: str) -> None:
+            group = groups.pop(key, None)
+            if group:
+                await guarded(queue.put(group))
+        
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            async for job in jobs:
+                if progress.stopping:
+                    logger.info("收到停止信号，退出同步")
+                    break
+                dispatched.append(job.source_id)
+                if job.synced:
+                    record(job, True)
+                    continue
+                key = media_group_key(job)
+                if key is None:
+                    await guarded(queue.put([job]))
+                    continue
+                group = groups.setdefault(key, [])
+                group.append(job)
+                if len(group) >= MEDIA_GROUP_SIZE:
+                    await flush_group(key)
+            if not progress.stopping:
+                for key in list(groups):
+                    await flush_group(key)
+            await guarded(queue.join())
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # 工作协程出错退出时也删除已登记的临时消息
+            try:
+                await cleaner.flush()
+            except Exception as e:
+                logger.error(f"删除临时消息失败: {e}", exc_info=True)
+        
+        return counts["synced"], counts["failed"]
+    
+    async def _process_job(
+        self,
+        main_bot: Bot,
+        backup_bot: Bot,
+        progress: SyncProgress,
+        job: SyncJob,
+        cleaner: Optional[MessageCleaner] = None,
+        sent_message_id: Optional[int] = None
+    ) -> bool:
+        """镜像单个文件并写入映射"""
+        try:
+            backup_file_id, backup_file_unique_id = await self._mirror_file(
+                main_bot,
+                backup_bot,
+                file_type=job.file_type,
+                telegram_file_id=job.telegram_file_id,
+                limiter=progress.limiter,
+                source_channel_id=job.source_channel_id,
+                source_message_id=job.source_message_id,
+                cleaner=cleaner,
+                sent_message_id=sent_message_id,
+            )
+        except TelegramAPIError as e:
+            logger.error(f"同步失败 {job.label}: {e}")
+            progress.last_error = f"{job.label}: {e}"
+            return False
+        
+        if not backup_file_id:
+            logger.warning(f"无法提取 file_id: {job.label}")
+            progress.last_error = f"{job.label}: 无法提取 file_id"
+            return False
+        
+        async with AsyncSessionLocal() as session:
+            try:
+                await save_mapping(
+                    session, job, progress.backup_id, backup_file_id, backup_file_unique_id
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"保存映射失败 {job.label}: {e}")
+                progress.last_error = f"{job.label}: {e}"
+                return False
+        
+        logger.debug(f"同步成功: {job.label}")
+        return True
+    
+    async def _process_group(
+        self,
+        main_bot: Bot,
+        backup_bot: Bot,
+        progress: SyncProgress,
+        jobs: list[SyncJob],
+        cleaner: MessageCleaner
+    ) -> list[bool]:
+        """主 Bot 用 sendMediaGroup 一次发送一组文件，备份 Bot 逐条转发提取 file_id
+        
+        媒体组发送失败 (如其中一个 file_id 失效) 时退回逐个同步。
+        """
+        try:
+            sent = await progress.limiter.call(
+                main_bot.send_media_group,
+                chat_id=settings.STORAGE_CHANNEL_ID,
+                media=[input_media(job) for job in jobs]
+            )
+        except TelegramAPIError as e:
+            logger.warning(f"媒体组发送失败，改为逐个同步: {e}")
+            return [
+                await self._process_job(main_bot, backup_bot, progress, job, cleaner)
+                for job in jobs
+            ]
+        
+        results = []
+        message_ids = [message.message_id for message in sent]
+        try:
+            for job, message_id in zip(jobs, message_ids):
+                results.append(await self._process_job(
+                    main_bot, backup_bot, progress, job, cleaner,
+                    sent_message_id=message_id
+                ))
+        finally:
+            # 转发完成后再登记删除；中途出错 (含取消) 时本组剩余的临时消息同样登记
+            for message_id in message_ids:
+                await cleaner.add(main_bot, message_id)
+        return results
+    
+    async def _load_synced(
+        self,
+        session: AsyncSession,
+        column,
+        backup_id: int,
+        keys: list,
+        source_type: Optional[str] = None
+    ) -> set:
+        """一次查询出一块来源记录中已同步到指定备份 Bot 的映射键，替代逐条查询"""
+        if source_type == "sponsor_single":
+            return set((await session.scalars(synced_file_ids(backup_id, keys))).all())
+        query = (
+            select(column)
+            .join(BackupFileId, BackupFileId.file_unique_id == FileIdMapping.file_unique_id)
+            .where(BackupFileId.backup_id == backup_id, column.in_(keys))
+        )
+        if source_type is not None:
+            query = query.where(FileIdMapping.source_type == source_type)
+        return set((await session.scalars(query)).all())
+    
+    async def _iter_jobs(
+        self,
+        source_type: str,
+        query,
+        column,
+        key: Callable[[Any], Any],
+        backup_id: int,
+        after_id: int = 0
+    ) -> AsyncIterator[SyncJob]:
+        """按主键分块 (keyset) 读取来源记录并构造同步任务
+        
+        每块用独立的短会话读取 SYNC_CHUNK_SIZE 条记录及其中已同步的键，
+        读完即释放连接；下一块在工作池消费完当前块后才读取。
+        
+        Args:
+            query: 来源记录查询 (不含分页条件)
+            column: 已同步判断使用的映射列
+            key: 从来源记录取出与 column 比较的键
+        """
+        model = query.column_descriptions[0]["entity"]
+        while True:
             async with AsyncSessionLocal() as session:
                 result = await session.execute(
-                    select(BotBackup).where(BotBackup.id == backup_id)
+                    query.where(model.id > after_id).order_by(model.id).limit(SYNC_CHUNK_SIZE)
                 )
-                backup = result.scalar_one_or_none()
-                if backup:
-                    backup.sync_status = "error"
-                    backup.error_message = str(e)
-                    await session.commit()
+                rows = result.scalars().all()
+                if not rows:
+                    return
+                synced = await self._load_synced(
+                    session, column, backup_id, [key(row) for row in rows],
+                    # 资产映射按 file_unique_id 唯一，不区分来源
+                    None if source_type == "asset" else source_type
+                )
+            
+            for row in rows:
+                yield build_job(source_type, row, synced=key(row) in synced)
+            after_id = rows[-1].id
+    
+    async def _sync_media_assets(
+        self,
+        main_bot: Bot,
+        backup_bot: Bot,
+        progress: SyncProgress,
+        after_id: int = 0
+    ) -> tuple[int, int]:
+        """同步 MediaAsset（去重后的媒体资产）
+        
+        每个唯一文件只同步一次，映射按 file_unique_id 存储，
+        所有引用该资产的 MediaFile / SponsorMediaFile 共享同一映射。
+        """
+        logger.info(f"开始同步 MediaAsset: after_id={after_id}")
+        
+        jobs = self._iter_jobs(
+            "asset",
+            select(MediaAsset),
+            FileIdMapping.file_unique_id,
+            lambda asset: asset.file_unique_id,
+            progress.backup_id,
+            after_id,
+        )
+        
+        return await self._run_jobs(main_bot, backup_bot, progress, jobs)
+    
+    async def _delete_temp(
+        self,
+        bot: Bot,
+        message_id: int,
+        limiter: AdaptiveRateLimiter,
+        cleaner: Optional[MessageCleaner] = None
+    ) -> None:
+        """删除存储频道中的临时消息 (有 cleaner 时攒批删除)"""
+        if cleaner is not None:
+            await cleaner.add(bot, message_id)
+            return
+        try:
+            await limiter.call(
+                bot.delete_message,
+                chat_id=settings.STORAGE_CHANNEL_ID,
+                message_id=message_id
+            )
+        except TelegramAPIError:
+            pass
+    
+    async def _mirror_file(
+        self,
+        main_bot: Bot,
+        backup_bot: Bot,
+        file_type: str,
+        telegram_file_id: str,
+        limiter: AdaptiveRateLimiter,
+        source_channel_id: Optional[int] = None,
+        source_message_id: Optional[int] = None,
+        cleaner: Optional[MessageCleaner] = None,
+        sent_message_id: Optional[int] = None,
+    ) -> tuple[str | None, str | None]:
+        """让备份 Bot 获取文件的 file_id
+        
+        1. 有来源消息：备份 Bot 直接从来源频道转发
+        2. 无来源消息：主 Bot 发送到存储频道 (已随媒体组发送时传入 sent_message_id)，备份 Bot 转发
+        
+        所有 Telegram 调用经过备份 Bot 对应的自适应限速器。
+        
+        Returns:
+            (备份 file_id, file_unique_id)
+        """
+        if source_message_id and source_channel_id:
+            forwarded = await limiter.call(
+                backup_bot.forward_message,
+                chat_id=settings.STORAGE_CHANNEL_ID,
+                from_chat_id=source_channel_id,
+                message_id=source_message_id
+            )
+            await self._delete_temp(backup_bot, forwarded.message_id, limiter, cleaner)
+            return self._extract_file_info(forwarded)
+        
+        own_message = sent_message_id is None
+        if own_message:
+            if file_type == "photo":
+                send, field = main_bot.send_photo, "photo"
+            elif file_type == "video":
+                send, field = main_bot.send_video, "video"
+            elif file_type == "animation":
+                send, field = main_bot.send_animation, "animation"
+            else:
+                send, field = main_bot.send_document, "document"
+            sent = await limiter.call(
+                send, chat_id=settings.STORAGE_CHANNEL_ID, **{field: telegram_file_id}
+            )
+            sent_message_id = sent.message_id
+        
+        try:
+            forwarded = await limiter.call(
+                backup_bot.forward_message,
+                chat_id=settings.STORAGE_CHANNEL_ID,
+                from_chat_id=settings.STORAGE_CHANNEL_ID,
+                message_id=sent_message_id
+            )
         finally:
-            self._is_syncing = False
-            self._stop_flag = False
+            # 删除临时消息 (媒体组中的消息由发送方统一删除)
+            if own_message:
+                await self._delete_temp(main_bot, sent_message_id, limiter, cleaner)
+        await self._delete_temp(backup_bot, forwarded.message_id, limiter, cleaner)
+        
+        return self._extract_file_info(forwarded)
     
     async def _sync_media_files(
         self,
-        session: AsyncSession,
+        main_bot: Bot,
         backup_bot: Bot,
-        backup_id: int
+        progress: SyncProgress,
+        after_id: int = 0
     ) -> tuple[int, int]:
-        """同步 MediaFile（资源媒体）
+        """同步未关联资产的 MediaFile（历史资源媒体）
         
         两种同步方式：
         1. 有 source_message_id：从来源频道转发
         2. 无 source_message_id：用主 Bot 发送到存储频道，备份 Bot 转发
         """
-        synced = 0
-        failed = 0
-        
-        # 获取主 Bot
-        main_bot = Bot(token=settings.BOT_TOKEN)
-        
-        try:
-            # 获取所有媒体文件
-            result = await session.execute(select(MediaFile))
-            media_files = result.scalars().all()
-            
-            logger.info(f"待同步 MediaFile: {len(media_files)}")
-            
-            for mf in media_files:
-                if self._stop_flag:
-                    logger.info("收到停止信号，退出同步")
-                    break
-                
-                # 检查是否已同步
-                existing = await session.execute(
-                    select(FileIdMapping).where(
-                        FileIdMapping.source_type == "resource",
-                        FileIdMapping.source_id == mf.id
-                    )
-                )
-                if existing.scalar_one_or_none():
-                    synced += 1
-                    continue
-                
-                try:
-                    backup_file_id = None
-                    backup_file_unique_id = None
-                    
-                    if mf.source_message_id and mf.source_channel_id:
-                        # 方式 1：从来源频道转发
-                        forwarded = await backup_bot.forward_message(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            from_chat_id=mf.source_channel_id,
-                            message_id=mf.source_message_id
-                        )
-                        backup_file_id, backup_file_unique_id = self._extract_file_info(forwarded)
-                        
-                        # 删除转发的消息
-                        try:
-                            await backup_bot.delete_message(
-                                chat_id=settings.STORAGE_CHANNEL_ID,
-                                message_id=forwarded.message_id
-                            )
-                        except:
-                            pass
-                    else:
-                        # 方式 2：用主 Bot 发送，备份 Bot 转发
-                        if mf.file_type == "photo":
-                            sent = await main_bot.send_photo(
-                                chat_id=settings.STORAGE_CHANNEL_ID,
-                                photo=mf.telegram_file_id
-                            )
-                        elif mf.file_type == "video":
-                            sent = await main_bot.send_video(
-                                chat_id=settings.STORAGE_CHANNEL_ID,
-                                video=mf.telegram_file_id
-                            )
-                        else:
-                            sent = await main_bot.send_document(
-                                chat_id=settings.STORAGE_CHANNEL_ID,
-                                document=mf.telegram_file_id
-                            )
-                        
-                        # 备份 Bot 转发
-                        forwarded = await backup_bot.forward_message(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            from_chat_id=settings.STORAGE_CHANNEL_ID,
-                            message_id=sent.message_id
-                        )
-                        backup_file_id, backup_file_unique_id = self._extract_file_info(forwarded)
-                        
-                        # 删除临时消息
-                        try:
-                            await main_bot.delete_message(
-                                chat_id=settings.STORAGE_CHANNEL_ID,
-                                message_id=sent.message_id
-                            )
-                            await backup_bot.delete_message(
-                                chat_id=settings.STORAGE_CHANNEL_ID,
-                                message_id=forwarded.message_id
-                            )
-                        except:
-                            pass
-                    
-                    if backup_file_id:
-                        # 更新 MediaFile 的 file_unique_id
-                        if not mf.file_unique_id:
-                            mf.file_unique_id = backup_file_unique_id
-                        
-                        # 创建映射
-                        mapping = FileIdMapping(
-                            file_unique_id=mf.file_unique_id or backup_file_unique_id,
-                            primary_file_id=mf.telegram_file_id,
-                            backup_file_id=backup_file_id,
-                            file_type=mf.file_type,
-                            source_type="resource",
-                            source_id=mf.id
-                        )
-                        session.add(mapping)
-                        await session.commit()
-                        
-                        synced += 1
-                        logger.debug(f"同步成功: MediaFile id={mf.id}")
-                    else:
-                        failed += 1
-                        logger.warning(f"无法提取 file_id: MediaFile id={mf.id}")
-                    
-                    # 速率限制
-                    await asyncio.sleep(0.3)
-                    
-                except TelegramAPIError as e:
-                    failed += 1
-                    logger.error(f"同步失败 MediaFile id={mf.id}: {e}")
+        logger.info(f"开始同步 MediaFile: after_id={after_id}")
         
-        finally:
-            await main_bot.session.close()
+        # 未关联资产的媒体文件（已关联的随资产同步）
+        jobs = self._iter_jobs(
+            "resource",
+            select(MediaFile).where(MediaFile.asset_id.is_(None)),
+            FileIdMapping.source_id,
+            lambda mf: mf.id,
+            progress.backup_id,
+            after_id,
+        )
         
-        return synced, failed
+        return await self._run_jobs(main_bot, backup_bot, progress, jobs)
     
     def _extract_file_info(self, message) -> tuple[str | None, str | None]:
         """从消息中提取 file_id 和 file_unique_id"""
@@ -394,293 +1149,159 @@ class BackupSyncService:
     
     async def _sync_sponsor_media_files(
         self,
-        session: AsyncSession,
+        main_bot: Bot,
         backup_bot: Bot,
-        backup_id: int
+        progress: SyncProgress,
+        after_id: int = 0
     ) -> tuple[int, int]:
         """同步 SponsorMediaFile（广告媒体组）
         
         广告媒体没有 source_message_id，需要通过发送到存储频道再提取
         """
-        synced = 0
-        failed = 0
+        logger.info(f"开始同步 SponsorMediaFile: after_id={after_id}")
         
-        # 获取主 Bot
-        from app.config import settings
-        main_bot = Bot(token=settings.BOT_TOKEN)
+        jobs = self._iter_jobs(
+            "sponsor",
+            select(SponsorMediaFile).where(SponsorMediaFile.asset_id.is_(None)),
+            FileIdMapping.source_id,
+            lambda sf: sf.id,
+            progress.backup_id,
+            after_id,
+        )
         
-        try:
-            result = await session.execute(select(SponsorMediaFile))
-            sponsor_files = result.scalars().all()
-            
-            logger.info(f"待同步 SponsorMediaFile: {len(sponsor_files)}")
-            
-            for sf in sponsor_files:
-                if self._stop_flag:
-                    break
-                
-                # 检查是否已同步
-                existing = await session.execute(
-                    select(FileIdMapping).where(
-                        FileIdMapping.source_type == "sponsor",
-                        FileIdMapping.source_id == sf.id
-                    )
-                )
-                if existing.scalar_one_or_none():
-                    synced += 1
-                    continue
-                
-                try:
-                    # 用主 Bot 发送到存储频道
-                    if sf.file_type == "photo":
-                        sent = await main_bot.send_photo(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            photo=sf.telegram_file_id
-                        )
-                    elif sf.file_type == "video":
-                        sent = await main_bot.send_video(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            video=sf.telegram_file_id
-                        )
-                    else:
-                        sent = await main_bot.send_document(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            document=sf.telegram_file_id
-                        )
-                    
-                    # 备份 Bot 转发这条消息
-                    forwarded = await backup_bot.forward_message(
-                        chat_id=settings.STORAGE_CHANNEL_ID,
-                        from_chat_id=settings.STORAGE_CHANNEL_ID,
-                        message_id=sent.message_id
-                    )
-                    
-                    # 提取 file_id
-                    backup_file_id = None
-                    file_unique_id = None
-                    
-                    if forwarded.photo:
-                        photo = forwarded.photo[-1]
-                        backup_file_id = photo.file_id
-                        file_unique_id = photo.file_unique_id
-                    elif forwarded.video:
-                        backup_file_id = forwarded.video.file_id
-                        file_unique_id = forwarded.video.file_unique_id
-                    elif forwarded.document:
-                        backup_file_id = forwarded.document.file_id
-                        file_unique_id = forwarded.document.file_unique_id
-                    
-                    if backup_file_id:
-                        # 更新 SponsorMediaFile
-                        if not sf.file_unique_id:
-                            sf.file_unique_id = file_unique_id
-                        
-                        # 创建映射
-                        mapping = FileIdMapping(
-                            file_unique_id=sf.file_unique_id or file_unique_id,
-                            primary_file_id=sf.telegram_file_id,
-                            backup_file_id=backup_file_id,
-                            file_type=sf.file_type,
-                            source_type="sponsor",
-                            source_id=sf.id
-                        )
-                        session.add(mapping)
-                        await session.commit()
-                        
-                        synced += 1
-                    else:
-                        failed += 1
-                    
-                    # 删除临时消息
-                    try:
-                        await main_bot.delete_message(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            message_id=sent.message_id
-                        )
-                        await backup_bot.delete_message(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            message_id=forwarded.message_id
-                        )
-                    except:
-                        pass
-                    
-                    await asyncio.sleep(0.5)
-                    
-                except TelegramAPIError as e:
-                    failed += 1
-                    logger.error(f"同步失败 SponsorMediaFile id={sf.id}: {e}")
-        
-        finally:
-            await main_bot.session.close()
-        
-        return synced, failed
+        return await self._run_jobs(main_bot, backup_bot, progress, jobs)
     
     async def _sync_sponsor_single_files(
         self,
-        session: AsyncSession,
+        main_bot: Bot,
         backup_bot: Bot,
-        backup_id: int
+        progress: SyncProgress,
+        after_id: int = 0
     ) -> tuple[int, int]:
         """同步 Sponsor 单个媒体文件
         
         处理 media_type 为 photo/video 且有 telegram_file_id 的广告
         """
-        synced = 0
-        failed = 0
-        
         from app.models import Sponsor
-        main_bot = Bot(token=settings.BOT_TOKEN)
         
-        try:
-            # 获取所有有单个媒体的广告
-            result = await session.execute(
-                select(Sponsor).where(
-                    Sponsor.telegram_file_id.isnot(None),
-                    Sponsor.media_type.in_(["photo", "video"])
-                )
-            )
-            sponsors = result.scalars().all()
-            
-            logger.info(f"待同步 Sponsor 单个媒体: {len(sponsors)}")
-            
-            for sponsor in sponsors:
-                if self._stop_flag:
-                    break
-                
-                # 检查是否已同步（用 primary_file_id 查询）
-                existing = await session.execute(
-                    select(FileIdMapping).where(
-                        FileIdMapping.primary_file_id == sponsor.telegram_file_id,
-                        FileIdMapping.source_type == "sponsor_single"
-                    )
-                )
-                if existing.scalar_one_or_none():
-                    synced += 1
-                    continue
-                
-                try:
-                    # 用主 Bot 发送到存储频道
-                    if sponsor.media_type == "photo":
-                        sent = await main_bot.send_photo(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            photo=sponsor.telegram_file_id
-                        )
-                    else:
-                        sent = await main_bot.send_video(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            video=sponsor.telegram_file_id
-                        )
-                    
-                    # 备份 Bot 转发
-                    forwarded = await backup_bot.forward_message(
-                        chat_id=settings.STORAGE_CHANNEL_ID,
-                        from_chat_id=settings.STORAGE_CHANNEL_ID,
-                        message_id=sent.message_id
-                    )
-                    
-                    backup_file_id, file_unique_id = self._extract_file_info(forwarded)
-                    
-                    if backup_file_id:
-                        # 创建映射
-                        mapping = FileIdMapping(
-                            file_unique_id=file_unique_id,
-                            primary_file_id=sponsor.telegram_file_id,
-                            backup_file_id=backup_file_id,
-                            file_type=sponsor.media_type,
-                            source_type="sponsor_single",
-                            source_id=sponsor.id
-                        )
-                        session.add(mapping)
-                        await session.commit()
-                        
-                        synced += 1
-                        logger.debug(f"同步成功: Sponsor 单媒体 id={sponsor.id}")
-                    else:
-                        failed += 1
-                    
-                    # 删除临时消息
-                    try:
-                        await main_bot.delete_message(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            message_id=sent.message_id
-                        )
-                        await backup_bot.delete_message(
-                            chat_id=settings.STORAGE_CHANNEL_ID,
-                            message_id=forwarded.message_id
-                        )
-                    except:
-                        pass
-                    
-                    await asyncio.sleep(0.5)
-                    
-                except TelegramAPIError as e:
-                    failed += 1
-                    logger.error(f"同步失败 Sponsor 单媒体 id={sponsor.id}: {e}")
+        logger.info(f"开始同步 Sponsor 单个媒体: after_id={after_id}")
         
-        finally:
-            await main_bot.session.close()
+        # 有单个媒体的广告，按 file_id 判断已同步（更换媒体后重新同步，见 synced_file_ids）
+        jobs = self._iter_jobs(
+            "sponsor_single",
+            select(Sponsor).where(
+                Sponsor.telegram_file_id.isnot(None),
+                Sponsor.media_type.in_(["photo", "video"])
+            ),
+            FileIdMapping.primary_file_id,
+            lambda sponsor: sponsor.telegram_file_id,
+            progress.backup_id,
+            after_id,
+        )
         
-        return synced, failed
+        return await self._run_jobs(main_bot, backup_bot, progress, jobs)
     
-    async def switch_to_backup(self) -> dict:
-        """切换到备份 Bot"""
+    async def switch_to_backup(self, backup_id: Optional[int] = None) -> dict:
+        """切换到备份 Bot (未指定时选择最早创建的已同步备份 Bot)
+        
+        全量同步完成后新增的媒体由增量镜像持续跟进，切换前先处理队列中的到期任务。
+        """
+        from app.services.backup_mirror import backup_mirror_service
+        
+        backups = [
+            backup for backup in await self.list_backups()
+            if backup_id is None or backup.id == backup_id
+        ]
+        if not backups:
+            return {"success": False, "error": "没有备份配置"}
+        
+        backup = next((backup for backup in backups if backup.sync_status == "synced"), None)
+        if backup is None:
+            return {"success": False, "error": "请先完成同步"}
+        
+        deadline = time.monotonic() + MIRROR_DRAIN_TIMEOUT
+        while time.monotonic() < deadline and await backup_mirror_service.drain_once():
+            pass
+        
         async with AsyncSessionLocal() as session:
-            result = await session.execute(select(BotBackup).limit(1))
-            backup = result.scalar_one_or_none()
-            
-            if not backup:
+            result = await session.execute(
+                update(BotBackup)
+                .where(BotBackup.id == backup.id)
+                .values(is_active=True)
+            )
+            if not result.rowcount:
                 return {"success": False, "error": "没有备份配置"}
             
-            if backup.sync_status != "synced":
-                return {"success": False, "error": "请先完成同步"}
-            
-            backup.is_active = True
+            # 同一时间只激活一个备份 Bot
+            await session.execute(
+                update(BotBackup)
+                .where(BotBackup.id != backup.id, BotBackup.is_active.is_(True))
+                .values(is_active=False)
+            )
+            await session.execute(select(func.pg_notify(FAILOVER_CHANNEL, str(backup.id))))
             await session.commit()
             
-            logger.info("已切换到备份 Bot")
-            return {"success": True, "message": "已切换到备份 Bot"}
+            logger.info(f"已切换到备份 Bot @{backup.backup_bot_username}")
+            return {"success": True, "message": f"已切换到备份 Bot @{backup.backup_bot_username}"}
     
     async def switch_to_primary(self) -> dict:
         """切换回主 Bot"""
         async with AsyncSessionLocal() as session:
-            result = await session.execute(select(BotBackup).limit(1))
-            backup = result.scalar_one_or_none()
-            
-            if not backup:
+            count = await session.scalar(select(func.count()).select_from(BotBackup))
+            if not count:
                 return {"success": False, "error": "没有备份配置"}
             
-            backup.is_active = False
+            await session.execute(
+                update(BotBackup)
+                .where(BotBackup.is_active.is_(True))
+                .values(is_active=False)
+            )
+            await session.execute(select(func.pg_notify(FAILOVER_CHANNEL, "primary")))
             await session.commit()
             
             logger.info("已切换回主 Bot")
             return {"success": True, "message": "已切换回主 Bot"}
     
+    def set_active(self, backup_id: Optional[int]) -> None:
+        """设置当前轮询使用的 Bot (None 为主 Bot)，file_id 解析随之切换"""
+        self._active_pinned = True
+        self._active_backup_id = backup_id
+    
     async def get_file_id(self, file_unique_id: str) -> Optional[str]:
         """根据 file_unique_id 获取当前应使用的 file_id
         
-        如果备份 Bot 激活，返回 backup_file_id，否则返回 primary_file_id
+        如果备份 Bot 激活，返回该备份 Bot 的 file_id (尚未同步时退回主 Bot 的)，
+        否则返回 primary_file_id
         """
         async with AsyncSessionLocal() as session:
-            # 获取备份配置
-            backup_result = await session.execute(select(BotBackup).limit(1))
-            backup = backup_result.scalar_one_or_none()
+            backup_id = self._active_backup_id
+            if not self._active_pinned:
+                backup_id = await session.scalar(
+                    select(BotBackup.id).where(BotBackup.is_active.is_(True)).limit(1)
+                )
             
-            use_backup = backup and backup.is_active
+            if backup_id is None:
+                return await session.scalar(
+                    select(FileIdMapping.primary_file_id)
+                    .where(FileIdMapping.file_unique_id == file_unique_id)
+                )
             
-            # 查找映射
+            # 按 (backup_id, file_unique_id) 唯一索引查找
             result = await session.execute(
-                select(FileIdMapping).where(
-                    FileIdMapping.file_unique_id == file_unique_id
+                select(FileIdMapping.primary_file_id, BackupFileId.file_id)
+                .outerjoin(
+                    BackupFileId,
+                    (BackupFileId.file_unique_id == FileIdMapping.file_unique_id)
+                    & (BackupFileId.backup_id == backup_id)
                 )
+                .where(FileIdMapping.file_unique_id == file_unique_id)
             )
-            mapping = result.scalar_one_or_none()
-            
-            if not mapping:
+            row = result.first()
+            if row is None:
                 return None
             
-            if use_backup and mapping.backup_file_id:
-                return mapping.backup_file_id
-            return mapping.primary_file_id
+            primary_file_id, backup_file_id = row
+            return backup_file_id or primary_file_id
 
 
 # 全局单例
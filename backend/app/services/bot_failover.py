@@ -0,0 +1,140 @@
+"""
+Bot 热切换
+
+运行在 Bot 进程内：预热所有备份 Bot，LISTEN API 进程切换主备时发送的 NOTIFY，
+停止当前轮询、等待处理中的更新完成后切换 file_id 解析，再用另一个 Bot 开始轮询，
+无需修改配置或重启进程。
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database import AsyncSessionLocal, engine
+from app.models import BotBackup
+from app.services.backup_sync import backup_sync_service, FAILOVER_CHANNEL
+from app.services.telegram_clients import telegram_clients
+
+logger = logging.getLogger(__name__)
+
+# 监听连接检查及主备状态兜底轮询间隔 (秒)
+CHECK_INTERVAL = 5
+
+# 切换时等待处理中更新完成的最长时间 (秒)
+DRAIN_TIMEOUT = 5
+
+
+class BotFailoverController:
+    """Bot 热切换控制器"""
+
+    def __init__(self):
+        self._dp: Optional[Dispatcher] = None
+        # 当前轮询的备份配置 ID (None 为主 Bot)
+        self._active_id: Optional[int] = None
+        self._switching = False
+        self._switch_lock = asyncio.Lock()
+        self._conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _target(self) -> tuple[Optional[int], Bot]:
+        """按备份配置决定应轮询的 Bot，并预热所有备份 Bot"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(BotBackup).order_by(BotBackup.id))
+            backups = result.scalars().all()
+
+        active_id, bot = None, telegram_clients.get(settings.BOT_TOKEN)
+        for backup in backups:
+            backup_bot = telegram_clients.get(backup.backup_bot_token)
+            try:
+                # bot.me() 结果会缓存，切换时开始轮询无需再请求
+                await backup_bot.me()
+            except Exception as e:
+                logger.warning(f"预热备份 Bot @{backup.backup_bot_username} 失败: {e}")
+                continue
+            if backup.is_active:
+                active_id, bot = backup.id, backup_bot
+        return active_id, bot
+
+    async def check(self) -> None:
+        """主备状态与当前轮询不一致时停止轮询，由 run() 切换"""
+        if self._dp is None:
+            return
+        async with self._switch_lock:
+            active_id, _ = await self._target()
+            if active_id != self._active_id and not self._switching:
+                logger.info(f"切换 Bot: {f'备份 Bot backup_id={active_id}' if active_id else '主 Bot'}")
+                self._switching = True
+                try:
+                    await self._dp.stop_polling()
+                except RuntimeError:
+                    # 轮询尚未开始，等下次检查
+                    self._switching = False
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        asyncio.create_task(self.check())
+
+    async def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _watch(self) -> None:
+        """保持 LISTEN 连接，并定期兜底检查主备状态"""
+        while True:
+            try:
+                if engine.dialect.name == "postgresql" and (
+                    self._conn is None or self._conn.closed
+                    or (await self._conn.get_raw_connection()).driver_connection.is_closed()
+                ):
+                    await self._close()
+                    self._conn = await engine.connect()
+                    raw = await self._conn.get_raw_connection()
+                    await raw.driver_connection.add_listener(FAILOVER_CHANNEL, self._on_notify)
+                await self.check()
+            except Exception as e:
+                logger.error(f"主备切换监听失败: {e}", exc_info=True)
+                await self._close()
+            await asyncio.sleep(CHECK_INTERVAL)
+
+    async def run(self, dp: Dispatcher, **polling_kwargs) -> None:
+        """轮询主循环
+
+        切换时停止当前 Bot 的轮询，等待处理中的更新完成，
+        切换 file_id 解析后用另一个 Bot 开始轮询；收到退出信号时返回。
+        """
+        self._dp = dp
+        self._task = asyncio.create_task(self._watch())
+        try:
+            while True:
+                async with self._switch_lock:
+                    self._active_id, bot = await self._target()
+                    backup_sync_service.set_active(self._active_id)
+                    self._switching = False
+
+                await dp.start_polling(bot, close_bot_session=False, **polling_kwargs)
+                if not self._switching:
+                    break
+
+                # 等待旧 Bot 处理中的更新 (aiogram 未公开该集合，不存在时不等待)
+                pending = set(getattr(dp, "_handle_update_tasks", ()))
+                if pending:
+                    await asyncio.wait(pending, timeout=DRAIN_TIMEOUT)
+        finally:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            await self._close()
+            self._dp = None
+
+
+# 全局单例
+bot_failover = BotFailoverController()
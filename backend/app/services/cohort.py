@@ -0,0 +1,296 @@
+"""
+用户群组留存服务
+
+用户按 (首次使用日期, 来源邀请码) 划分群组，增量维护：
+- cohort_sizes: 按首次使用日期窗口累加新用户
+- user_active_days: 按事件日期窗口记录用户的活跃日期
+- cohort_retention: 仅对新插入的活跃日累加 (群组, 第 N 天) 单元格
+
+与日汇总一样按日期窗口推进：只处理结束后已过 COMMIT_LAG 的日期，窗口内按 ID 分批，
+每批数据与窗口内游标在同一事务内提交，提交较晚的小 ID 记录不会漏计。
+留存矩阵直接读取预计算的单元格，不再关联 users 与 statistics。
+"""
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, date, timedelta
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import (
+    User, Statistics, RollupState, UserActiveDay, CohortSize, CohortRetention,
+)
+from app.services.stats_rollup import day_start, rollup_cutoff
+
+logger = logging.getLogger(__name__)
+
+USERS_STATE = "cohort_users"
+EVENTS_STATE = "cohort_events"
+
+# 单条 INSERT 的最大行数 (asyncpg 参数个数上限 32767)
+INSERT_CHUNK = 5000
+
+
+def _chunks(items: list, size: int = INSERT_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class CohortService:
+    """用户群组留存服务"""
+
+    def __init__(self, batch_size: int = 50_000):
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _lock_state(self, session: AsyncSession, name: str) -> RollupState:
+        """获取并锁定处理进度 (不存在时先创建，多进程并发创建不冲突)"""
+        await session.execute(
+            insert(RollupState)
+            .values(name=name, last_event_id=0)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        result = await session.execute(
+            select(RollupState).where(RollupState.name == name).with_for_update()
+        )
+        return result.scalar_one()
+
+    async def _window_end(self, session: AsyncSession, state: RollupState, column) -> Optional[datetime]:
+        """当前窗口 [covered_until, covered_until + 1 天) 的结束时间，尚无可处理的完整日期时返回 None"""
+        cutoff = rollup_cutoff()
+        if state.covered_until is None:
+            # 首次运行: 从最早记录所在的日期开始
+            first = await session.scalar(select(func.min(column)).where(column < cutoff))
+            state.covered_until = day_start(first) if first else cutoff
+            state.last_event_id = 0
+        window_end = state.covered_until + timedelta(days=1)
+        return window_end if window_end <= cutoff else None
+
+    async def run_once(self) -> tuple[int, int]:
+        """执行一次增量更新
+
+        Returns:
+            (处理的用户数, 处理的事件数)
+        """
+        users = await self._process_users()
+        events = await self._process_events()
+        if users or events:
+            logger.info(f"用户群组留存更新完成: 用户 {users} 个, 事件 {events} 条")
+        return users, events
+
+    async def _process_users(self) -> int:
+        """累加新用户到群组规模"""
+        processed = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                state = await self._lock_state(session, USERS_STATE)
+                window_end = await self._window_end(session, state, User.first_seen)
+                if window_end is None:
+                    await session.commit()
+                    return processed
+
+                result = await session.execute(
+                    select(User.id, User.first_seen, User.invite_code)
+                    .where(
+                        User.id > state.last_event_id,
+                        User.first_seen >= state.covered_until,
+                        User.first_seen < window_end,
+                    )
+                    .order_by(User.id)
+                    .limit(self.batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    state.covered_until = window_end
+                    state.last_event_id = 0
+                    await session.commit()
+                    continue
+
+                sizes = Counter(
+                    (row.first_seen.date(), row.invite_code or "") for row in rows
+                )
+                for chunk in _chunks(list(sizes.items())):
+                    stmt = insert(CohortSize).values([
+                        {"cohort_date": key[0], "invite_code": key[1], "users": count}
+                        for key, count in chunk
+                    ])
+                    await session.execute(stmt.on_conflict_do_update(
+                        index_elements=["cohort_date", "invite_code"],
+                        set_={"users": CohortSize.users + stmt.excluded.users},
+                    ))
+
+                state.last_event_id = rows[-1].id
+                await session.commit()
+                processed += len(rows)
+
+    async def _process_events(self) -> int:
+        """记录活跃日并累加留存单元格"""
+        processed = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                state = await self._lock_state(session, EVENTS_STATE)
+                window_end = await self._window_end(session, state, Statistics.created_at)
+                if window_end is None:
+                    await session.commit()
+                    return processed
+
+                result = await session.execute(
+                    select(Statistics.id, Statistics.user_id, Statistics.created_at)
+                    .where(
+                        Statistics.id > state.last_event_id,
+                        Statistics.created_at >= state.covered_until,
+                        Statistics.created_at < window_end,
+                    )
+                    .order_by(Statistics.id)
+                    .limit(self.batch_size)
+                )
+                rows = result.all()
+                if not rows:
+                    state.covered_until = window_end
+                    state.last_event_id = 0
+                    await session.commit()
+                    continue
+
+                active = list({
+                    (row.user_id, row.created_at.date())
+                    for row in rows if row.user_id is not None
+                })
+                await self._merge_active_days(session, active)
+
+                state.last_event_id = rows[-1].id
+                await session.commit()
+                processed += len(rows)
+
+    async def _merge_active_days(self, session: AsyncSession, active: list[tuple[int, date]]) -> None:
+        """插入活跃日，新插入的活跃日计入对应群组的留存单元格"""
+        inserted: list[tuple[int, date]] = []
+        for chunk in _chunks(active):
+            result = await session.execute(
+                insert(UserActiveDay)
+                .values([{"user_id": user_id, "date": day} for user_id, day in chunk])
+                .on_conflict_do_nothing()
+                .returning(UserActiveDay.user_id, UserActiveDay.date)
+            )
+            inserted.extend(result.all())
+        if not inserted:
+            return
+
+        # 用户所属群组
+        cohorts: dict[int, tuple[date, str]] = {}
+        user_ids = list({user_id for user_id, _ in inserted})
+        for chunk in _chunks(user_ids):
+            result = await session.execute(
+                select(User.telegram_id, User.first_seen, User.invite_code)
+                .where(User.telegram_id.in_(chunk))
+            )
+            for row in result:
+                cohorts[row.telegram_id] = (row.first_seen.date(), row.invite_code or "")
+
+        cells: Counter = Counter()
+        for user_id, day in inserted:
+            cohort = cohorts.get(user_id)
+            if cohort is None:
+                continue
+            offset = (day - cohort[0]).days
+            if offset >= 0:
+                cells[(cohort[0], cohort[1], offset)] += 1
+
+        for chunk in _chunks(list(cells.items())):
+            stmt = insert(CohortRetention).values([
+                {"cohort_date": key[0], "invite_code": key[1], "day_offset": key[2], "users": count}
+                for key, count in chunk
+            ])
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=["cohort_date", "invite_code", "day_offset"],
+                set_={"users": CohortRetention.users + stmt.excluded.users},
+            ))
+
+    async def get_retention(
+        self,
+        db: AsyncSession,
+        since: date,
+        until: date,
+        max_offset: int,
+        invite_codes: Optional[list[str]] = None,
+        weekly: bool = False,
+    ) -> list[dict]:
+        """读取留存矩阵
+
+        Args:
+            since, until: 群组首次使用日期范围 [since, until)
+            max_offset: 返回的最大天数
+            invite_codes: 只统计这些来源的用户，None 表示全部
+            weekly: 按周 (周一开始) 合并群组
+
+        Returns:
+            [{"cohort": 群组开始日期, "size": 用户数, "retained": [第 0..max_offset 天的活跃用户数]}]
+        """
+        def cohort_of(day: date) -> date:
+            return day - timedelta(days=day.weekday()) if weekly else day
+
+        size_query = select(
+            CohortSize.cohort_date, func.sum(CohortSize.users).label("users")
+        ).where(
+            CohortSize.cohort_date >= since, CohortSize.cohort_date < until
+        ).group_by(CohortSize.cohort_date)
+        cell_query = select(
+            CohortRetention.cohort_date,
+            CohortRetention.day_offset,
+            func.sum(CohortRetention.users).label("users"),
+        ).where(
+            CohortRetention.cohort_date >= since,
+            CohortRetention.cohort_date < until,
+            CohortRetention.day_offset <= max_offset,
+        ).group_by(CohortRetention.cohort_date, CohortRetention.day_offset)
+        if invite_codes is not None:
+            size_query = size_query.where(CohortSize.invite_code.in_(invite_codes))
+            cell_query = cell_query.where(CohortRetention.invite_code.in_(invite_codes))
+
+        cohorts: dict[date, dict] = {}
+        for row in await db.execute(size_query):
+            cohort = cohorts.setdefault(
+                cohort_of(row.cohort_date),
+                {"size": 0, "retained": [0] * (max_offset + 1)},
+            )
+            cohort["size"] += int(row.users)
+        for row in await db.execute(cell_query):
+            cohort = cohorts.get(cohort_of(row.cohort_date))
+            if cohort is not None:
+                cohort["retained"][row.day_offset] += int(row.users)
+
+        return [
+            {"cohort": key, **cohorts[key]} for key in sorted(cohorts)
+        ]
+
+    async def run_forever(self, interval: int) -> None:
+        """定期执行增量更新"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"用户群组留存更新失败: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        """启动后台更新任务 (与日汇总使用相同间隔)"""
+        if self._task is None and settings.STATS_ROLLUP_INTERVAL > 0:
+            self._task = asyncio.create_task(self.run_forever(settings.STATS_ROLLUP_INTERVAL))
+
+    async def stop(self) -> None:
+        """停止后台更新任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局单例
+cohort_service = CohortService()
@@ -0,0 +1,113 @@
+"""
+统计事件记录
+
+Bot 侧所有统计事件统一经由 record_event 写入：
+- 写入 statistics 表，同时写入邀请链接 ID 与事件类型编码
+- 同一事务内累加 user_engagement 中该用户的行为计数
+- PostgreSQL 上同时发送 NOTIFY，事务提交后 API 进程的实时计数器即可收到
+"""
+import json
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Statistics, InviteLink, UserEngagement
+from app.models.statistics import EVENT_CODES
+
+# 实时统计 NOTIFY 频道
+LIVE_CHANNEL = "stats_events"
+
+# 事件类型 -> user_engagement 计数列
+ENGAGEMENT_COLUMNS = {
+    "page_view": "page_views",
+    "ad_view": "ad_views",
+    "ad_click": "ad_clicks",
+    "preview_end": "preview_ends",
+}
+
+# 邀请码 -> 链接 ID 缓存有效期 (秒)
+# 链接由 API 进程删除后可用同一邀请码重新创建，Bot 进程无法得知，过期后重新查询
+LINK_ID_TTL = 60
+
+# 邀请码 -> (链接 ID, 缓存时间)
+_link_ids: dict[str, tuple[int, float]] = {}
+
+
+async def resolve_link_id(db: AsyncSession, invite_code: Optional[str]) -> Optional[int]:
+    """邀请码对应的链接 ID，链接不存在时返回 None"""
+    if not invite_code:
+        return None
+    now = time.monotonic()
+    cached = _link_ids.get(invite_code)
+    if cached is not None and now - cached[1] < LINK_ID_TTL:
+        return cached[0]
+
+    result = await db.execute(select(InviteLink.id).where(InviteLink.code == invite_code))
+    link_id = result.scalar_one_or_none()
+    if link_id is not None:
+        _link_ids[invite_code] = (link_id, now)
+    else:
+        _link_ids.pop(invite_code, None)
+    return link_id
+
+
+async def record_event(
+    db: AsyncSession,
+    event_type: str,
+    user_id: Optional[int] = None,
+    invite_code: Optional[str] = None,
+    resource_id: Optional[int] = None,
+    sponsor_id: Optional[int] = None,
+    page_number: Optional[int] = None,
+    invite_link_id: Optional[int] = None,
+) -> Statistics:
+    """记录统计事件 (随调用方事务提交)
+
+    调用方已知链接 ID 时传入 invite_link_id，否则按邀请码查询。
+    """
+    if invite_link_id is None:
+        invite_link_id = await resolve_link_id(db, invite_code)
+
+    now = datetime.utcnow()
+    stat = Statistics(
+        event_type=event_type,
+        event_code=EVENT_CODES.get(event_type),
+        user_id=user_id,
+        invite_code=invite_code,
+        invite_link_id=invite_link_id,
+        resource_id=resource_id,
+        sponsor_id=sponsor_id,
+        page_number=page_number,
+        created_at=now,
+    )
+    db.add(stat)
+
+    if user_id is not None:
+        await _update_engagement(db, user_id, event_type, now)
+
+    if db.bind.dialect.name == "postgresql":
+        # NOTIFY 在事务提交时才投递，回滚的事件不会被计数
+        payload = json.dumps({"e": event_type, "c": invite_code or ""})
+        await db.execute(select(func.pg_notify(LIVE_CHANNEL, payload)))
+
+    return stat
+
+
+async def _update_engagement(db: AsyncSession, user_id: int, event_type: str, now: datetime) -> None:
+    """累加用户行为计数 (单条 UPSERT)"""
+    column = ENGAGEMENT_COLUMNS.get(event_type)
+    values = {"user_id": user_id, "last_event_at": now}
+    if column:
+        values[column] = 1
+
+    stmt = insert(UserEngagement).values(**values)
+    update = {
+        "last_event_at": func.greatest(UserEngagement.last_event_at, stmt.excluded.last_event_at),
+    }
+    if column:
+        update[column] = getattr(UserEngagement, column) + 1
+    await db.execute(stmt.on_conflict_do_update(index_elements=["user_id"], set_=update))
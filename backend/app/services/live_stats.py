@@ -0,0 +1,204 @@
+"""
+实时统计计数器
+
+API 进程 LISTEN Bot 写入统计事件时发送的 NOTIFY，在内存中维护
+最近 1 分钟 / 1 小时 / 1 天的滑动窗口计数 (按邀请链接与事件类型)。
+看板通过 SSE 订阅快照，观看人数不影响数据库查询量。
+
+启动时用一次分组查询回填最近一天的数据 (精确到分钟)。
+"""
+import asyncio
+import calendar
+import json
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, func, literal_column, DateTime
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import engine
+from app.models import Statistics
+from app.services.events import LIVE_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# 窗口名 -> (窗口长度, 分桶长度)，单位秒
+WINDOWS = {
+    "minute": (60, 1),
+    "hour": (3600, 60),
+    "day": (86400, 300),
+}
+
+# 监听连接检查间隔 (秒)
+RECONNECT_INTERVAL = 5
+
+
+class SlidingWindowCounter:
+    """分桶滑动窗口计数器
+
+    每个桶保存该时间段内各 key 的计数，同时维护窗口内的总计，
+    过期的桶整桶扣除，读取快照无需遍历所有桶。
+    """
+
+    def __init__(self, window: int, bucket: int):
+        self.window = window
+        self.bucket = bucket
+        self._buckets: deque[tuple[int, Counter]] = deque()
+        self.totals: Counter = Counter()
+
+    def _expire(self, now: float) -> None:
+        """扣除已移出窗口的桶"""
+        while self._buckets and self._buckets[0][0] + self.bucket <= now - self.window:
+            _, counts = self._buckets.popleft()
+            self.totals.subtract(counts)
+            for key in counts:
+                if self.totals[key] <= 0:
+                    del self.totals[key]
+
+    def add(self, key, count: int = 1, now: Optional[float] = None) -> None:
+        """计数 (now 必须不早于之前的调用)"""
+        now = time.time() if now is None else now
+        self._expire(now)
+        start = int(now // self.bucket * self.bucket)
+        if not self._buckets or self._buckets[-1][0] != start:
+            self._buckets.append((start, Counter()))
+        self._buckets[-1][1][key] += count
+        self.totals[key] += count
+
+    def snapshot(self, now: Optional[float] = None) -> Counter:
+        """窗口内的计数"""
+        self._expire(time.time() if now is None else now)
+        return Counter(self.totals)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self.totals.clear()
+
+
+class LiveStatsService:
+    """实时统计服务"""
+
+    def __init__(self):
+        self.counters = {
+            name: SlidingWindowCounter(window, bucket)
+            for name, (window, bucket) in WINDOWS.items()
+        }
+        self._conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        self.started_at: Optional[float] = None
+
+    def record(self, event_type: str, invite_code: str, now: Optional[float] = None) -> None:
+        """计入一个事件"""
+        key = (invite_code or "", event_type)
+        for counter in self.counters.values():
+            counter.add(key, 1, now)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        """NOTIFY 回调"""
+        try:
+            data = json.loads(payload)
+            self.record(data["e"], data.get("c", ""))
+        except (ValueError, KeyError) as e:
+            logger.warning(f"无法解析实时统计事件: {payload!r} ({e})")
+
+    async def _backfill(self) -> None:
+        """回填最近一天的事件 (每分钟一行)"""
+        since = datetime.utcnow() - timedelta(seconds=WINDOWS["day"][0])
+        minute = func.date_trunc(literal_column("'minute'"), Statistics.created_at, type_=DateTime)
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(
+                    minute.label("minute"),
+                    Statistics.invite_code,
+                    Statistics.event_type,
+                    func.count().label("count"),
+                )
+                .where(Statistics.created_at >= since)
+                .group_by(minute, Statistics.invite_code, Statistics.event_type)
+                .order_by(minute)
+            )
+            for row in result.all():
+                ts = calendar.timegm(row.minute.timetuple())
+                key = (row.invite_code or "", row.event_type)
+                # 分钟窗口只统计实时事件，回填只进入小时 / 天窗口
+                self.counters["hour"].add(key, row.count, ts)
+                self.counters["day"].add(key, row.count, ts)
+
+    async def _listen(self) -> None:
+        """建立 LISTEN 连接"""
+        self._conn = await engine.connect()
+        raw = await self._conn.get_raw_connection()
+        await raw.driver_connection.add_listener(LIVE_CHANNEL, self._on_notify)
+        logger.info("实时统计已开始监听")
+
+    async def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _run(self) -> None:
+        """保持监听，连接断开后重新回填并监听"""
+        while True:
+            try:
+                if self._conn is None or self._conn.closed or (
+                    (await self._conn.get_raw_connection()).driver_connection.is_closed()
+                ):
+                    await self._close()
+                    for counter in self.counters.values():
+                        counter.clear()
+                    await self._backfill()
+                    await self._listen()
+            except Exception as e:
+                logger.error(f"实时统计监听失败: {e}", exc_info=True)
+                await self._close()
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+    def start(self) -> None:
+        """启动监听 (仅 PostgreSQL)"""
+        if self._task is None and engine.dialect.name == "postgresql":
+            self.started_at = time.time()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止监听"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+
+    def snapshot(self) -> dict:
+        """各窗口的计数快照
+
+        Returns:
+            {"windows": {窗口名: {"total": {事件类型: 数}, "links": {邀请码: {事件类型: 数}}}}}
+        """
+        now = time.time()
+        windows = {}
+        for name, counter in self.counters.items():
+            total: Counter = Counter()
+            links: dict[str, dict[str, int]] = {}
+            for (code, event_type), count in counter.snapshot(now).items():
+                total[event_type] += count
+                if code:
+                    links.setdefault(code, {})[event_type] = count
+            windows[name] = {"total": dict(total), "links": links}
+
+        return {
+            "ts": datetime.utcnow().isoformat(),
+            "listening": self._conn is not None,
+            "windows": windows,
+        }
+
+
+# 全局单例
+live_stats_service = LiveStatsService()
@@ -0,0 +1,147 @@
+"""
+媒体资产服务
+
+按 file_unique_id / 内容哈希对媒体文件去重：
+- 频道采集：相同文件复用同一资产，重复转发的资源直接跳过
+- 后台上传：相同内容不再重复上传到 Telegram
+"""
+import hashlib
+import logging
+from typing import Optional, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import MediaAsset, MediaFile, Resource
+from app.services.upload import FileUploadService
+
+logger = logging.getLogger(__name__)
+
+
+def compute_content_hash(file_content: bytes) -> str:
+    """计算文件内容 SHA-256"""
+    return hashlib.sha256(file_content).hexdigest()
+
+
+async def find_asset(
+    session: AsyncSession,
+    file_unique_id: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> Optional[MediaAsset]:
+    """按 file_unique_id 或内容哈希查找资产 (唯一索引查询)"""
+    if file_unique_id:
+        query = select(MediaAsset).where(MediaAsset.file_unique_id == file_unique_id)
+    elif content_hash:
+        query = select(MediaAsset).where(MediaAsset.content_hash == content_hash)
+    else:
+        return None
+
+    result = await session.execute(query)
+    return result.scalar_one_or_none()
+
+
+async def get_or_create_asset(
+    session: AsyncSession,
+    file_unique_id: str,
+    file_type: str,
+    telegram_file_id: str,
+    file_size: Optional[int] = None,
+    content_hash: Optional[str] = None,
+    source_channel_id: Optional[int] = None,
+    source_message_id: Optional[int] = None,
+) -> MediaAsset:
+    """获取或创建媒体资产
+
+    已存在时只补全缺失的来源信息，不会产生新行。
+    """
+    asset = await find_asset(session, file_unique_id=file_unique_id)
+
+    if asset is None:
+        asset = MediaAsset(
+            file_unique_id=file_unique_id,
+            content_hash=content_hash,
+            file_type=file_type,
+            telegram_file_id=telegram_file_id,
+            file_size=file_size,
+            source_channel_id=source_channel_id,
+            source_message_id=source_message_id,
+        )
+        try:
+            # 使用 SAVEPOINT，并发插入同一文件时回退为查询
+            async with session.begin_nested():
+                session.add(asset)
+                await session.flush()
+            return asset
+        except IntegrityError:
+            asset = await find_asset(session, file_unique_id=file_unique_id)
+            if asset is None:
+                raise
+
+    # 补全来源信息
+    if content_hash and not asset.content_hash:
+        asset.content_hash = content_hash
+    if source_message_id and not asset.source_message_id:
+        asset.source_channel_id = source_channel_id
+        asset.source_message_id = source_message_id
+    if file_size and not asset.file_size:
+        asset.file_size = file_size
+
+    return asset
+
+
+async def upload_with_dedup(
+    session: AsyncSession,
+    upload_service: FileUploadService,
+    file_content: bytes,
+    filename: str,
+    file_type: str,
+    caption: Optional[str] = None,
+) -> MediaAsset:
+    """上传文件 (内容相同则复用已有资产，跳过 Telegram 上传)"""
+    content_hash = compute_content_hash(file_content)
+
+    asset = await find_asset(session, content_hash=content_hash)
+    if asset:
+        logger.info(f"文件已存在，复用资产: asset_id={asset.id}")
+        return asset
+
+    file_id, file_unique_id = await upload_service.upload_and_get_file_info(
+        file_content=file_content,
+        filename=filename,
+        file_type=file_type,
+        caption=caption,
+        delete_after=True,
+    )
+
+    return await get_or_create_asset(
+        session,
+        file_unique_id=file_unique_id,
+        file_type=file_type,
+        telegram_file_id=file_id,
+        file_size=len(file_content),
+        content_hash=content_hash,
+    )
+
+
+async def is_duplicate_in_link(
+    session: AsyncSession,
+    invite_link_id: int,
+    asset_ids: Iterable[int],
+) -> bool:
+    """判断这些资产是否都已被该邀请链接的资源引用 (重复转发)"""
+    asset_ids = set(asset_ids)
+    if not asset_ids:
+        return False
+
+    result = await session.execute(
+        select(MediaFile.asset_id)
+        .join(Resource, Resource.id == MediaFile.resource_id)
+        .where(
+            Resource.invite_link_id == invite_link_id,
+            MediaFile.asset_id.in_(asset_ids),
+        )
+        .distinct()
+    )
+    existing = {row[0] for row in result.fetchall()}
+    return existing == asset_ids
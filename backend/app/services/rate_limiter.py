@@ -0,0 +1,142 @@
+"""
+Telegram 调用限速
+
+提供：
+- AIMD 自适应限速器 (遇到 TelegramRetryAfter 时按 retry_after 暂停)
+- 滑动窗口吞吐量统计
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AdaptiveRateLimiter:
+    """AIMD 自适应限速器
+
+    调用按当前速率均匀放行；每次成功加性提速，
+    收到 TelegramRetryAfter 时所有调用暂停 retry_after 秒、速率减半后重试。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = 0.5,
+        max_rate: float = 30.0,
+        increase: float = 0.1,
+        max_retries: int = 5,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.max_retries = max_retries
+        self.retry_after_count = 0
+        self._next_at = 0.0
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def paused_for(self) -> float:
+        """剩余暂停秒数"""
+        return max(0.0, self._paused_until - time.monotonic())
+
+    async def acquire(self) -> None:
+        """等待下一个放行时刻"""
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_at, self._paused_until)
+                self._next_at = start + 1.0 / self.rate
+            if start > now:
+                await asyncio.sleep(start - now)
+            # 等待期间可能收到新的 retry_after
+            if time.monotonic() >= self._paused_until:
+                return
+
+    def on_success(self) -> None:
+        """加性提速"""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_retry_after(self, retry_after: float) -> None:
+        """按 retry_after 暂停并将速率减半
+
+        并发调用在同一次限流中各自收到的 retry_after 只延长暂停，速率只减半一次。
+        """
+        now = time.monotonic()
+        if now >= self._paused_until:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.retry_after_count += 1
+        self._paused_until = max(self._paused_until, now + retry_after)
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """限速执行一次 Telegram 调用，被限流时等待后重试"""
+        attempt = 0
+        while True:
+            await self.acquire()
+            try:
+                result = await func(*args, **kwargs)
+            except TelegramRetryAfter as e:
+                self.on_retry_after(e.retry_after)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Telegram 限流，暂停 {e.retry_after}s，速率降至 {self.rate:.2f}/s")
+                continue
+            self.on_success()
+            return result
+
+    def estimate_seconds(self, calls: int) -> float:
+        """估算从当前速率起完成 calls 次调用的耗时 (不计限流)
+
+        每次成功加性提速，速率升到 max_rate 前的耗时按 ∫dk / (rate + increase·k) 计算。
+        """
+        rate = self.rate
+        ramp_calls = 0.0
+        seconds = self.paused_for
+        if self.increase > 0 and rate < self.max_rate:
+            ramp_calls = min(calls, (self.max_rate - rate) / self.increase)
+            seconds += math.log((rate + self.increase * ramp_calls) / rate) / self.increase
+        return seconds + (calls - ramp_calls) / self.max_rate
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": round(self.rate, 2),
+            "paused_for": round(self.paused_for, 1),
+            "retry_after_count": self.retry_after_count,
+        }
+
+
+class ThroughputMeter:
+    """滑动窗口吞吐量 (次/秒)"""
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self._events: deque[tuple[float, int]] = deque()
+        self._count = 0
+        self._started = time.monotonic()
+
+    def _expire(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.window:
+            _, n = self._events.popleft()
+            self._count -= n
+
+    def add(self, n: int = 1) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        self._events.append((now, n))
+        self._count += n
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        self._expire(now)
+        elapsed = min(self.window, now - self._started)
+        return self._count / elapsed if elapsed > 0 else 0.0
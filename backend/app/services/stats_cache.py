@@ -0,0 +1,131 @@
+"""
+统计结果缓存
+
+按接口与参数缓存统计结果：
+- 有效期 (STATS_CACHE_TTL) 内直接返回
+- 过期后的 STATS_CACHE_STALE_TTL 内先返回旧结果，同时在后台刷新
+- 相同的请求同时到达时只计算一次 (single-flight)
+
+计算在独立的数据库会话中进行，后台刷新不依赖请求的会话。
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import get_db_context
+
+logger = logging.getLogger(__name__)
+
+Compute = Callable[[AsyncSession], Awaitable[Any]]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    created_at: float
+
+
+class StatsCache:
+    """统计结果缓存"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: dict[Hashable, _Entry] = {}
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._counters = {
+            "hits": 0,          # 有效期内命中
+            "stale_hits": 0,    # 返回旧结果并后台刷新
+            "misses": 0,        # 未命中，同步计算
+            "coalesced": 0,     # 等待进行中的相同计算
+            "refreshes": 0,     # 后台刷新次数
+            "errors": 0,        # 计算失败次数
+        }
+
+    async def get_or_compute(self, key: Hashable, compute: Compute) -> Any:
+        """获取缓存结果，没有可用结果时计算
+
+        Args:
+            key: 缓存键 (接口名 + 参数)
+            compute: 计算函数，参数为数据库会话
+        """
+        ttl = settings.STATS_CACHE_TTL
+        if ttl <= 0:
+            async with get_db_context() as db:
+                return await compute(db)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.created_at
+            if age < ttl:
+                self._counters["hits"] += 1
+                return entry.value
+            if age < ttl + settings.STATS_CACHE_STALE_TTL:
+                self._counters["stale_hits"] += 1
+                if key not in self._inflight:
+                    self._counters["refreshes"] += 1
+                    self._start(key, compute)
+                return entry.value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._counters["coalesced"] += 1
+        else:
+            self._counters["misses"] += 1
+            task = self._start(key, compute)
+
+        # 请求取消时不中断共享的计算
+        return await asyncio.shield(task)
+
+    def _start(self, key: Hashable, compute: Compute) -> asyncio.Task:
+        """启动计算任务"""
+        task = asyncio.create_task(self._run(key, compute))
+        task.add_done_callback(self._on_done)
+        self._inflight[key] = task
+        return task
+
+    async def _run(self, key: Hashable, compute: Compute) -> Any:
+        """计算并写入缓存"""
+        try:
+            async with get_db_context() as db:
+                value = await compute(db)
+        except Exception:
+            self._counters["errors"] += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self._entries.pop(key, None)
+        self._entries[key] = _Entry(value, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+        return value
+
+    @staticmethod
+    def _on_done(task: asyncio.Task) -> None:
+        """记录后台刷新失败 (旧结果继续保留)"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"统计缓存计算失败: {task.exception()}")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        """命中率等指标"""
+        counters = dict(self._counters)
+        served = counters["hits"] + counters["stale_hits"] + counters["misses"] + counters["coalesced"]
+        counters["entries"] = len(self._entries)
+        counters["inflight"] = len(self._inflight)
+        counters["hit_rate"] = round(
+            (counters["hits"] + counters["stale_hits"] + counters["coalesced"]) / served, 4
+        ) if served else 0.0
+        return counters
+
+
+# 全局单例
+stats_cache = StatsCache()
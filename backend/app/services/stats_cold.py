@@ -0,0 +1,259 @@
+"""
+统计冷数据服务
+
+已归档 (从 PostgreSQL 删除) 的统计事件：
+- 归档的 csv.gz 转换为按月分区的 Parquet: {归档目录}/parquet/month=YYYY-MM/*.parquet
+- 使用嵌入式 DuckDB 查询 Parquet，与热数据 (汇总表 + 原始事件表) 合并
+- 冷数据只在新归档产生时变化，查询结果按月份列表缓存 (LRU，有上限)
+
+DuckDB 为可选依赖，未安装时冷数据不可用，全时段指标回退到日汇总表。
+"""
+import asyncio
+import logging
+import re
+from collections import OrderedDict
+from datetime import datetime, date
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PATTERN = re.compile(r"^statistics_y(\d{4})m(\d{2})\.csv\.gz$")
+
+# 归档 CSV 的列类型 (与 statistics 表一致)
+ARCHIVE_COLUMNS = {
+    "id": "BIGINT",
+    "event_type": "VARCHAR",
+    "user_id": "BIGINT",
+    "invite_code": "VARCHAR",
+    "resource_id": "INTEGER",
+    "sponsor_id": "INTEGER",
+    "page_number": "INTEGER",
+    "created_at": "TIMESTAMP",
+}
+
+_GROUP_COLUMNS = {"invite_code", "sponsor_id"}
+
+# 查询结果缓存条数上限 (时间窗口起点精确到微秒，按最近使用淘汰)
+CACHE_SIZE = 256
+
+
+def _import_duckdb():
+    """导入 DuckDB (可选依赖)"""
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+
+def _sql_string(value: str) -> str:
+    """SQL 字符串字面量"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+class ColdStatsService:
+    """统计冷数据服务"""
+
+    def __init__(self):
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        """DuckDB 是否可用"""
+        return _import_duckdb() is not None
+
+    @property
+    def parquet_dir(self) -> Path:
+        return Path(settings.STATS_ARCHIVE_DIR) / "parquet"
+
+    def list_months(self) -> dict[date, Path]:
+        """已转换为 Parquet 的月份
+
+        Returns:
+            {月份 1 日: Parquet 文件路径}
+        """
+        months = {}
+        if not self.parquet_dir.exists():
+            return months
+        for path in self.parquet_dir.glob("month=*/*.parquet"):
+            try:
+                month = datetime.strptime(path.parent.name, "month=%Y-%m").date()
+            except ValueError:
+                continue
+            months[month] = path
+        return months
+
+    def horizon(self) -> Optional[datetime]:
+        """冷数据覆盖的时间上界 (不含)，没有冷数据或 DuckDB 不可用时返回 None
+
+        冷数据总是最早的若干个月，早于该时间的事件已不在 PostgreSQL 中。
+        """
+        if not self.enabled:
+            return None
+        months = self.list_months()
+        if not months:
+            return None
+        last = max(months)
+        next_month = date(last.year + last.month // 12, last.month % 12 + 1, 1)
+        return datetime(next_month.year, next_month.month, 1)
+
+    def export_archive(self, archive_path: Path) -> Optional[Path]:
+        """将一个归档 csv.gz 转换为 Parquet (已转换则跳过)"""
+        duckdb = _import_duckdb()
+        if duckdb is None:
+            return None
+
+        match = ARCHIVE_PATTERN.match(archive_path.name)
+        if not match:
+            return None
+
+        month_dir = self.parquet_dir / f"month={match.group(1)}-{match.group(2)}"
+        target = month_dir / archive_path.name.replace(".csv.gz", ".parquet")
+        if target.exists():
+            return target
+
+        month_dir.mkdir(parents=True, exist_ok=True)
+        temp = target.with_suffix(".parquet.tmp")
+        columns = ", ".join(f"{_sql_string(k)}: {_sql_string(v)}" for k, v in ARCHIVE_COLUMNS.items())
+
+        conn = duckdb.connect()
+        try:
+            conn.execute(
+                f"COPY (SELECT * FROM read_csv({_sql_string(str(archive_path))}, "
+                f"header = true, columns = {{{columns}}}) ORDER BY created_at) "
+                f"TO {_sql_string(str(temp))} (FORMAT PARQUET, COMPRESSION ZSTD)"
+            )
+        finally:
+            conn.close()
+
+        temp.replace(target)
+        self._cache.clear()
+        logger.info(f"已导出冷数据: {archive_path.name} -> {target}")
+        return target
+
+    def export_pending(self) -> list[Path]:
+        """转换全部尚未转换的归档文件"""
+        if not self.enabled:
+            return []
+        archive_dir = Path(settings.STATS_ARCHIVE_DIR)
+        if not archive_dir.exists():
+            return []
+
+        exported = []
+        for path in sorted(archive_dir.glob("statistics_y*.csv.gz")):
+            try:
+                target = self.export_archive(path)
+                if target:
+                    exported.append(target)
+            except Exception as e:
+                logger.error(f"导出冷数据 {path.name} 失败: {e}", exc_info=True)
+        return exported
+
+    async def count_events(
+        self,
+        metrics: list[tuple[str, str, Optional[datetime]]],
+        group_by: Optional[str] = None,
+        invite_codes: Optional[list[str]] = None,
+        sponsor_ids: Optional[list[int]] = None,
+    ) -> dict:
+        """在冷数据上统计事件数，参数与返回值同 StatsQueryService.count_events"""
+        months = self.list_months()
+        if not months or not self.enabled:
+            return {}
+
+        # 跳过整月都早于全部时间窗口的文件
+        starts = [since for _, _, since in metrics]
+        if None not in starts:
+            earliest = min(starts)
+            months = {
+                month: path for month, path in months.items()
+                if datetime(month.year, month.month, 1) >= datetime(earliest.year, earliest.month, 1)
+            }
+            if not months:
+                return {}
+
+        # 起点不晚于最早冷数据的窗口等同于全部时间，共用缓存
+        first = min(months)
+        first_start = datetime(first.year, first.month, 1)
+        metrics = [
+            (name, event_type, since if since is not None and since > first_start else None)
+            for name, event_type, since in metrics
+        ]
+
+        files = tuple(str(path) for _, path in sorted(months.items()))
+        key = (
+            tuple(metrics),
+            group_by,
+            tuple(invite_codes) if invite_codes is not None else None,
+            tuple(sponsor_ids) if sponsor_ids is not None else None,
+            files,
+        )
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        result = await asyncio.to_thread(
+            self._query, metrics, group_by, invite_codes, sponsor_ids, files
+        )
+        self._cache[key] = result
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+    def _query(self, metrics, group_by, invite_codes, sponsor_ids, files) -> dict:
+        """执行 DuckDB 查询 (在线程中运行)"""
+        duckdb = _import_duckdb()
+        if group_by is not None and group_by not in _GROUP_COLUMNS:
+            raise ValueError(f"不支持的分组字段: {group_by}")
+
+        params: list = []
+        columns = []
+        for index, (_, event_type, since) in enumerate(metrics):
+            condition = "event_type = ?"
+            params.append(event_type)
+            if since is not None:
+                condition += " AND created_at >= ?"
+                params.append(since)
+            columns.append(f"count(*) FILTER (WHERE {condition}) AS m{index}")
+
+        where = [f"event_type IN ({', '.join('?' for _ in metrics)})"]
+        params.extend(event_type for _, event_type, _ in metrics)
+        if invite_codes is not None:
+            where.append(f"invite_code IN ({', '.join('?' for _ in invite_codes) or 'NULL'})")
+            params.extend(invite_codes)
+        if sponsor_ids is not None:
+            where.append(f"sponsor_id IN ({', '.join('?' for _ in sponsor_ids) or 'NULL'})")
+            params.extend(sponsor_ids)
+        if group_by is not None:
+            where.append(f"{group_by} IS NOT NULL")
+            columns.insert(0, group_by)
+
+        sql = (
+            f"SELECT {', '.join(columns)} "
+            f"FROM read_parquet([{', '.join(_sql_string(f) for f in files)}]) "
+            f"WHERE {' AND '.join(where)}"
+        )
+        if group_by is not None:
+            sql += f" GROUP BY {group_by}"
+
+        conn = duckdb.connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        results = {}
+        for row in rows:
+            key = row[0] if group_by is not None else None
+            values = row[1:] if group_by is not None else row
+            results[key] = {
+                name: int(value or 0) for (name, _, _), value in zip(metrics, values)
+            }
+        return results
+
+
+# 全局单例
+cold_stats_service = ColdStatsService()
@@ -0,0 +1,242 @@
+"""
+统计事件分区维护服务 (仅 PostgreSQL)
+
+statistics 按 created_at 按月范围分区 (分区名 statistics_yYYYYmMM)：
+- 预建当前及未来若干个月的分区，避免写入时没有可用分区
+- 超过保留期且已被日汇总覆盖的分区：分离 -> 导出为 csv.gz 归档 -> 删除 -> 转换为冷数据
+- 热查询都带 created_at 条件，由分区裁剪只访问近期分区
+"""
+import asyncio
+import gzip
+import logging
+import re
+from datetime import datetime, date
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+from app.database import engine
+from app.services.stats_rollup import ROLLUP_NAME
+from app.services.stats_cold import cold_stats_service, ARCHIVE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "statistics"
+PARTITION_PATTERN = re.compile(r"^statistics_y(\d{4})m(\d{2})$")
+
+# 分区维护间隔 (秒)
+MAINTENANCE_INTERVAL = 3600
+
+
+def month_start(value: date) -> date:
+    """当月 1 日"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """加减月份 (结果为当月 1 日)"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """分区表名"""
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+class StatsPartitionService:
+    """统计事件分区维护服务"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def _is_partitioned(self, conn: AsyncConnection) -> bool:
+        """statistics 是否为分区表 (非 PostgreSQL 或尚未迁移时返回 False)"""
+        if conn.dialect.name != "postgresql":
+            return False
+        result = await conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+        ), {"name": PARENT_TABLE})
+        return result.scalar() is not None
+
+    async def ensure_partitions(
+        self,
+        months_ahead: Optional[int] = None,
+        since: Optional[date] = None,
+    ) -> list[str]:
+        """创建当前月及未来 months_ahead 个月的分区
+
+        Args:
+            since: 同时补建从该日期所在月份开始的历史分区 (导入历史数据时使用)
+
+        Returns:
+            新建的分区名
+        """
+        if months_ahead is None:
+            months_ahead = settings.STATS_PARTITION_PREMAKE_MONTHS
+
+        created = []
+        async with engine.begin() as conn:
+            if not await self._is_partitioned(conn):
+                return created
+
+            current = month_start(datetime.utcnow().date())
+            first = min(month_start(since), current) if since else current
+            months = (current.year - first.year) * 12 + current.month - first.month
+            for offset in range(months + months_ahead + 1):
+                month = add_months(first, offset)
+                name = partition_name(month)
+                exists = await conn.execute(
+                    text("SELECT to_regclass(:name)"), {"name": name}
+                )
+                if exists.scalar() is not None:
+                    continue
+
+                await conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+                created.append(name)
+
+        if created:
+            logger.info(f"已创建统计分区: {', '.join(created)}")
+        return created
+
+    async def list_partitions(self, conn: AsyncConnection) -> dict[str, tuple[date, bool]]:
+        """列出全部按月分区表 (包括已分离但尚未归档的)
+
+        Returns:
+            {分区名: (月份, 是否仍挂在 statistics 下)}
+        """
+        result = await conn.execute(text(
+            "SELECT c.relname, i.inhparent IS NOT NULL AS attached "
+            "FROM pg_class c "
+            "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+            "WHERE c.relkind = 'r' AND c.relname LIKE 'statistics\\_y%' "
+            "AND pg_table_is_visible(c.oid)"
+        ))
+        partitions = {}
+        for name, attached in result.all():
+            match = PARTITION_PATTERN.match(name)
+            if match:
+                partitions[name] = (date(int(match.group(1)), int(match.group(2)), 1), attached)
+        return partitions
+
+    async def apply_retention(self, retention_months: Optional[int] = None) -> list[str]:
+        """归档并删除超过保留期的分区
+
+        只处理已被日汇总完全覆盖的月份，保证汇总数据不受影响。
+
+        Returns:
+            已归档的分区名
+        """
+        if retention_months is None:
+            retention_months = settings.STATS_RETENTION_MONTHS
+        if retention_months <= 0:
+            return []
+
+        cutoff = add_months(month_start(datetime.utcnow().date()), -retention_months)
+
+        async with engine.connect() as conn:
+            if not await self._is_partitioned(conn):
+                return []
+
+            covered = await conn.execute(
+                text("SELECT covered_until FROM rollup_states WHERE name = :name"),
+                {"name": ROLLUP_NAME},
+            )
+            covered_until = covered.scalar()
+            partitions = await self.list_partitions(conn)
+
+        archived = []
+        for name, (month, attached) in sorted(partitions.items()):
+            month_end = add_months(month, 1)
+            if month_end > cutoff:
+                continue
+            if covered_until is None or covered_until.date() < month_end:
+                logger.warning(f"分区 {name} 尚未完成日汇总，暂不归档")
+                continue
+
+            try:
+                await self._archive_partition(name, attached)
+                archived.append(name)
+            except Exception as e:
+                logger.error(f"归档统计分区 {name} 失败: {e}", exc_info=True)
+
+        return archived
+
+    async def _archive_partition(self, name: str, attached: bool) -> None:
+        """分离 -> 导出 -> 删除
+
+        分离后热查询立即不再访问该分区；导出失败时保留已分离的表，下次重试。
+        """
+        if attached:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            logger.info(f"已分离统计分区: {name}")
+
+        archive_dir = Path(settings.STATS_ARCHIVE_DIR)
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = archive_dir / f"{name}.csv.gz"
+        temp_path = archive_dir / f"{name}.csv.gz.tmp"
+
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            with gzip.open(temp_path, "wb") as output:
+                async def write(chunk: bytes) -> None:
+                    output.write(chunk)
+
+                # asyncpg COPY 流式导出，不在内存中缓存整个分区；列固定为归档格式
+                await raw.driver_connection.copy_from_table(
+                    name, columns=list(ARCHIVE_COLUMNS), output=write, format="csv", header=True
+                )
+        temp_path.replace(archive_path)
+
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"已归档统计分区: {name} -> {archive_path}")
+
+        # 转换为冷数据 Parquet (失败时由下次维护重试)
+        try:
+            await asyncio.to_thread(cold_stats_service.export_archive, archive_path)
+        except Exception as e:
+            logger.error(f"导出冷数据 {archive_path.name} 失败: {e}", exc_info=True)
+
+    async def run_maintenance(self) -> None:
+        """预建分区、执行保留策略并导出冷数据"""
+        await self.ensure_partitions()
+        await self.apply_retention()
+        await asyncio.to_thread(cold_stats_service.export_pending)
+
+    async def run_forever(self, interval: int = MAINTENANCE_INTERVAL) -> None:
+        """定期执行分区维护"""
+        while True:
+            try:
+                await self.run_maintenance()
+            except Exception as e:
+                logger.error(f"统计分区维护失败: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        """启动后台分区维护任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """停止后台分区维护任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局单例
+stats_partition_service = StatsPartitionService()
@@ -0,0 +1,402 @@
+"""
+统计查询服务
+
+统计群命令 (/query /total) 与统计 API 共用。
+所有邀请链接 / 广告的指标通过每张表一次 GROUP BY 查询计算，
+使用 COUNT(*) FILTER (WHERE ...) 在同一次扫描中得到多个时间窗口的结果。
+
+事件指标以汇总表覆盖的时间 (covered_until) 为界：
+之前的完整日期读 statistics_daily，其余部分 (通常只有今天) 读原始事件表。
+已归档的月份读冷数据 (Parquet)，全时段指标不会扫描 PostgreSQL 中的历史数据。
+
+users 与原始事件表按 invite_link_id / event_code 过滤和分组，
+汇总表与冷数据仍以邀请码 / 事件类型为键，结果统一以邀请码返回。
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Iterable
+
+from sqlalchemy import Select, select, func, and_, or_, true, case, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User, InviteLink, Statistics, StatisticsDaily
+from app.models.statistics import EVENT_CODES, EVENT_TYPES
+from app.services.stats_rollup import get_rollup_boundary, day_start
+from app.services.stats_cold import cold_stats_service
+from app.utils.hll import HyperLogLog
+
+
+# 邀请链接用户指标: (指标名, 时间窗口天数，None 表示全部)
+LINK_USER_METRICS = [
+    ("users_7d", 7),
+    ("users_30d", 30),
+    ("users_total", None),
+]
+
+# 邀请链接事件指标: (指标名, 事件类型, 时间窗口天数)
+LINK_EVENT_METRICS = [
+    ("views_7d", "page_view", 7),
+    ("views_30d", "page_view", 30),
+    ("ad_views_7d", "ad_view", 7),
+    ("ad_clicks_7d", "ad_click", 7),
+]
+
+# 广告事件指标: (指标名, 事件类型)
+SPONSOR_EVENT_METRICS = [
+    ("views_total", "ad_view"),
+    ("clicks_total", "ad_click"),
+]
+
+# 漏斗步骤: (事件类型, 页码)，非翻页事件页码为 0
+FUNNEL_STEPS = [("user_start", 0)] + [("page_view", page) for page in range(1, 6)] + [("preview_end", 0)]
+
+
+def empty_link_metrics() -> dict:
+    """没有任何数据的邀请链接指标"""
+    names = [name for name, _ in LINK_USER_METRICS] + [name for name, _, _ in LINK_EVENT_METRICS]
+    return {name: 0 for name in names}
+
+
+def empty_sponsor_metrics() -> dict:
+    """没有任何数据的广告指标"""
+    return {name: 0 for name, _ in SPONSOR_EVENT_METRICS}
+
+
+def calc_ctr(clicks: int, views: int) -> float:
+    """点击率 (百分比)"""
+    return (clicks / views * 100) if views > 0 else 0
+
+
+def ceil_day(value: datetime) -> datetime:
+    """不早于 value 的最近一个 0 点"""
+    start = day_start(value)
+    return start if start == value else start + timedelta(days=1)
+
+
+def link_ids(codes: Iterable[str]) -> Select:
+    """邀请码对应的链接 ID (子查询)"""
+    return select(InviteLink.id).where(InviteLink.code.in_(list(codes)))
+
+
+def with_link_codes(query: Select, key: str = "invite_code") -> Select:
+    """将按 link_id 分组的聚合结果转换为以邀请码为键 (先聚合再关联链接表)"""
+    subquery = query.subquery()
+    return (
+        select(
+            InviteLink.code.label(key),
+            *[column for column in subquery.c if column.name != "link_id"],
+        )
+        .join(subquery, subquery.c.link_id == InviteLink.id)
+    )
+
+
+_GROUP_COLUMNS = {
+    "invite_code": (Statistics.invite_link_id, StatisticsDaily.invite_code, ""),
+    "sponsor_id": (Statistics.sponsor_id, StatisticsDaily.sponsor_id, 0),
+}
+
+
+class StatsQueryService:
+    """统计查询服务"""
+
+    async def get_link_metrics(
+        self,
+        db: AsyncSession,
+        invite_codes: Optional[Iterable[str]] = None,
+        now: Optional[datetime] = None,
+    ) -> dict[str, dict]:
+        """获取邀请链接统计指标
+
+        Args:
+            invite_codes: 限定的邀请码，None 表示全部
+            now: 计算时间窗口的基准时间
+
+        Returns:
+            {invite_code: {指标名: 数值}}，没有数据的邀请码不在结果中
+        """
+        now = now or datetime.utcnow()
+        codes = list(invite_codes) if invite_codes is not None else None
+        if codes is not None and not codes:
+            return {}
+
+        metrics: dict[str, dict] = {}
+
+        # 用户指标: users 表一次分组查询
+        user_columns = []
+        for name, days in LINK_USER_METRICS:
+            if days is None:
+                user_columns.append(func.count().label(name))
+            else:
+                user_columns.append(
+                    func.count().filter(User.first_seen >= now - timedelta(days=days)).label(name)
+                )
+
+        user_query = (
+            select(User.invite_link_id.label("link_id"), *user_columns)
+            .where(User.invite_link_id.isnot(None))
+            .group_by(User.invite_link_id)
+        )
+        if codes is not None:
+            user_query = user_query.where(User.invite_link_id.in_(link_ids(codes)))
+        user_query = with_link_codes(user_query)
+
+        for row in (await db.execute(user_query)).mappings():
+            item = metrics.setdefault(row["invite_code"], empty_link_metrics())
+            for name, _ in LINK_USER_METRICS:
+                item[name] = row[name] or 0
+
+        # 事件指标: 汇总表 + 原始事件表各一次分组查询
+        event_metrics = [
+            (name, event_type, now - timedelta(days=days))
+            for name, event_type, days in LINK_EVENT_METRICS
+        ]
+        event_counts = await self.count_events(
+            db, event_metrics, group_by="invite_code", invite_codes=codes
+        )
+        for code, counts in event_counts.items():
+            metrics.setdefault(code, empty_link_metrics()).update(counts)
+
+        return metrics
+
+    async def get_sponsor_metrics(
+        self,
+        db: AsyncSession,
+        sponsor_ids: Optional[Iterable[int]] = None,
+    ) -> dict[int, dict]:
+        """获取广告统计指标 (全部时间)
+
+        Returns:
+            {sponsor_id: {指标名: 数值}}，没有数据的广告不在结果中
+        """
+        ids = list(sponsor_ids) if sponsor_ids is not None else None
+        if ids is not None and not ids:
+            return {}
+
+        event_metrics = [
+            (name, event_type, None) for name, event_type in SPONSOR_EVENT_METRICS
+        ]
+        metrics = await self.count_events(
+            db, event_metrics, group_by="sponsor_id", sponsor_ids=ids
+        )
+
+        return metrics
+
+    async def count_events(
+        self,
+        db: AsyncSession,
+        metrics: list[tuple[str, str, Optional[datetime]]],
+        group_by: Optional[str] = None,
+        invite_codes: Optional[list[str]] = None,
+        sponsor_ids: Optional[list[int]] = None,
+    ) -> dict:
+        """统计事件数
+
+        Args:
+            metrics: [(指标名, 事件类型, 起始时间)]，起始时间为 None 表示全部时间
+            group_by: 分组字段 invite_code / sponsor_id，None 表示不分组
+            invite_codes: 限定的邀请码
+            sponsor_ids: 限定的广告
+
+        Returns:
+            分组时 {分组值: {指标名: 数值}}，不分组时 {None: {指标名: 数值}}
+        """
+        # 0. 冷数据: 已归档的月份读 Parquet，热数据只统计冷数据之后的部分
+        cold_counts: dict = {}
+        horizon = cold_stats_service.horizon()
+        if horizon is not None:
+            cold_metrics = [m for m in metrics if m[2] is None or m[2] < horizon]
+            if cold_metrics:
+                cold_counts = await cold_stats_service.count_events(
+                    cold_metrics, group_by, invite_codes, sponsor_ids
+                )
+            metrics = [
+                (name, event_type, max(since, horizon) if since is not None else horizon)
+                for name, event_type, since in metrics
+            ]
+
+        boundary = await get_rollup_boundary(db)
+        event_types = sorted({event_type for _, event_type, _ in metrics})
+        results: dict = {}
+
+        def add_rows(rows, key_name):
+            for row in rows.mappings():
+                key = row[key_name] if key_name else None
+                item = results.setdefault(key, {name: 0 for name, _, _ in metrics})
+                for name, _, _ in metrics:
+                    item[name] += int(row[name] or 0)
+
+        raw_key, rollup_key, empty_key = _GROUP_COLUMNS.get(group_by, (None, None, None))
+
+        # 1. 汇总表: 已结束且已汇总的完整日期
+        if boundary is not None:
+            boundary_date = boundary.date()
+            columns = []
+            start_dates = []
+            for name, event_type, since in metrics:
+                conditions = [StatisticsDaily.event_type == event_type]
+                if since is not None:
+                    start_date = ceil_day(since).date()
+                    conditions.append(StatisticsDaily.date >= start_date)
+                    start_dates.append(start_date)
+                else:
+                    start_dates.append(None)
+                columns.append(
+                    func.sum(StatisticsDaily.event_count).filter(and_(*conditions)).label(name)
+                )
+
+            query = select(*columns).where(
+                StatisticsDaily.date < boundary_date,
+                StatisticsDaily.event_type.in_(event_types),
+            )
+            if None not in start_dates:
+                query = query.where(StatisticsDaily.date >= min(start_dates))
+            if rollup_key is not None:
+                query = (
+                    query.add_columns(rollup_key.label(group_by))
+                    .where(rollup_key != empty_key)
+                    .group_by(rollup_key)
+                )
+            if invite_codes is not None:
+                query = query.where(StatisticsDaily.invite_code.in_(invite_codes))
+            if sponsor_ids is not None:
+                query = query.where(StatisticsDaily.sponsor_id.in_(sponsor_ids))
+
+            add_rows(await db.execute(query), group_by)
+
+        # 2. 原始事件表: 窗口起点所在的不完整日期 + 汇总尚未覆盖的部分
+        columns = []
+        raw_conditions = []
+        for name, event_type, since in metrics:
+            if since is None:
+                time_condition = Statistics.created_at >= boundary if boundary is not None else true()
+            elif boundary is None:
+                time_condition = Statistics.created_at >= since
+            else:
+                time_condition = and_(
+                    Statistics.created_at >= since,
+                    or_(
+                        Statistics.created_at < ceil_day(since),
+                        Statistics.created_at >= boundary,
+                    ),
+                )
+            raw_conditions.append(time_condition)
+            columns.append(
+                func.count().filter(
+                    and_(Statistics.event_code == EVENT_CODES[event_type], time_condition)
+                ).label(name)
+            )
+
+        query = select(*columns).where(
+            Statistics.event_code.in_([EVENT_CODES[event_type] for event_type in event_types]),
+            or_(*raw_conditions),
+        )
+        if raw_key is not None:
+            query = (
+                query.add_columns(raw_key.label("link_id" if group_by == "invite_code" else group_by))
+                .where(raw_key.isnot(None))
+                .group_by(raw_key)
+            )
+        if invite_codes is not None:
+            query = query.where(Statistics.invite_link_id.in_(link_ids(invite_codes)))
+        if sponsor_ids is not None:
+            query = query.where(Statistics.sponsor_id.in_(sponsor_ids))
+        if group_by == "invite_code":
+            query = with_link_codes(query)
+
+        add_rows(await db.execute(query), group_by)
+
+        for key, counts in cold_counts.items():
+            item = results.setdefault(key, {name: 0 for name, _, _ in metrics})
+            for name, value in counts.items():
+                item[name] += value
+
+        return results
+
+    async def get_funnel(
+        self,
+        db: AsyncSession,
+        since: datetime,
+        invite_code: Optional[str] = None,
+        approximate: bool = False,
+    ) -> tuple[dict[tuple[str, int], int], bool]:
+        """获取漏斗各步骤的去重用户数
+
+        精确模式: 原始事件表一次 COUNT(DISTINCT) 分组查询。
+        近似模式: 合并汇总表中每天每步骤的 HyperLogLog 草图，
+        汇总尚未覆盖的部分从原始事件表补充。
+
+        Returns:
+            ({(事件类型, 页码): 用户数}, 是否为近似值)
+        """
+        event_types = sorted({event_type for event_type, _ in FUNNEL_STEPS})
+        pages = [page for event_type, page in FUNNEL_STEPS if event_type == "page_view"]
+        page_view = EVENT_CODES["page_view"]
+        # 字面量保证 SELECT 与 GROUP BY 中的表达式一致
+        step_page = case(
+            (Statistics.event_code == literal_column(str(page_view)), Statistics.page_number),
+            else_=literal_column("0"),
+        )
+        conditions = [
+            Statistics.event_code.in_([EVENT_CODES[event_type] for event_type in event_types]),
+            or_(Statistics.event_code != page_view, Statistics.page_number.in_(pages)),
+            Statistics.user_id.isnot(None),
+        ]
+        if invite_code:
+            conditions.append(Statistics.invite_link_id.in_(link_ids([invite_code])))
+
+        boundary = await get_rollup_boundary(db) if approximate else None
+        if boundary is None or boundary <= ceil_day(since):
+            # 精确模式
+            result = await db.execute(
+                select(
+                    Statistics.event_code,
+                    step_page.label("page"),
+                    func.count(func.distinct(Statistics.user_id)).label("users"),
+                )
+                .where(Statistics.created_at >= since, *conditions)
+                .group_by(Statistics.event_code, step_page)
+            )
+            return {
+                (EVENT_TYPES[row.event_code], row.page): row.users for row in result.all()
+            }, False
+
+        # 近似模式: 1. 汇总表草图
+        sketches = {step: HyperLogLog() for step in FUNNEL_STEPS}
+        rollup_query = select(
+            StatisticsDaily.event_type,
+            StatisticsDaily.page_number,
+            StatisticsDaily.user_sketch,
+        ).where(
+            StatisticsDaily.date >= ceil_day(since).date(),
+            StatisticsDaily.date < boundary.date(),
+            StatisticsDaily.event_type.in_(event_types),
+        )
+        if invite_code:
+            rollup_query = rollup_query.where(StatisticsDaily.invite_code == invite_code)
+
+        for row in (await db.execute(rollup_query)).all():
+            page = row.page_number if row.event_type == "page_view" else 0
+            sketch = sketches.get((row.event_type, page))
+            if sketch is not None:
+                sketch.merge_bytes(row.user_sketch)
+
+        # 2. 原始事件表: 窗口起点所在日 + 汇总之后的部分
+        raw_result = await db.execute(
+            select(Statistics.event_code, step_page.label("page"), Statistics.user_id)
+            .where(
+                Statistics.created_at >= since,
+                or_(
+                    Statistics.created_at < ceil_day(since),
+                    Statistics.created_at >= boundary,
+                ),
+                *conditions,
+            )
+            .distinct()
+        )
+        for row in raw_result.all():
+            sketches[(EVENT_TYPES[row.event_code], row.page)].add(row.user_id)
+
+        return {step: sketch.count() for step, sketch in sketches.items()}, True
+
+
+# 全局单例
+stats_query_service = StatsQueryService()
@@ -0,0 +1,207 @@
+"""
+统计日汇总服务
+
+按日期窗口增量汇总 statistics 到 statistics_daily：
+- 从 covered_until 起每次汇总一天 [covered_until, covered_until + 1 天)
+- 只汇总已结束且已过 COMMIT_LAG 的日期，此时该日期的事件均已提交，
+  ID 较小但提交较晚的事件也在窗口内，不会因 ID 游标越过而漏计
+- 窗口内按事件 ID 分批，每批与窗口内游标 (last_event_id) 在同一事务内提交，
+  重复执行不会重复计数；窗口完成后推进 covered_until 并重置游标
+- 读取方以 covered_until 为界：之前读汇总表，之后读原始事件表
+"""
+import asyncio
+import logging
+from datetime import datetime, date, timedelta
+from typing import Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Statistics, StatisticsDaily, RollupState
+from app.utils.hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = "statistics_daily"
+
+# 日期结束后等待处理中的事务提交的时间 (事件随产生时的短事务提交)
+COMMIT_LAG = timedelta(minutes=5)
+
+
+def day_start(value: datetime) -> datetime:
+    """当天 0 点"""
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_cutoff() -> datetime:
+    """可汇总的时间上界 (不含)：已结束且已过 COMMIT_LAG 的日期"""
+    return day_start(datetime.utcnow() - COMMIT_LAG)
+
+
+async def get_rollup_boundary(db: AsyncSession) -> Optional[datetime]:
+    """获取汇总表覆盖的时间上界 (不含)，尚未汇总时返回 None"""
+    result = await db.execute(
+        select(RollupState.covered_until).where(RollupState.name == ROLLUP_NAME)
+    )
+    return result.scalar_one_or_none()
+
+
+class StatsRollupService:
+    """统计日汇总服务"""
+
+    def __init__(self, batch_size: int = 50_000):
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _lock_state(self, session: AsyncSession) -> RollupState:
+        """获取并锁定汇总进度 (多进程同时运行时串行执行)
+
+        首次运行时多个进程可能同时创建进度行，先 INSERT ... ON CONFLICT DO NOTHING 再加锁读取。
+        """
+        await session.execute(
+            insert(RollupState)
+            .values(name=ROLLUP_NAME, last_event_id=0)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        result = await session.execute(
+            select(RollupState)
+            .where(RollupState.name == ROLLUP_NAME)
+            .with_for_update()
+        )
+        return result.scalar_one()
+
+    async def run_once(self) -> int:
+        """执行一次增量汇总
+
+        Returns:
+            本次处理的事件数
+        """
+        processed = 0
+
+        while True:
+            async with AsyncSessionLocal() as session:
+                state = await self._lock_state(session)
+                cutoff = rollup_cutoff()
+
+                if state.covered_until is None:
+                    # 首次运行: 从最早事件所在的日期开始
+                    first = await session.scalar(
+                        select(func.min(Statistics.created_at)).where(Statistics.created_at < cutoff)
+                    )
+                    state.covered_until = day_start(first) if first else cutoff
+                    state.last_event_id = 0
+
+                window_end = state.covered_until + timedelta(days=1)
+                if window_end > cutoff:
+                    await session.commit()
+                    break
+
+                result = await session.execute(
+                    select(
+                        Statistics.id,
+                        Statistics.created_at,
+                        Statistics.invite_code,
+                        Statistics.sponsor_id,
+                        Statistics.event_type,
+                        Statistics.page_number,
+                        Statistics.user_id,
+                    )
+                    .where(
+                        Statistics.id > state.last_event_id,
+                        Statistics.created_at >= state.covered_until,
+                        Statistics.created_at < window_end,
+                    )
+                    .order_by(Statistics.id)
+                    .limit(self.batch_size)
+                )
+                rows = result.all()
+
+                if not rows:
+                    state.covered_until = window_end
+                    state.last_event_id = 0
+                    await session.commit()
+                    continue
+
+                await self._merge_batch(session, rows)
+                state.last_event_id = rows[-1].id
+                await session.commit()
+
+                processed += len(rows)
+
+        if processed:
+            logger.info(f"统计日汇总完成: 处理事件 {processed} 条")
+        return processed
+
+    async def _merge_batch(self, session: AsyncSession, rows) -> None:
+        """将一批事件合并到汇总表"""
+        batch: dict[tuple, tuple[int, HyperLogLog]] = {}
+        for row in rows:
+            key = (
+                row.created_at.date(),
+                row.invite_code or "",
+                row.sponsor_id or 0,
+                row.event_type,
+                row.page_number or 0,
+            )
+            count, sketch = batch.get(key) or (0, HyperLogLog())
+            if row.user_id is not None:
+                sketch.add(row.user_id)
+            batch[key] = (count + 1, sketch)
+
+        # 读取这些日期已有的汇总行
+        dates: set[date] = {key[0] for key in batch}
+        existing_result = await session.execute(
+            select(StatisticsDaily).where(StatisticsDaily.date.in_(dates))
+        )
+        existing = {
+            (r.date, r.invite_code, r.sponsor_id, r.event_type, r.page_number): r
+            for r in existing_result.scalars()
+        }
+
+        for key, (count, sketch) in batch.items():
+            daily = existing.get(key)
+            if daily is None:
+                session.add(StatisticsDaily(
+                    date=key[0],
+                    invite_code=key[1],
+                    sponsor_id=key[2],
+                    event_type=key[3],
+                    page_number=key[4],
+                    event_count=count,
+                    user_sketch=sketch.to_bytes(),
+                ))
+            else:
+                sketch.merge_bytes(daily.user_sketch)
+                daily.event_count = (daily.event_count or 0) + count
+                daily.user_sketch = sketch.to_bytes()
+
+    async def run_forever(self, interval: int) -> None:
+        """定期执行增量汇总"""
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"统计日汇总失败: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        """启动后台汇总任务"""
+        if self._task is None and settings.STATS_ROLLUP_INTERVAL > 0:
+            self._task = asyncio.create_task(self.run_forever(settings.STATS_ROLLUP_INTERVAL))
+
+    async def stop(self) -> None:
+        """停止后台汇总任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 全局单例
+stats_rollup_service = StatsRollupService()
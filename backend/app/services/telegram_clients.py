@@ -0,0 +1,72 @@
+"""
+Telegram Bot 客户端注册表
+
+按 Token 复用长生命周期的 Bot 实例，所有 Bot 共享同一个 aiohttp 连接池
+(keep-alive、DNS 缓存)，避免每次创建 Bot 都重新建立 TLS 连接。
+"""
+import logging
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.enums import ParseMode
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramClientRegistry:
+    """Bot 实例注册表"""
+
+    def __init__(self):
+        self._bots: dict[str, Bot] = {}
+        self._session: Optional[AiohttpSession] = None
+
+    @property
+    def session(self) -> AiohttpSession:
+        """共享的 HTTP 会话 (首次使用时创建)"""
+        if self._session is None:
+            self._session = AiohttpSession(limit=settings.TELEGRAM_POOL_SIZE)
+            # 请求都发往 api.telegram.org: 总连接数即单主机上限，空闲连接保活复用。
+            # aiogram 没有公开的连接器参数，_connector_init 为私有属性，已在 aiogram 3.31 上验证
+            # (requirements.txt 限制了版本上限)；不存在时保持 aiogram 默认参数
+            connector_init = getattr(self._session, "_connector_init", None)
+            if isinstance(connector_init, dict):
+                connector_init.update(
+                    limit_per_host=settings.TELEGRAM_POOL_SIZE,
+                    keepalive_timeout=settings.TELEGRAM_KEEPALIVE,
+                    ttl_dns_cache=3600,
+                )
+            else:
+                logger.warning("当前 aiogram 版本不支持设置连接池参数，使用默认参数")
+        return self._session
+
+    def get(self, token: str) -> Bot:
+        """获取 Token 对应的 Bot 实例，不存在则创建"""
+        bot = self._bots.get(token)
+        if bot is None:
+            bot = Bot(
+                token=token,
+                session=self.session,
+                default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+            )
+            self._bots[token] = bot
+        return bot
+
+    def discard(self, token: str) -> None:
+        """移除 Token 对应的 Bot 实例 (共享会话保持打开)"""
+        self._bots.pop(token, None)
+
+    async def close(self) -> None:
+        """关闭共享会话"""
+        self._bots.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            logger.info("Telegram 连接池已关闭")
+
+
+# 全局单例
+telegram_clients = TelegramClientRegistry()
@@ -0,0 +1,242 @@
+"""
+统计时间序列服务
+
+按天 / 按小时分桶统计事件数与新增用户数：
+- 每张表一次 date_trunc + GROUP BY 查询，空桶在 Python 中补零
+- 支持时区偏移 (分钟) 与邀请码 / 广告过滤
+- 按天且无时区偏移时，已汇总的日期读 statistics_daily
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Iterable
+
+from sqlalchemy import select, func, literal_column, DateTime
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User, Statistics, StatisticsDaily
+from app.models.statistics import EVENT_CODES
+from app.services.stats_rollup import get_rollup_boundary
+from app.services.stats_query import link_ids
+
+# 支持的粒度及每个桶的长度
+GRANULARITIES = {
+    "day": timedelta(days=1),
+    "hour": timedelta(hours=1),
+}
+
+
+def truncate(value: datetime, granularity: str) -> datetime:
+    """截断到桶的起点"""
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_range(start: datetime, end: datetime, granularity: str) -> list[datetime]:
+    """[start, end) 内的全部桶起点"""
+    step = GRANULARITIES[granularity]
+    buckets = []
+    current = truncate(start, granularity)
+    while current < end:
+        buckets.append(current)
+        current += step
+    return buckets
+
+
+def format_bucket(bucket: datetime, granularity: str) -> str:
+    """桶的显示格式"""
+    if granularity == "hour":
+        return bucket.strftime("%Y-%m-%d %H:00")
+    return bucket.strftime("%Y-%m-%d")
+
+
+def _bucket_column(column, granularity: str, tz_offset: int):
+    """分桶表达式
+
+    粒度与偏移以字面量写入 SQL，保证 SELECT 与 GROUP BY 中的表达式完全一致。
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"不支持的粒度: {granularity}")
+    if tz_offset:
+        column = column + literal_column(f"interval '{int(tz_offset)} minutes'")
+    return func.date_trunc(literal_column(f"'{granularity}'"), column, type_=DateTime)
+
+
+def _to_datetime(value) -> datetime:
+    """汇总表的 date 与 date_trunc 结果统一为 datetime"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime(value.year, value.month, value.day)
+
+
+class TimeSeriesService:
+    """统计时间序列服务
+
+    start / end 均为本地时间 (UTC + tz_offset 分钟) 的桶边界，返回的桶也是本地时间。
+    """
+
+    async def event_series(
+        self,
+        db: AsyncSession,
+        metrics: list[tuple[str, str]],
+        start: datetime,
+        end: datetime,
+        granularity: str = "day",
+        tz_offset: int = 0,
+        invite_codes: Optional[Iterable[str]] = None,
+        sponsor_ids: Optional[Iterable[int]] = None,
+    ) -> dict[datetime, dict[str, int]]:
+        """按桶统计事件数
+
+        Args:
+            metrics: [(指标名, 事件类型)]
+
+        Returns:
+            {桶起点: {指标名: 数值}}，没有数据的桶不在结果中
+        """
+        codes = list(invite_codes) if invite_codes is not None else None
+        ids = list(sponsor_ids) if sponsor_ids is not None else None
+        event_types = sorted({event_type for _, event_type in metrics})
+        results: dict[datetime, dict[str, int]] = {}
+
+        def add_rows(rows):
+            for row in rows.mappings():
+                item = results.setdefault(
+                    _to_datetime(row["bucket"]), {name: 0 for name, _ in metrics}
+                )
+                for name, _ in metrics:
+                    item[name] += int(row[name] or 0)
+
+        raw_start = start
+
+        # 1. 汇总表: 按天且无偏移时，已汇总的完整日期
+        if granularity == "day" and not tz_offset:
+            boundary = await get_rollup_boundary(db)
+            if boundary is not None and boundary > start:
+                rollup_end = min(boundary, end)
+                query = (
+                    select(
+                        StatisticsDaily.date.label("bucket"),
+                        *[
+                            func.sum(StatisticsDaily.event_count)
+                            .filter(StatisticsDaily.event_type == event_type)
+                            .label(name)
+                            for name, event_type in metrics
+                        ],
+                    )
+                    .where(
+                        StatisticsDaily.date >= start.date(),
+                        StatisticsDaily.date < rollup_end.date(),
+                        StatisticsDaily.event_type.in_(event_types),
+                    )
+                    .group_by(StatisticsDaily.date)
+                )
+                if codes is not None:
+                    query = query.where(StatisticsDaily.invite_code.in_(codes))
+                if ids is not None:
+                    query = query.where(StatisticsDaily.sponsor_id.in_(ids))
+
+                add_rows(await db.execute(query))
+                raw_start = rollup_end
+
+        if raw_start >= end:
+            return results
+
+        # 2. 原始事件表: 一次分组查询
+        offset = timedelta(minutes=tz_offset)
+        bucket = _bucket_column(Statistics.created_at, granularity, tz_offset)
+        query = (
+            select(
+                bucket.label("bucket"),
+                *[
+                    func.count().filter(Statistics.event_code == EVENT_CODES[event_type]).label(name)
+                    for name, event_type in metrics
+                ],
+            )
+            .where(
+                Statistics.event_code.in_([EVENT_CODES[event_type] for event_type in event_types]),
+                Statistics.created_at >= raw_start - offset,
+                Statistics.created_at < end - offset,
+            )
+            .group_by(bucket)
+        )
+        if codes is not None:
+            query = query.where(Statistics.invite_link_id.in_(link_ids(codes)))
+        if ids is not None:
+            query = query.where(Statistics.sponsor_id.in_(ids))
+
+        add_rows(await db.execute(query))
+        return results
+
+    async def user_series(
+        self,
+        db: AsyncSession,
+        name: str,
+        start: datetime,
+        end: datetime,
+        granularity: str = "day",
+        tz_offset: int = 0,
+        invite_codes: Optional[Iterable[str]] = None,
+    ) -> dict[datetime, dict[str, int]]:
+        """按桶统计新增用户数 (按首次访问时间)
+
+        Returns:
+            {桶起点: {name: 数值}}
+        """
+        offset = timedelta(minutes=tz_offset)
+        bucket = _bucket_column(User.first_seen, granularity, tz_offset)
+        query = (
+            select(bucket.label("bucket"), func.count().label(name))
+            .where(
+                User.first_seen >= start - offset,
+                User.first_seen < end - offset,
+            )
+            .group_by(bucket)
+        )
+        if invite_codes is not None:
+            query = query.where(User.invite_link_id.in_(link_ids(invite_codes)))
+
+        result = await db.execute(query)
+        return {
+            _to_datetime(row["bucket"]): {name: int(row[name] or 0)}
+            for row in result.mappings()
+        }
+
+    def fill(
+        self,
+        series: Iterable[dict[datetime, dict[str, int]]],
+        names: list[str],
+        start: datetime,
+        end: datetime,
+        granularity: str = "day",
+    ) -> list[tuple[datetime, dict[str, int]]]:
+        """合并多个序列并补齐空桶
+
+        Returns:
+            按时间升序的 [(桶起点, {指标名: 数值})]
+        """
+        merged: dict[datetime, dict[str, int]] = {}
+        for counts in series:
+            for bucket, values in counts.items():
+                merged.setdefault(bucket, {}).update(values)
+
+        return [
+            (bucket, {name: merged.get(bucket, {}).get(name, 0) for name in names})
+            for bucket in bucket_range(start, end, granularity)
+        ]
+
+    def local_range(
+        self,
+        periods: int,
+        granularity: str = "day",
+        tz_offset: int = 0,
+        now: Optional[datetime] = None,
+    ) -> tuple[datetime, datetime]:
+        """最近 periods 个桶 (含当前桶) 的本地时间范围"""
+        now = (now or datetime.utcnow()) + timedelta(minutes=tz_offset)
+        step = GRANULARITIES[granularity]
+        end = truncate(now, granularity) + step
+        return end - step * periods, end
+
+
+# 全局单例
+timeseries_service = TimeSeriesService()
@@ -10,6 +10,7 @@ from aiogram import Bot
 from aiogram.types import FSInputFile
 
 from app.config import settings
+from app.services.telegram_clients import telegram_clients
 
 
 class FileUploadService:
@@ -32,7 +33,7 @@ class FileUploadService:
         file_path: str, 
         file_type: str,
         caption: Optional[str] = None
-    ) -> str:
+    ) -> tuple[str, str]:
         """
         上传文件到 Telegram 私有频道获取 file_id
         
@@ -42,7 +43,7 @@ class FileUploadService:
             caption: 可选的文件说明
         
         Returns:
-            Telegram file_id
+            (Telegram file_id, file_unique_id)
         """
         input_file = FSInputFile(file_path)
         
@@ -52,25 +53,26 @@ class FileUploadService:
                 photo=input_file,
                 caption=caption,
             )
-            file_id = message.photo[-1].file_id  # 获取最高分辨率的图片
+            photo = message.photo[-1]  # 获取最高分辨率的图片
+            file_id, file_unique_id = photo.file_id, photo.file_unique_id
         else:
             message = await self.bot.send_video(
                 chat_id=settings.STORAGE_CHANNEL_ID,
                 video=input_file,
                 caption=caption,
             )
-            file_id = message.video.file_id
+            file_id, file_unique_id = message.video.file_id, message.video.file_unique_id
         
-        return file_id
+        return file_id, file_unique_id
     
-    async def upload_and_get_file_id(
+    async def upload_and_get_file_info(
         self,
         file_content: bytes,
         filename: str,
         file_type: str,
         caption: Optional[str] = None,
         delete_after: bool = True,
-    ) -> str:
+    ) -> tuple[str, str]:
         """
         保存文件并上传到 Telegram
         
@@ -82,20 +84,33 @@ class FileUploadService:
             delete_after: 上传后是否删除本地文件
         
         Returns:
-            Telegram file_id
+            (Telegram file_id, file_unique_id)
         """
         # 保存临时文件
         file_path = await self.save_temp_file(file_content, filename)
         
         try:
             # 上传到 Telegram
-            file_id = await self.upload_to_telegram(file_path, file_type, caption)
-            return file_id
+            return await self.upload_to_telegram(file_path, file_type, caption)
         finally:
             # 可选删除临时文件
             if delete_after and os.path.exists(file_path):
                 os.remove(file_path)
     
+    async def upload_and_get_file_id(
+        self,
+        file_content: bytes,
+        filename: str,
+        file_type: str,
+        caption: Optional[str] = None,
+        delete_after: bool = True,
+    ) -> str:
+        """保存文件并上传到 Telegram，只返回 file_id"""
+        file_id, _ = await self.upload_and_get_file_info(
+            file_content, filename, file_type, caption, delete_after
+        )
+        return file_id
+    
     def get_file_size(self, file_content: bytes) -> int:
         """获取文件大小"""
         return len(file_content)
@@ -109,21 +124,9 @@ class FileUploadService:
             return size <= settings.MAX_VIDEO_SIZE
 
 
-# 全局 Bot 实例 (需要在启动时初始化)
-_bot_instance: Optional[Bot] = None
-
-
 def get_bot() -> Bot:
-    """获取 Bot 实例"""
-    global _bot_instance
-    if _bot_instance is None:
-        from aiogram.client.default import DefaultBotProperties
-        from aiogram.enums import ParseMode
-        _bot_instance = Bot(
-            token=settings.BOT_TOKEN,
-            default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-        )
-    return _bot_instance
+    """获取主 Bot 实例 (共享连接池)"""
+    return telegram_clients.get(settings.BOT_TOKEN)
 
 
 def get_upload_service() -> FileUploadService:
@@ -0,0 +1,117 @@
+"""
+HyperLogLog 基数估计
+
+用于统计汇总表中的去重用户数草图，可合并 (按寄存器取最大值)。
+序列化时寄存器较少则使用稀疏格式，避免小分组占用过多空间。
+"""
+import hashlib
+import math
+import struct
+from typing import Iterable, Optional
+
+# 默认精度: 2^11 = 2048 个寄存器，标准误差约 2.3%
+DEFAULT_PRECISION = 11
+
+_FORMAT_DENSE = 0
+_FORMAT_SPARSE = 1
+_SPARSE_ENTRY = struct.Struct("<HB")
+
+
+def _hash64(value: int) -> int:
+    """64 位哈希"""
+    digest = hashlib.blake2b(
+        int(value).to_bytes(8, "little", signed=True), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HyperLogLog:
+    """HyperLogLog 草图"""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[bytearray] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision 必须在 4-16 之间")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    def add(self, value: int) -> None:
+        """添加一个元素 (整数，如用户 ID)"""
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        w = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[int]) -> None:
+        """批量添加元素"""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """合并另一个草图 (精度必须相同)"""
+        if other.precision != self.precision:
+            raise ValueError("无法合并不同精度的草图")
+        registers = self.registers
+        for index, rank in enumerate(other.registers):
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge_bytes(self, data: Optional[bytes]) -> None:
+        """直接合并序列化后的草图 (稀疏格式无需展开)"""
+        if not data:
+            return
+        precision, fmt = data[0], data[1]
+        if precision != self.precision:
+            raise ValueError("无法合并不同精度的草图")
+        registers = self.registers
+        if fmt == _FORMAT_SPARSE:
+            for index, rank in _SPARSE_ENTRY.iter_unpack(data[2:]):
+                if rank > registers[index]:
+                    registers[index] = rank
+        else:
+            for index, rank in enumerate(data[2:]):
+                if rank > registers[index]:
+                    registers[index] = rank
+
+    def count(self) -> int:
+        """估计基数"""
+        m = self.m
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        elif m == 64:
+            alpha = 0.709
+        elif m == 32:
+            alpha = 0.697
+        else:
+            alpha = 0.673
+
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        # 小基数修正 (线性计数)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        """序列化: [精度][格式][数据]"""
+        nonzero = [(i, r) for i, r in enumerate(self.registers) if r]
+        if len(nonzero) * _SPARSE_ENTRY.size < self.m:
+            body = b"".join(_SPARSE_ENTRY.pack(i, r) for i, r in nonzero)
+            return bytes((self.precision, _FORMAT_SPARSE)) + body
+        return bytes((self.precision, _FORMAT_DENSE)) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes], precision: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        """反序列化 (空数据返回空草图)"""
+        if not data:
+            return cls(precision)
+        hll = cls(data[0])
+        hll.merge_bytes(data)
+        return hll
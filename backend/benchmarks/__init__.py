@@ -0,0 +1,9 @@
+"""
+统计性能基准测试
+
+使用方法 (仅用于独立的基准测试数据库):
+    cd backend
+    python -m benchmarks.generate --events 10000000 --reset
+    python -m benchmarks.run --record      # 记录基线
+    python -m benchmarks.run               # 与基线比较，超出时退出码为 1
+"""
@@ -0,0 +1,255 @@
+"""
+统计基准测试数据生成器
+
+生成邀请链接、广告、用户、会话与统计事件，使用 COPY 批量写入 PostgreSQL。
+相同参数与随机种子生成相同的数据。
+
+使用方法:
+    cd backend
+    python -m benchmarks.generate --links 200 --users 500000 --events 10000000 --days 180 --reset
+
+--reset 会清空统计与用户表，只允许在库名包含 bench / test 的数据库上执行，
+其他数据库需同时指定 --force。
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import text
+
+from app.database import engine, init_db, AsyncSessionLocal
+from app.models import InviteLink, AdGroup, Sponsor
+from app.models.statistics import EVENT_CODES
+from app.services.stats_partition import stats_partition_service
+from app.services.stats_rollup import stats_rollup_service
+
+CODE_PREFIX = "bench"
+AD_GROUP_NAME = "基准测试广告组"
+
+STATISTICS_COLUMNS = [
+    "event_type", "event_code", "user_id", "invite_code", "invite_link_id", "resource_id",
+    "sponsor_id", "page_number", "created_at",
+]
+USER_COLUMNS = ["telegram_id", "username", "first_name", "invite_code", "invite_link_id", "first_seen", "last_active"]
+SESSION_COLUMNS = ["user_id", "invite_code", "current_page", "wait_count", "current_ad_index", "last_interaction"]
+
+# 生成用户的 Telegram ID 起点，避免与真实用户冲突
+TELEGRAM_ID_BASE = 9_000_000_000
+
+# 允许 --reset 的数据库名关键字
+RESET_DATABASE_MARKERS = ("bench", "test")
+
+# --reset 清空的表 (统计、用户及由其派生的汇总表)
+RESET_TABLES = [
+    "statistics", "statistics_daily", "rollup_states", "user_active_days",
+    "cohort_sizes", "cohort_retention", "user_engagement", "user_sessions", "users",
+]
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="生成统计基准测试数据 (仅用于基准测试数据库)")
+    parser.add_argument("--links", type=int, default=200, help="邀请链接数")
+    parser.add_argument("--sponsors", type=int, default=30, help="广告数")
+    parser.add_argument("--users", type=int, default=100_000, help="用户数")
+    parser.add_argument("--events", type=int, default=1_000_000, help="统计事件数")
+    parser.add_argument("--days", type=int, default=180, help="数据覆盖的天数")
+    parser.add_argument("--link-skew", type=float, default=1.1, help="邀请链接热度的 Zipf 指数")
+    parser.add_argument("--sponsor-skew", type=float, default=0.8, help="广告展示的 Zipf 指数")
+    parser.add_argument("--recent-bias", type=float, default=1.5, help="用户首次访问时间偏向近期的程度 (1 为均匀)")
+    parser.add_argument("--pages", type=int, default=5, help="每次访问最多浏览的页数")
+    parser.add_argument("--continue-rate", type=float, default=0.7, help="浏览下一页的概率")
+    parser.add_argument("--ad-rate", type=float, default=0.6, help="每页展示广告的概率")
+    parser.add_argument("--ctr", type=float, default=0.04, help="广告点击率")
+    parser.add_argument("--batch-size", type=int, default=100_000, help="每次 COPY 的行数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--reset", action="store_true", help="写入前清空统计、用户及已有的基准测试数据")
+    parser.add_argument("--force", action="store_true", help="允许在库名不含 bench / test 的数据库上 --reset")
+    parser.add_argument("--no-rollup", action="store_true", help="写入后不执行日汇总")
+    return parser.parse_args(argv)
+
+
+class ZipfChoice:
+    """按 Zipf 分布选择下标"""
+
+    def __init__(self, count: int, skew: float, rng: random.Random):
+        self.rng = rng
+        self.cum_weights = list(accumulate(1 / (i + 1) ** skew for i in range(count)))
+
+    def __call__(self) -> int:
+        return bisect_left(self.cum_weights, self.rng.random() * self.cum_weights[-1])
+
+
+async def copy_records(table: str, columns: list[str], records: list[tuple]) -> None:
+    """COPY 批量写入"""
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(table, records=records, columns=columns)
+        await conn.commit()
+
+
+async def reset_data() -> None:
+    """清空统计、用户及已有的基准测试数据"""
+    async with engine.begin() as conn:
+        await conn.execute(text(f"TRUNCATE {', '.join(RESET_TABLES)}"))
+        await conn.execute(
+            text("DELETE FROM invite_links WHERE code LIKE :prefix"),
+            {"prefix": f"{CODE_PREFIX}%"},
+        )
+        await conn.execute(text("DELETE FROM ad_groups WHERE name = :name"), {"name": AD_GROUP_NAME})
+
+
+async def create_links_and_sponsors(args) -> tuple[list[tuple[str, int]], list[int]]:
+    """创建邀请链接与广告 (数量少，直接用 ORM)"""
+    async with AsyncSessionLocal() as session:
+        links = [
+            InviteLink(code=f"{CODE_PREFIX}{i:05d}", name=f"基准链接 {i}", is_active=True)
+            for i in range(args.links)
+        ]
+        session.add_all(links)
+
+        ad_group = AdGroup(name=AD_GROUP_NAME)
+        session.add(ad_group)
+        await session.flush()
+
+        sponsors = [
+            Sponsor(ad_group_id=ad_group.id, title=f"基准广告 {i}", media_type="none", display_order=i)
+            for i in range(args.sponsors)
+        ]
+        session.add_all(sponsors)
+        await session.commit()
+        return [(link.code, link.id) for link in links], [sponsor.id for sponsor in sponsors]
+
+
+async def generate_users(
+    args, rng: random.Random, links: list[tuple[str, int]], now: datetime
+) -> list[tuple[str, int, datetime]]:
+    """生成用户与会话
+
+    Returns:
+        [(邀请码, 链接 ID, 首次访问时间)]，下标即用户序号
+    """
+    choose_link = ZipfChoice(len(links), args.link_skew, rng)
+    users = []
+    user_batch, session_batch = [], []
+
+    for i in range(args.users):
+        code, link_id = links[choose_link()]
+        age = timedelta(days=args.days) * (rng.random() ** args.recent_bias)
+        first_seen = now - age
+        telegram_id = TELEGRAM_ID_BASE + i
+        users.append((code, link_id, first_seen))
+
+        user_batch.append((telegram_id, f"bench_{i}", f"用户{i}", code, link_id, first_seen, first_seen))
+        session_batch.append((telegram_id, code, rng.randint(0, args.pages), 0, 0, first_seen))
+
+        if len(user_batch) >= args.batch_size:
+            await copy_records("users", USER_COLUMNS, user_batch)
+            await copy_records("user_sessions", SESSION_COLUMNS, session_batch)
+            user_batch, session_batch = [], []
+
+    if user_batch:
+        await copy_records("users", USER_COLUMNS, user_batch)
+        await copy_records("user_sessions", SESSION_COLUMNS, session_batch)
+
+    return users
+
+
+async def generate_events(args, rng: random.Random, users, sponsor_ids: list[int], now: datetime) -> int:
+    """按访问生成统计事件: user_start -> 翻页 (广告展示/点击) -> 预览结束"""
+    choose_sponsor = ZipfChoice(len(sponsor_ids), args.sponsor_skew, rng) if sponsor_ids else None
+    batch: list[tuple] = []
+    written = 0
+
+    def add(event_type, user_id, code, link_id, created_at, sponsor_id=None, page_number=None):
+        batch.append((
+            event_type, EVENT_CODES[event_type], user_id, code, link_id, None,
+            sponsor_id, page_number, created_at,
+        ))
+
+    while written + len(batch) < args.events:
+        index = rng.randrange(len(users))
+        code, link_id, first_seen = users[index]
+        user_id = TELEGRAM_ID_BASE + index
+        created_at = first_seen + (now - first_seen) * rng.random()
+
+        add("user_start", user_id, code, link_id, created_at)
+        for page in range(1, args.pages + 1):
+            created_at += timedelta(seconds=rng.randint(2, 30))
+            add("page_view", user_id, code, link_id, created_at, page_number=page)
+
+            if choose_sponsor and rng.random() < args.ad_rate:
+                sponsor_id = sponsor_ids[choose_sponsor()]
+                add("ad_view", user_id, code, link_id, created_at, sponsor_id=sponsor_id)
+                if rng.random() < args.ctr:
+                    add("ad_click", user_id, code, link_id, created_at, sponsor_id=sponsor_id)
+
+            if page == args.pages:
+                add("preview_end", user_id, code, link_id, created_at)
+            elif rng.random() > args.continue_rate:
+                break
+
+        if len(batch) >= args.batch_size:
+            await copy_records("statistics", STATISTICS_COLUMNS, batch)
+            written += len(batch)
+            batch = []
+            print(f"  统计事件: {written:,}/{args.events:,}", flush=True)
+
+    if batch:
+        await copy_records("statistics", STATISTICS_COLUMNS, batch)
+        written += len(batch)
+
+    return written
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    if engine.dialect.name != "postgresql":
+        print("基准测试数据生成仅支持 PostgreSQL")
+        return 1
+
+    database = engine.url.database or ""
+    if args.reset and not args.force and not any(m in database.lower() for m in RESET_DATABASE_MARKERS):
+        print(f"拒绝清空数据库 {database!r}: 库名不含 {' / '.join(RESET_DATABASE_MARKERS)}，确认无误请加 --force")
+        return 1
+
+    rng = random.Random(args.seed)
+    # 固定到整点，相同参数在同一小时内生成完全相同的数据
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    started = time.perf_counter()
+
+    await init_db()
+    await stats_partition_service.ensure_partitions(since=(now - timedelta(days=args.days)).date())
+
+    if args.reset:
+        print("清空已有数据...")
+        await reset_data()
+
+    print(f"创建邀请链接 {args.links} 个、广告 {args.sponsors} 个...")
+    links, sponsor_ids = await create_links_and_sponsors(args)
+
+    print(f"生成用户 {args.users:,} 个...")
+    users = await generate_users(args, rng, links, now)
+
+    print(f"生成统计事件 {args.events:,} 条...")
+    written = await generate_events(args, rng, users, sponsor_ids, now)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE statistics"))
+        await conn.execute(text("ANALYZE users"))
+
+    if not args.no_rollup:
+        print("执行日汇总...")
+        await stats_rollup_service.run_once()
+
+    print(f"完成: 用户 {len(users):,}，事件 {written:,}，耗时 {time.perf_counter() - started:.1f}s")
+    await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
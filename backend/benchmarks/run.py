@@ -0,0 +1,234 @@
+"""
+统计基准测试
+
+对每个统计 API 与统计群命令计时，统计每次调用的 SQL 语句数，
+并与记录的基线比较：延迟或语句数超出基线、
+或没有基线文件 (且未指定 --record) 时退出码为 1。
+
+使用方法:
+    cd backend
+    python -m benchmarks.run --record        # 记录基线到 benchmarks/baselines.json
+    python -m benchmarks.run                 # 与基线比较
+    python -m benchmarks.run --only funnel   # 只运行名称包含 funnel 的用例
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+from sqlalchemy import event, select, func
+
+from app.config import settings
+from app.database import engine, AsyncSessionLocal
+from app.main import app
+from app.api.auth import get_current_admin
+from app.models import InviteLink, Statistics
+from app.bot_handlers.stats_group import handle_query_command, handle_total_command
+
+DEFAULT_BASELINE = Path(__file__).with_name("baselines.json")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="统计基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例的计时次数")
+    parser.add_argument("--warmup", type=int, default=1, help="每个用例的预热次数")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="基线文件")
+    parser.add_argument("--record", action="store_true", help="将本次结果记录为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许超出基线延迟的比例")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="低于该差值的延迟波动不计为超出")
+    parser.add_argument("--only", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--cache", action="store_true", help="启用统计结果缓存 (默认关闭以测量实际计算)")
+    return parser.parse_args(argv)
+
+
+class StatementCounter:
+    """统计执行的 SQL 语句数"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+class ReplyRecorder:
+    """统计群命令使用的消息对象，只记录回复内容"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.replies: list[str] = []
+
+    async def reply(self, text: str, **kwargs) -> None:
+        self.replies.append(text)
+
+
+@dataclass
+class CaseResult:
+    name: str
+    latencies_ms: list[float] = field(default_factory=list)
+    statements: float = 0
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.latencies_ms, 0.5)
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.latencies_ms, 0.95)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """百分位数 (最近秩)"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+async def build_cases(client: httpx.AsyncClient) -> list[tuple[str, Callable[[], Awaitable]]]:
+    """构建基准测试用例"""
+    async with AsyncSessionLocal() as db:
+        # 事件最多的邀请链接，用于单链接查询
+        result = await db.execute(
+            select(InviteLink.code, InviteLink.name)
+            .join(Statistics, Statistics.invite_code == InviteLink.code)
+            .where(Statistics.created_at >= datetime.utcnow() - timedelta(days=7))
+            .group_by(InviteLink.code, InviteLink.name)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+        top = result.first()
+    top_code, top_name = top if top else (None, None)
+
+    def api(path: str, **params):
+        async def call():
+            response = await client.get(f"/api/statistics{path}", params=params)
+            response.raise_for_status()
+            return response
+        return call
+
+    def command(handler, text: str):
+        async def call():
+            message = ReplyRecorder(text)
+            await handler(message)
+            return message.replies
+        return call
+
+    cases = [
+        ("api.overview", api("/overview")),
+        ("api.links", api("/links")),
+        ("api.ads", api("/ads")),
+        ("api.daily_7d", api("/daily", days=7)),
+        ("api.daily_90d", api("/daily", days=90)),
+        ("api.daily_hourly_7d", api("/daily", days=7, granularity="hour")),
+        ("api.ads_daily_30d", api("/ads/daily", days=30)),
+        ("api.funnel_7d", api("/funnel", days=7)),
+        ("api.funnel_90d", api("/funnel", days=90)),
+        ("api.funnel_90d_approx", api("/funnel", days=90, approximate="true")),
+        ("bot.total", command(handle_total_command, "/total")),
+    ]
+    if top_code:
+        cases += [
+            ("api.daily_30d_link", api("/daily", days=30, invite_code=top_code)),
+            ("api.funnel_30d_link", api("/funnel", days=30, invite_code=top_code)),
+            ("bot.query", command(handle_query_command, f"/query {top_name}")),
+        ]
+    return cases
+
+
+async def run_case(name: str, call, args, counter: StatementCounter) -> CaseResult:
+    """预热后重复执行一个用例"""
+    for _ in range(args.warmup):
+        await call()
+
+    result = CaseResult(name)
+    counter.count = 0
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        await call()
+        result.latencies_ms.append((time.perf_counter() - started) * 1000)
+    result.statements = counter.count / args.repeat
+    return result
+
+
+def compare(results: list[CaseResult], baseline: dict, tolerance: float, min_delta_ms: float) -> list[str]:
+    """与基线比较，返回超出基线的说明"""
+    failures = []
+    for result in results:
+        expected = baseline.get(result.name)
+        if not expected:
+            continue
+        if (
+            result.p50 > expected["p50_ms"] * (1 + tolerance)
+            and result.p50 - expected["p50_ms"] > min_delta_ms
+        ):
+            failures.append(
+                f"{result.name}: p50 {result.p50:.1f}ms > 基线 {expected['p50_ms']:.1f}ms (+{tolerance:.0%})"
+            )
+        if result.statements > expected["statements"]:
+            failures.append(
+                f"{result.name}: 语句数 {result.statements:g} > 基线 {expected['statements']:g}"
+            )
+    return failures
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if not args.record and not args.baseline.exists():
+        print(f"没有基线文件 {args.baseline}，使用 --record 记录")
+        return 1
+
+    if not args.cache:
+        settings.STATS_CACHE_TTL = 0
+
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+
+    # 跳过登录认证；ASGITransport 不触发 lifespan，后台任务不会运行
+    app.dependency_overrides[get_current_admin] = lambda: None
+    transport = httpx.ASGITransport(app=app)
+
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, call in await build_cases(client):
+            if args.only and args.only not in name:
+                continue
+            result = await run_case(name, call, args, counter)
+            results.append(result)
+            print(
+                f"{name:<24} p50 {result.p50:>9.1f}ms  p95 {result.p95:>9.1f}ms  "
+                f"max {max(result.latencies_ms):>9.1f}ms  语句 {result.statements:>5g}",
+                flush=True,
+            )
+
+    await engine.dispose()
+
+    if args.record:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update({
+            r.name: {"p50_ms": round(r.p50, 1), "statements": r.statements} for r in results
+        })
+        args.baseline.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n")
+        print(f"基线已记录: {args.baseline}")
+        return 0
+
+    failures = compare(
+        results, json.loads(args.baseline.read_text()), args.tolerance, args.min_delta_ms
+    )
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        return 1
+    print("✅ 全部用例均未超出基线")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
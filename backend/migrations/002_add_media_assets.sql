@@ -0,0 +1,69 @@
+-- 媒体资产去重迁移脚本
+-- 执行时间: 添加媒体资产 (media_assets) 功能时
+-- 注意: 新表可由 init_db() 自动创建，但已有表的新列与历史数据回填需手动执行
+
+-- =====================================================
+-- 1. 创建媒体资产表 media_assets
+-- =====================================================
+CREATE TABLE IF NOT EXISTS media_assets (
+    id SERIAL PRIMARY KEY,
+    file_unique_id VARCHAR(100) NOT NULL,
+    content_hash VARCHAR(64),
+    file_type VARCHAR(20) NOT NULL,
+    telegram_file_id VARCHAR(200) NOT NULL,
+    file_size BIGINT,
+    source_channel_id BIGINT,
+    source_message_id BIGINT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_media_assets_file_unique_id ON media_assets (file_unique_id);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_media_assets_content_hash ON media_assets (content_hash);
+
+-- =====================================================
+-- 2. 为 media_files / sponsor_media_files 添加 asset_id
+-- =====================================================
+ALTER TABLE media_files
+    ADD COLUMN IF NOT EXISTS asset_id INTEGER REFERENCES media_assets (id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_media_files_asset_id ON media_files (asset_id);
+
+ALTER TABLE sponsor_media_files
+    ADD COLUMN IF NOT EXISTS asset_id INTEGER REFERENCES media_assets (id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_sponsor_media_files_asset_id ON sponsor_media_files (asset_id);
+
+-- =====================================================
+-- 3. 回填历史数据 (每个 file_unique_id 取最早的一行，优先带来源消息的)
+-- =====================================================
+INSERT INTO media_assets (file_unique_id, file_type, telegram_file_id, file_size, source_channel_id, source_message_id)
+SELECT DISTINCT ON (file_unique_id)
+    file_unique_id, file_type, telegram_file_id, file_size, source_channel_id, source_message_id
+FROM (
+    SELECT id, file_unique_id, file_type, telegram_file_id, file_size,
+           source_channel_id, source_message_id, 0 AS origin
+    FROM media_files
+    WHERE file_unique_id IS NOT NULL
+    UNION ALL
+    SELECT id, file_unique_id, file_type, telegram_file_id, file_size,
+           NULL, NULL, 1 AS origin
+    FROM sponsor_media_files
+    WHERE file_unique_id IS NOT NULL
+) AS files
+ORDER BY file_unique_id, (source_message_id IS NULL), origin, id
+ON CONFLICT (file_unique_id) DO NOTHING;
+
+UPDATE media_files mf
+SET asset_id = a.id
+FROM media_assets a
+WHERE mf.asset_id IS NULL AND mf.file_unique_id = a.file_unique_id;
+
+UPDATE sponsor_media_files sf
+SET asset_id = a.id
+FROM media_assets a
+WHERE sf.asset_id IS NULL AND sf.file_unique_id = a.file_unique_id;
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令)
+-- =====================================================
+-- ALTER TABLE media_files DROP COLUMN IF EXISTS asset_id;
+-- ALTER TABLE sponsor_media_files DROP COLUMN IF EXISTS asset_id;
+-- DROP TABLE IF EXISTS media_assets;
@@ -0,0 +1,89 @@
+-- 统计事件表按月分区迁移脚本
+-- 执行时间: 启用统计事件分区 (statistics 按 created_at 按月范围分区) 时
+-- 注意: 新部署由 init_db() 直接创建分区表；已有部署需停机执行本脚本，
+--       之后由应用启动时自动预建未来月份分区
+
+BEGIN;
+
+-- =====================================================
+-- 1. 重命名旧表及其索引、序列
+-- =====================================================
+ALTER TABLE statistics RENAME TO statistics_old;
+ALTER SEQUENCE statistics_id_seq RENAME TO statistics_old_id_seq;
+ALTER INDEX statistics_pkey RENAME TO statistics_old_pkey;
+ALTER INDEX IF EXISTS ix_statistics_event_type RENAME TO ix_statistics_old_event_type;
+ALTER INDEX IF EXISTS ix_statistics_user_id RENAME TO ix_statistics_old_user_id;
+ALTER INDEX IF EXISTS ix_statistics_invite_code RENAME TO ix_statistics_old_invite_code;
+ALTER INDEX IF EXISTS ix_statistics_created_at RENAME TO ix_statistics_old_created_at;
+
+-- =====================================================
+-- 2. 创建分区表 (主键需包含分区键 created_at)
+-- =====================================================
+CREATE TABLE statistics (
+    id SERIAL NOT NULL,
+    event_type VARCHAR(50) NOT NULL,
+    user_id BIGINT,
+    invite_code VARCHAR(50),
+    resource_id INTEGER,
+    sponsor_id INTEGER,
+    page_number INTEGER,
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX ix_statistics_event_type ON statistics (event_type);
+CREATE INDEX ix_statistics_user_id ON statistics (user_id);
+CREATE INDEX ix_statistics_invite_code ON statistics (invite_code);
+CREATE INDEX ix_statistics_created_at ON statistics (created_at);
+
+-- =====================================================
+-- 3. 创建覆盖历史数据及未来 3 个月的月分区
+-- =====================================================
+DO $$
+DECLARE
+    first_month DATE;
+    month DATE;
+BEGIN
+    SELECT date_trunc('month', COALESCE(MIN(created_at), now()))::date
+    INTO first_month
+    FROM statistics_old;
+
+    FOR month IN
+        SELECT generate_series(first_month, date_trunc('month', now())::date + INTERVAL '3 months', INTERVAL '1 month')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF statistics FOR VALUES FROM (%L) TO (%L)',
+            'statistics_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+            month,
+            (month + INTERVAL '1 month')::date
+        );
+    END LOOP;
+END $$;
+
+-- =====================================================
+-- 4. 迁移数据 (保留原 ID，日汇总高水位依赖事件 ID)
+-- =====================================================
+INSERT INTO statistics (id, event_type, user_id, invite_code, resource_id, sponsor_id, page_number, created_at)
+SELECT id, event_type, user_id, invite_code, resource_id, sponsor_id, page_number, COALESCE(created_at, now())
+FROM statistics_old;
+
+SELECT setval('statistics_id_seq', COALESCE((SELECT MAX(id) FROM statistics), 0) + 1, false);
+
+COMMIT;
+
+-- 确认数据无误后删除旧表:
+-- DROP TABLE statistics_old;
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令，需在删除旧表之前)
+-- =====================================================
+-- BEGIN;
+-- DROP TABLE IF EXISTS statistics;
+-- ALTER TABLE statistics_old RENAME TO statistics;
+-- ALTER SEQUENCE statistics_old_id_seq RENAME TO statistics_id_seq;
+-- ALTER INDEX statistics_old_pkey RENAME TO statistics_pkey;
+-- ALTER INDEX ix_statistics_old_event_type RENAME TO ix_statistics_event_type;
+-- ALTER INDEX ix_statistics_old_user_id RENAME TO ix_statistics_user_id;
+-- ALTER INDEX ix_statistics_old_invite_code RENAME TO ix_statistics_invite_code;
+-- ALTER INDEX ix_statistics_old_created_at RENAME TO ix_statistics_created_at;
+-- COMMIT;
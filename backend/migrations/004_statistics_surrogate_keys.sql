@@ -0,0 +1,130 @@
+-- 统计事件与用户整数代理键迁移脚本
+-- 执行时间: 部署使用 invite_link_id / event_code 查询的版本之前
+-- 注意: 回填分批提交，需在自动提交模式下执行 (psql -f，不要包在事务中)；
+--       可在线执行，旧版本写入的行由触发器补全新列。
+--       invite_code / event_type 列保留并继续写入，过渡期内仍可读取。
+
+-- =====================================================
+-- 1. 新增列 (可空、无默认值，不重写表)
+-- =====================================================
+ALTER TABLE users ADD COLUMN IF NOT EXISTS invite_link_id INTEGER REFERENCES invite_links(id);
+ALTER TABLE statistics ADD COLUMN IF NOT EXISTS event_code SMALLINT;
+ALTER TABLE statistics ADD COLUMN IF NOT EXISTS invite_link_id INTEGER;
+
+COMMENT ON COLUMN users.invite_link_id IS '来源邀请链接ID';
+COMMENT ON COLUMN statistics.event_code IS '事件类型编码 (EVENT_CODES)';
+COMMENT ON COLUMN statistics.invite_link_id IS '邀请链接ID';
+
+-- =====================================================
+-- 2. 过渡期触发器: 只写旧列的行自动补全新列
+-- =====================================================
+CREATE OR REPLACE FUNCTION stats_event_code(event_type TEXT) RETURNS SMALLINT AS $$
+    SELECT CASE event_type
+        WHEN 'user_start' THEN 1
+        WHEN 'page_view' THEN 2
+        WHEN 'ad_view' THEN 3
+        WHEN 'ad_click' THEN 4
+        WHEN 'preview_end' THEN 5
+    END::SMALLINT
+$$ LANGUAGE SQL IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION users_fill_surrogate_keys() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.invite_link_id IS NULL AND NEW.invite_code IS NOT NULL THEN
+        SELECT id INTO NEW.invite_link_id FROM invite_links WHERE code = NEW.invite_code;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION statistics_fill_surrogate_keys() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.invite_link_id IS NULL AND NEW.invite_code IS NOT NULL THEN
+        SELECT id INTO NEW.invite_link_id FROM invite_links WHERE code = NEW.invite_code;
+    END IF;
+    IF NEW.event_code IS NULL THEN
+        NEW.event_code := stats_event_code(NEW.event_type);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_fill_surrogate_keys ON users;
+CREATE TRIGGER users_fill_surrogate_keys
+    BEFORE INSERT ON users
+    FOR EACH ROW EXECUTE FUNCTION users_fill_surrogate_keys();
+
+-- 分区表上的 BEFORE 行触发器需要 PostgreSQL 13+
+DROP TRIGGER IF EXISTS statistics_fill_surrogate_keys ON statistics;
+CREATE TRIGGER statistics_fill_surrogate_keys
+    BEFORE INSERT ON statistics
+    FOR EACH ROW EXECUTE FUNCTION statistics_fill_surrogate_keys();
+
+-- =====================================================
+-- 3. 分批回填 (每批按 ID 范围更新后提交)
+-- =====================================================
+DO $$
+DECLARE
+    batch CONSTANT INTEGER := 10000;
+    max_id INTEGER;
+    start_id INTEGER := 0;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM users;
+    WHILE start_id <= max_id LOOP
+        UPDATE users u
+        SET invite_link_id = l.id
+        FROM invite_links l
+        WHERE l.code = u.invite_code
+          AND u.id > start_id AND u.id <= start_id + batch
+          AND u.invite_link_id IS NULL;
+        start_id := start_id + batch;
+        COMMIT;
+    END LOOP;
+END $$;
+
+DO $$
+DECLARE
+    batch CONSTANT INTEGER := 50000;
+    max_id INTEGER;
+    start_id INTEGER := 0;
+BEGIN
+    SELECT COALESCE(MAX(id), 0) INTO max_id FROM statistics;
+    WHILE start_id <= max_id LOOP
+        UPDATE statistics s
+        SET event_code = stats_event_code(s.event_type),
+            invite_link_id = (SELECT l.id FROM invite_links l WHERE l.code = s.invite_code)
+        WHERE s.id > start_id AND s.id <= start_id + batch
+          AND s.event_code IS NULL;
+        start_id := start_id + batch;
+        COMMIT;
+        RAISE NOTICE 'statistics 回填进度: % / %', LEAST(start_id, max_id), max_id;
+    END LOOP;
+END $$;
+
+-- =====================================================
+-- 4. 索引 (回填完成后创建)
+-- =====================================================
+CREATE INDEX IF NOT EXISTS ix_users_invite_link_id ON users (invite_link_id);
+CREATE INDEX IF NOT EXISTS ix_statistics_event_code ON statistics (event_code);
+CREATE INDEX IF NOT EXISTS ix_statistics_invite_link_id ON statistics (invite_link_id);
+
+-- 所有实例升级到新版本后可删除过渡期触发器:
+-- DROP TRIGGER statistics_fill_surrogate_keys ON statistics;
+-- DROP TRIGGER users_fill_surrogate_keys ON users;
+-- DROP FUNCTION statistics_fill_surrogate_keys();
+-- DROP FUNCTION users_fill_surrogate_keys();
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令)
+-- =====================================================
+-- DROP TRIGGER IF EXISTS statistics_fill_surrogate_keys ON statistics;
+-- DROP TRIGGER IF EXISTS users_fill_surrogate_keys ON users;
+-- DROP FUNCTION IF EXISTS statistics_fill_surrogate_keys();
+-- DROP FUNCTION IF EXISTS users_fill_surrogate_keys();
+-- DROP FUNCTION IF EXISTS stats_event_code(TEXT);
+-- DROP INDEX IF EXISTS ix_statistics_invite_link_id;
+-- DROP INDEX IF EXISTS ix_statistics_event_code;
+-- DROP INDEX IF EXISTS ix_users_invite_link_id;
+-- ALTER TABLE statistics DROP COLUMN IF EXISTS invite_link_id;
+-- ALTER TABLE statistics DROP COLUMN IF EXISTS event_code;
+-- ALTER TABLE users DROP COLUMN IF EXISTS invite_link_id;
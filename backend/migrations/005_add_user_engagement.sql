@@ -0,0 +1,52 @@
+-- 用户行为计数表迁移脚本
+-- 执行时间: 部署按事件增量更新 user_engagement 的版本之前
+--           (先停止 Bot 进程，执行迁移后再启动新版本)
+-- 注意: 回填从 statistics 计算迁移时的计数快照，新版本启动后的事件在写入时累加；
+--       回填只在表为空时执行，重复执行不会覆盖或重复累加已有计数。
+--       迁移与新版本启动之间由旧版本写入的事件不计入，因此执行前需停止 Bot 进程。
+--       已归档 (从 PostgreSQL 删除) 的月份不计入回填。
+
+BEGIN;
+
+-- =====================================================
+-- 1. 创建 user_engagement 表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS user_engagement (
+    user_id BIGINT PRIMARY KEY,
+    page_views INTEGER NOT NULL DEFAULT 0,
+    ad_views INTEGER NOT NULL DEFAULT 0,
+    ad_clicks INTEGER NOT NULL DEFAULT 0,
+    preview_ends INTEGER NOT NULL DEFAULT 0,
+    last_event_at TIMESTAMP
+);
+
+COMMENT ON TABLE user_engagement IS '用户行为计数表';
+COMMENT ON COLUMN user_engagement.user_id IS '用户 Telegram ID';
+COMMENT ON COLUMN user_engagement.page_views IS '浏览页数';
+COMMENT ON COLUMN user_engagement.ad_views IS '广告展示次数';
+COMMENT ON COLUMN user_engagement.ad_clicks IS '广告点击次数';
+COMMENT ON COLUMN user_engagement.preview_ends IS '完成预览次数';
+COMMENT ON COLUMN user_engagement.last_event_at IS '最后事件时间';
+
+-- =====================================================
+-- 2. 从统计事件回填 (event_code 见 004 迁移，仅表为空时)
+-- =====================================================
+INSERT INTO user_engagement (user_id, page_views, ad_views, ad_clicks, preview_ends, last_event_at)
+SELECT
+    user_id,
+    COUNT(*) FILTER (WHERE event_code = 2),
+    COUNT(*) FILTER (WHERE event_code = 3),
+    COUNT(*) FILTER (WHERE event_code = 4),
+    COUNT(*) FILTER (WHERE event_code = 5),
+    MAX(created_at)
+FROM statistics
+WHERE user_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM user_engagement)
+GROUP BY user_id;
+
+COMMIT;
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令)
+-- =====================================================
+-- DROP TABLE IF EXISTS user_engagement;
@@ -0,0 +1,14 @@
+-- file_id 映射来源索引迁移脚本
+-- 执行时间: 部署批量加载已同步集合的备份同步版本时
+-- 注意: CONCURRENTLY 不能在事务中执行，请用 psql -f 直接执行
+
+-- =====================================================
+-- 1. 按来源 (source_type, source_id) 的复合索引
+-- =====================================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_file_id_mappings_source
+    ON file_id_mappings (source_type, source_id);
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令)
+-- =====================================================
+-- DROP INDEX CONCURRENTLY IF EXISTS ix_file_id_mappings_source;
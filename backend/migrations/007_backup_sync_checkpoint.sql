@@ -0,0 +1,24 @@
+-- 备份同步检查点迁移脚本
+-- 执行时间: 部署可恢复的备份同步版本之前
+
+BEGIN;
+
+-- =====================================================
+-- 1. bot_backups 新增检查点列
+-- =====================================================
+ALTER TABLE bot_backups ADD COLUMN IF NOT EXISTS sync_phase VARCHAR(20);
+ALTER TABLE bot_backups ADD COLUMN IF NOT EXISTS sync_cursor INTEGER;
+ALTER TABLE bot_backups ADD COLUMN IF NOT EXISTS checkpoint_at TIMESTAMP;
+
+COMMENT ON COLUMN bot_backups.sync_phase IS '同步阶段';
+COMMENT ON COLUMN bot_backups.sync_cursor IS '阶段内已处理到的来源ID';
+COMMENT ON COLUMN bot_backups.checkpoint_at IS '检查点时间';
+
+COMMIT;
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令)
+-- =====================================================
+-- ALTER TABLE bot_backups DROP COLUMN IF EXISTS checkpoint_at;
+-- ALTER TABLE bot_backups DROP COLUMN IF EXISTS sync_cursor;
+-- ALTER TABLE bot_backups DROP COLUMN IF EXISTS sync_phase;
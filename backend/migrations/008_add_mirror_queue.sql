@@ -0,0 +1,34 @@
+-- 备份增量镜像队列迁移脚本
+-- 执行时间: 部署增量镜像版本之前
+-- 注意: 新表可由 init_db() 自动创建；入队由应用在插入媒体记录时完成
+
+BEGIN;
+
+-- =====================================================
+-- 1. 创建 mirror_queue 表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS mirror_queue (
+    id BIGSERIAL PRIMARY KEY,
+    source_type VARCHAR(20) NOT NULL,
+    source_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_mirror_queue_next_attempt_at ON mirror_queue (next_attempt_at);
+
+COMMENT ON TABLE mirror_queue IS '备份增量镜像队列';
+COMMENT ON COLUMN mirror_queue.source_type IS '来源类型: asset/resource/sponsor/sponsor_single';
+COMMENT ON COLUMN mirror_queue.source_id IS '来源 ID';
+COMMENT ON COLUMN mirror_queue.attempts IS '已尝试次数';
+COMMENT ON COLUMN mirror_queue.last_error IS '最近错误';
+COMMENT ON COLUMN mirror_queue.next_attempt_at IS '下次处理时间';
+
+COMMIT;
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令)
+-- =====================================================
+-- DROP TABLE IF EXISTS mirror_queue;
@@ -0,0 +1,50 @@
+-- 多备份 Bot 迁移脚本
+-- 执行时间: 部署多备份 Bot 版本之前
+-- 注意: 备份 Bot 的 file_id 从 file_id_mappings.backup_file_id 迁移到 backup_file_ids，
+--       现有映射归属于原有的 (唯一一个) 备份配置
+
+BEGIN;
+
+-- =====================================================
+-- 1. 创建 backup_file_ids 表
+-- =====================================================
+CREATE TABLE IF NOT EXISTS backup_file_ids (
+    id BIGSERIAL PRIMARY KEY,
+    backup_id INTEGER NOT NULL REFERENCES bot_backups(id) ON DELETE CASCADE,
+    file_unique_id VARCHAR(100) NOT NULL,
+    file_id VARCHAR(200) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_backup_file_id UNIQUE (backup_id, file_unique_id)
+);
+
+COMMENT ON TABLE backup_file_ids IS '备份 Bot 的 file_id';
+COMMENT ON COLUMN backup_file_ids.backup_id IS '备份配置 ID';
+COMMENT ON COLUMN backup_file_ids.file_unique_id IS '文件唯一标识';
+COMMENT ON COLUMN backup_file_ids.file_id IS '备份 Bot file_id';
+
+-- =====================================================
+-- 2. 迁移现有备份 file_id
+-- =====================================================
+INSERT INTO backup_file_ids (backup_id, file_unique_id, file_id, created_at)
+SELECT b.id, m.file_unique_id, m.backup_file_id, m.created_at
+FROM file_id_mappings m
+CROSS JOIN (SELECT id FROM bot_backups ORDER BY id LIMIT 1) b
+WHERE m.backup_file_id IS NOT NULL
+ON CONFLICT ON CONSTRAINT uq_backup_file_id DO NOTHING;
+
+-- =====================================================
+-- 3. 删除 file_id_mappings.backup_file_id
+-- =====================================================
+ALTER TABLE file_id_mappings DROP COLUMN IF EXISTS backup_file_id;
+
+COMMIT;
+
+-- =====================================================
+-- 回滚脚本 (如需回滚请执行以下命令)
+-- =====================================================
+-- ALTER TABLE file_id_mappings ADD COLUMN IF NOT EXISTS backup_file_id VARCHAR(200);
+-- UPDATE file_id_mappings m SET backup_file_id = f.file_id
+-- FROM backup_file_ids f
+-- WHERE f.file_unique_id = m.file_unique_id
+--   AND f.backup_id = (SELECT id FROM bot_backups ORDER BY id LIMIT 1);
+-- DROP TABLE IF EXISTS backup_file_ids;